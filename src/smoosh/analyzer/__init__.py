@@ -1,6 +1,12 @@
 """Repository analysis module for smoosh."""
 
-from .repository import FileInfo, RepositoryInfo, analyze_repository, load_file_contents
+from .repository import (
+    FileInfo,
+    RepositoryInfo,
+    analyze_repository,
+    iter_file_contents,
+    load_file_contents,
+)
 from .tree import generate_tree
 
 __all__ = [
@@ -8,5 +14,6 @@ __all__ = [
     "RepositoryInfo",
     "analyze_repository",
     "generate_tree",
+    "iter_file_contents",
     "load_file_contents",
 ]
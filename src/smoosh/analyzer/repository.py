@@ -1,19 +1,29 @@
 """Repository analysis functionality for smoosh."""
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Set, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from ..custom_types import FileInfo
+from ..utils.cache import AnalysisCache
+from ..utils.concurrency import thread_imap, thread_map
 from ..utils.config import ConfigDict
 from ..utils.file_utils import (
+    BYTES_PER_MB,
+    find_git_dir,
     find_git_root,
-    get_file_size_mb,
-    get_gitignore_patterns,
-    walk_repository,
+    is_default_ignored,
+    load_ignore_rules,
+    probe_repository,
+    scan_repository,
 )
+from ..utils.git_diff import changed_files
+from ..utils.git_index import GitIndexError, list_tracked_files
+from ..utils.gitignore import IgnoreStack
 from ..utils.logger import logger
+from ..utils.zerocopy import ZERO_COPY_MIN_BYTES, MappedFile
+from .imports import ImportGraph, build_import_graph, import_neighbours
 
 # Define PathLike type consistently with other modules
 PathLike = Union[str, "os.PathLike[str]"]
@@ -25,28 +35,143 @@ class RepositoryInfo:
 
     root: Path
     files: List[FileInfo]
-    gitignore_patterns: Set[str]
+    gitignore_patterns: List[str]
     total_size_mb: float
     python_files_count: int
     total_files_count: int
+    classification_tiers: Dict[str, int] = field(default_factory=dict)
+    cache: Optional[AnalysisCache] = None
 
-    def get_tree_representation(self) -> str:
-        """Compose a tree-style representation of the repository structure."""
+    def get_tree_representation(self, *, max_depth: int = 0, max_entries: int = 0) -> str:
+        """Compose a tree-style representation of the repository structure.
+
+        Args:
+        ----
+            max_depth: Deepest level whose directories are expanded; 0 for no limit
+            max_entries: Most children shown per directory; 0 for no limit
+
+        Returns:
+        -------
+            Rendered tree
+
+        """
         from .tree import generate_tree
 
-        return generate_tree(str(self.root), self.files)
+        return generate_tree(
+            str(self.root), self.files, max_depth=max_depth, max_entries=max_entries
+        )
+
+
+def _read_tracked_files(
+    git_root: Path, root_path: Path, respect_gitignore: bool
+) -> Optional[List[str]]:
+    """List tracked files below root_path from the git index, or None on failure.
+
+    Like the walk, tracked files matching smoosh's default ignore patterns are
+    left out unless ignore rules are disabled.
+    """
+    git_dir = find_git_dir(git_root)
+    if git_dir is None:
+        return None
+
+    prefix = os.path.relpath(root_path.resolve(), git_root.resolve())
+    prefix = "" if prefix == os.curdir else prefix.replace(os.sep, "/")
+    try:
+        tracked_files = list_tracked_files(git_dir, prefix)
+    except GitIndexError as e:
+        logger.warning(f"{e}; walking the directory tree instead")
+        return None
+
+    if respect_gitignore:
+        tracked_files = [rel for rel in tracked_files if not is_default_ignored(rel)]
+    logger.info(f"Enumerating {len(tracked_files)} tracked files from the git index")
+    return tracked_files
+
+
+def _scan_import_graph(
+    root_path: Path,
+    config: ConfigDict,
+    ignore_rules: IgnoreStack,
+    max_size_mb: Optional[float],
+    cache: Optional[AnalysisCache],
+) -> ImportGraph:
+    """Build the import graph of the Python files a full walk would include."""
+    python_files = {
+        rel_path: stat_result
+        for rel_path, stat_result in scan_repository(root_path, ignore_rules, max_size_mb).items()
+        if rel_path.endswith(".py")
+    }
+    return build_import_graph(str(root_path), python_files, cache, config["performance"]["jobs"])
+
+
+def _read_changed_files(
+    git_root: Optional[Path],
+    root_path: Path,
+    config: ConfigDict,
+    ignore_rules: IgnoreStack,
+    max_size_mb: Optional[float],
+    cache: Optional[AnalysisCache] = None,
+) -> List[str]:
+    """List the files changed since git.since, with their direct imports if configured."""
+    revision = config["git"]["since"]
+    if git_root is None:
+        raise AnalysisError(f"Listing files changed since {revision} needs a git repository")
+    try:
+        changed = changed_files(git_root, root_path, revision)
+    except GitIndexError as e:
+        raise AnalysisError(f"Cannot list files changed since {revision}: {e}") from e
+    logger.info(f"{len(changed)} files changed since {revision}")
+
+    if not config["git"]["with_imports"]:
+        return changed
+    graph = _scan_import_graph(root_path, config, ignore_rules, max_size_mb, cache)
+    neighbours = import_neighbours(graph, changed)
+    logger.info(f"Adding {len(neighbours)} importing and imported modules")
+    return sorted({*changed, *neighbours})
+
+
+def _read_focus_files(
+    root_path: Path,
+    config: ConfigDict,
+    ignore_rules: IgnoreStack,
+    max_size_mb: Optional[float],
+    cache: Optional[AnalysisCache] = None,
+) -> List[str]:
+    """List the focus modules and the modules they import up to focus.depth levels."""
+    graph = _scan_import_graph(root_path, config, ignore_rules, max_size_mb, cache)
+    starts: List[str] = []
+    for name in config["focus"]["modules"]:
+        module_files = graph.module_files(name)
+        if not module_files:
+            raise AnalysisError(f"Module {name} is not part of {root_path}")
+        starts.extend(module_files)
+    selected = graph.reachable(starts, config["focus"]["depth"])
+    logger.info(f"Focusing on {len(starts)} modules and {len(selected) - len(starts)} imports")
+    return selected
 
 
 def analyze_repository(
-    path: PathLike, config: ConfigDict, force_cat: bool = False
+    path: PathLike,
+    config: ConfigDict,
+    force_cat: bool = False,
+    load_content: bool = False,
+    prefetch: bool = False,
 ) -> RepositoryInfo:
     """Analyze a repository and gather information about its structure.
 
+    Each file is probed once: a single stat from the directory scan and at most
+    one open, which also reads the content when load_content is set. With
+    prefetch set, files that were opened to be classified and fit in the sample
+    are not opened again to be composed; their text is held until then, so only
+    set it when every file will be composed.
+
     Args:
     ----
         path: Path to the repository
         config: Configuration dictionary
         force_cat: Whether to force concatenation mode
+        load_content: Whether to load file contents during the probe
+        prefetch: Whether to keep the text of small files read while probing
 
     Returns:
     -------
@@ -72,82 +197,184 @@ def analyze_repository(
         logger.info(f"Processing directory at {input_path}")
 
     try:
-        # Get gitignore patterns if respect_gitignore is enabled
-        gitignore_patterns: Set[str] = set()
-        if config["gitignore"]["respect"] and not force_cat:
-            # Still get gitignore from git root if available for pattern matching
-            gitignore_root = git_root if git_root else root_path
-            # Convert Path to str for gitignore pattern retrieval
-            gitignore_patterns = get_gitignore_patterns(str(gitignore_root))
-
-        # Always exclude the .git directory
-        gitignore_patterns.add(".git/")
+        # Ignore rules are stacked from the git root if available, with nested
+        # .gitignore files loaded as the walk enters their directories
+        respect_gitignore = config["gitignore"]["respect"] and not force_cat
+        ignore_rules = load_ignore_rules(root_path, git_root, respect_gitignore)
 
         # Get size limit from config
         max_size_mb: Optional[float] = (
             None if force_cat else config["output"]["size_limits"]["file_max_mb"]
         )
 
-        # Collect file information
-        files: List[FileInfo] = []
-        total_size_mb: float = 0.0
-        python_files_count: int = 0
-
-        # Convert root_path to str for walk_repository
-        for file_path in walk_repository(str(root_path), gitignore_patterns, max_size_mb):
-            try:
-                # Get file info
-                size_mb = get_file_size_mb(file_path)
-                is_python = file_path.suffix == ".py"
-                # We know root_path is a Path here
-                relative_path = file_path.relative_to(root_path)
-
-                file_info = FileInfo(
-                    path=file_path,
-                    relative_path=relative_path,
-                    size_mb=size_mb,
-                    is_python=is_python,
-                )
-
-                files.append(file_info)
-                total_size_mb += size_mb
-                if is_python:
-                    python_files_count += 1
-
-            except Exception as e:
-                logger.warning(f"Error processing file {file_path}: {e}")
+        # Unchanged files are recognized from the persistent cache by their stat
+        cache: Optional[AnalysisCache] = None
+        if config["cache"]["enabled"]:
+            cache = AnalysisCache(
+                root_path,
+                cache_dir=config["cache"]["directory"] or None,
+                max_age_days=config["cache"]["max_age_days"],
+            )
+
+        # In git repositories the tracked files can come straight from the index,
+        # and a diff against a revision limits the analysis to the changed files
+        tracked_files: Optional[List[str]] = None
+        include_untracked = config["git"]["include_untracked"]
+        if config["git"].get("since"):
+            tracked_files = _read_changed_files(
+                git_root, root_path, config, ignore_rules, max_size_mb, cache
+            )
+            include_untracked = False
+        elif config["focus"]["modules"]:
+            # Only a module and what it imports, found through the import graph
+            tracked_files = _read_focus_files(root_path, config, ignore_rules, max_size_mb, cache)
+            include_untracked = False
+        elif config["git"]["use_index"] and git_root is not None and not force_cat:
+            tracked_files = _read_tracked_files(git_root, root_path, respect_gitignore)
+
+        # Collect file information in a single probing pass
+        tier_counts: Dict[str, int] = {}
+        files: List[FileInfo] = probe_repository(
+            root_path,
+            ignore_rules,
+            max_size_mb,
+            load_content=load_content,
+            jobs=config["performance"]["jobs"],
+            tier_counts=tier_counts,
+            cache=cache,
+            tracked_files=tracked_files,
+            include_untracked=include_untracked,
+            prefetch=prefetch,
+        )
+        if cache is not None:
+            logger.debug(f"Analysis cache: {cache.hits} hits, {cache.misses} misses")
+            cache.save()
+        total_size_mb = sum(file_info.size_mb for file_info in files)
+        python_files_count = sum(1 for file_info in files if file_info.is_python)
 
         # Sort files by relative path for consistent ordering
-        files.sort(key=lambda f: str(f.relative_path))
+        files.sort(key=lambda f: f.relative_path)
+
+        logger.debug(
+            "Text/binary classification by tier: "
+            + ", ".join(f"{tier}={count}" for tier, count in sorted(tier_counts.items()))
+        )
 
         return RepositoryInfo(
             root=root_path,  # root_path is now guaranteed to be a Path
             files=files,
-            gitignore_patterns=gitignore_patterns,
+            gitignore_patterns=ignore_rules.patterns,
             total_size_mb=total_size_mb,
             python_files_count=python_files_count,
             total_files_count=len(files),
+            classification_tiers=tier_counts,
+            cache=cache,
         )
 
     except Exception as e:
         raise AnalysisError(f"Failed to analyze repository: {e}") from e
 
 
-def load_file_contents(repo_info: RepositoryInfo) -> None:
+def read_file_text(file_info: FileInfo) -> Optional[str]:
+    """Read a single file's content, reporting failures as warnings.
+
+    Args:
+    ----
+        file_info: File to read
+
+    Returns:
+    -------
+        Decoded content, or None if the file cannot be read
+
+    """
+    try:
+        return file_info.read_text()
+    except Exception as e:
+        logger.warning(f"Error reading file {file_info.path}: {e}")
+        return None
+
+
+def _read_file_content(file_info: FileInfo) -> None:
+    """Read a single file's content into its FileInfo."""
+    file_info.content = read_file_text(file_info)
+
+
+def load_file_contents(repo_info: RepositoryInfo, jobs: Optional[int] = None) -> None:
     """Load the contents of all files in the repository info.
 
+    Files are read concurrently on a bounded thread pool. Each file's content is
+    stored on its own FileInfo, so the sorted order of repo_info.files is kept.
+    Files whose content is already loaded are skipped.
+
     Args:
     ----
         repo_info: Repository information object
+        jobs: Number of reader threads; None or 0 sizes the pool automatically
+
+    """
+    pending = [file_info for file_info in repo_info.files if file_info.content is None]
+    thread_map(_read_file_content, pending, jobs)
+
+
+def iter_file_contents(
+    files: Iterable[FileInfo], jobs: Optional[int] = None
+) -> Iterator[Tuple[FileInfo, Optional[str]]]:
+    """Yield each file with its content, reading missing contents ahead on demand.
+
+    Contents that are not already loaded are read on a bounded thread pool a
+    few files ahead of the consumer and are not kept on the FileInfo, so only
+    a window of file contents is in memory at any time.
+
+    Args:
+    ----
+        files: Files in output order
+        jobs: Number of reader threads; None or 0 sizes the pool automatically
+
+    Yields:
+    ------
+        (file_info, content) pairs in the order of files, content None if unreadable
 
     """
-    for file_info in repo_info.files:
-        try:
-            with open(file_info.path, encoding="utf-8") as f:
-                file_info.content = f.read()
-        except Exception as e:
-            logger.warning(f"Error reading file {file_info.path}: {e}")
-            file_info.content = None
+
+    def load(file_info: FileInfo) -> Tuple[FileInfo, Optional[str]]:
+        if file_info.content is not None:
+            return file_info, file_info.content
+        return file_info, read_file_text(file_info)
+
+    yield from thread_imap(load, files, jobs)
+
+
+def iter_file_sources(
+    files: Iterable[FileInfo], jobs: Optional[int] = None
+) -> Iterator[Tuple[FileInfo, Union[str, MappedFile, None]]]:
+    """Yield each file with its content or, for large UTF-8 files, a mapping of it.
+
+    Like iter_file_contents, but files that can be copied to UTF-8 output
+    unchanged are memory-mapped instead of decoded. The caller closes the
+    mapped files.
+
+    Args:
+    ----
+        files: Files in output order
+        jobs: Number of reader threads; None or 0 sizes the pool automatically
+
+    Yields:
+    ------
+        (file_info, source) pairs in the order of files, source None if unreadable
+
+    """
+
+    def load(file_info: FileInfo) -> Tuple[FileInfo, Union[str, MappedFile, None]]:
+        if file_info.content is not None:
+            return file_info, file_info.content
+        # Small files are read rather than opened once more just to find their size
+        if file_info.size_mb * BYTES_PER_MB >= ZERO_COPY_MIN_BYTES:
+            mapped = MappedFile.open(file_info.path, file_info.encoding)
+            if mapped is not None:
+                return file_info, mapped
+        return file_info, read_file_text(file_info)
+
+    yield from thread_imap(load, files, jobs)
 
 
 class AnalysisError(Exception):
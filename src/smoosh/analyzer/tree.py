@@ -1,42 +1,151 @@
 """Directory tree generation functionality for smoosh."""
 
 import os
-from dataclasses import dataclass
+import sys
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Iterator, List, Optional, Sequence, Tuple, Union, cast
 
 from ..custom_types import FileInfo
 
 # Define PathLike type consistently with file_utils
 PathLike = Union[str, "os.PathLike[str]"]
 
+# A rendered entry: a node, or a line summarizing nodes that are not shown
+TreeEntry = Union["TreeNode", str]
+
+
+# Order of children: directories first, then names case-insensitively
+SortKey = Tuple[bool, str, str]
+
+# Children of a directory; files have none
+Children = List["TreeNode"]
+
 
-@dataclass
 class TreeNode:
-    """Node in the directory tree."""
+    """Node in the directory tree.
 
-    name: str
-    is_dir: bool
-    children: Dict[str, "TreeNode"]
-    is_python: bool = False
+    Nodes are slotted and directory names interned, as there is one node per
+    file and directory. The children of a directory are kept sorted for rendering,
+    directories first, comparing the case-folded names stored on the nodes.
+    """
+
+    __slots__ = ("children", "is_dir", "key", "name")
 
-    def __init__(self, name: str, is_dir: bool = True):
+    def __init__(self, name: str, is_dir: bool = True) -> None:
         """Initialize a TreeNode.
 
         Args:
         ----
             name: Name of the node (file or directory)
             is_dir: Whether the node represents a directory
+
         """
-        self.name = name
+        # Directory names recur throughout a tree; file names are mostly
+        # unique, and interning them would only grow the interpreter's table
+        self.name = name = sys.intern(name) if is_dir else name
         self.is_dir = is_dir
-        self.children = {}
-        self.is_python = name.endswith(".py")
+        # Shares the name's string when it is already lower case
+        folded = name.lower()
+        self.key = name if folded == name else folded
+        # Files share an empty tuple rather than each holding an empty list
+        self.children: Sequence[TreeNode] = [] if is_dir else ()
+
+    @property
+    def sort_key(self) -> SortKey:
+        """Position of the node among its siblings."""
+        return (not self.is_dir, self.key, self.name)
+
+    @property
+    def is_python(self) -> bool:
+        """Whether the node is a Python file."""
+        return not self.is_dir and self.name.endswith(".py")
+
+    def _position(self, sort_key: SortKey) -> int:
+        """Return where a child with the given sort key is or would be inserted."""
+        children = self.children
+        low, high = 0, len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if children[middle].sort_key < sort_key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _index(self, name: str, is_dir: bool) -> Optional[int]:
+        """Return the position of a child, or None if there is no such child."""
+        index = self._position((not is_dir, name.lower(), name))
+        children = self.children
+        if index < len(children) and children[index].name == name:
+            return index if children[index].is_dir == is_dir else None
+        return None
+
+    def child(self, name: str, is_dir: bool) -> Optional["TreeNode"]:
+        """Find a child by name.
+
+        Args:
+        ----
+            name: Name of the child
+            is_dir: Whether the child is a directory
+
+        Returns:
+        -------
+            Child node, or None if there is none
+
+        """
+        index = self._index(name, is_dir)
+        return None if index is None else self.children[index]
+
+    def insert(self, node: "TreeNode") -> "TreeNode":
+        """Add a child in sorted position unless one of the same name exists.
+
+        Args:
+        ----
+            node: Node to add
+
+        Returns:
+        -------
+            The existing child of that name, or node once added
+
+        """
+        children = cast(Children, self.children)
+        index = self._position(node.sort_key)
+        if index < len(children) and children[index].sort_key == node.sort_key:
+            return children[index]
+        children.insert(index, node)
+        return node
+
+    def remove(self, name: str, is_dir: bool) -> None:
+        """Remove a child by name, if present.
+
+        Args:
+        ----
+            name: Name of the child
+            is_dir: Whether the child is a directory
+
+        """
+        index = self._index(name, is_dir)
+        if index is not None:
+            del cast(Children, self.children)[index]
+
+
+def _sort_key(node: TreeNode) -> SortKey:
+    """Return the position of a node among its siblings."""
+    return node.sort_key
+
+
+def _close(directory: TreeNode) -> None:
+    """Sort the children of a directory once all of them have been added."""
+    cast(Children, directory.children).sort(key=_sort_key)
 
 
 def build_tree(root: PathLike, files: List[FileInfo]) -> TreeNode:
     """Build a tree structure from list of files.
 
+    Paths are visited in sorted order, in which the files of a directory are
+    contiguous: the directories shared with the previous path are reused and
+    each directory's children are sorted once, when the walk leaves it.
+
     Args:
     ----
         root: Repository root path
@@ -52,28 +161,203 @@ def build_tree(root: PathLike, files: List[FileInfo]) -> TreeNode:
     root_name = root_path.name or str(root_path)
     root_node = TreeNode(root_name)
 
-    for file_info in files:
-        current = root_node
-        parts = file_info.relative_path.parts
+    # The root and the directories of the previous path
+    stack = [root_node]
+    previous: List[str] = []
+    previous_directory = None
+    previous_path = None
+    for relative_path in sorted(file_info.relative_path for file_info in files):
+        if relative_path == previous_path:
+            continue
+        previous_path = relative_path
+        directory, _, file_name = relative_path.rpartition("/")
 
-        # Create directory nodes
-        for part in parts[:-1]:
-            if part not in current.children:
-                current.children[part] = TreeNode(part)
-            current = current.children[part]
+        # Most files share their directory with the previous one
+        if directory != previous_directory:
+            directories = directory.split("/") if directory else []
+            common = 0
+            limit = min(len(directories), len(previous))
+            while common < limit and directories[common] == previous[common]:
+                common += 1
+            while len(stack) > common + 1:
+                _close(stack.pop())
+            for name in directories[common:]:
+                node = TreeNode(name)
+                cast(Children, stack[-1].children).append(node)
+                stack.append(node)
+            previous, previous_directory = directories, directory
 
-        # Create file node
-        file_name = parts[-1]
-        current.children[file_name] = TreeNode(name=file_name, is_dir=False)
+        cast(Children, stack[-1].children).append(TreeNode(file_name, is_dir=False))
 
+    while stack:
+        _close(stack.pop())
     return root_node
 
 
+def add_to_tree(root: TreeNode, relative_path: str) -> None:
+    """Add a file to a tree, creating its parent directories as needed.
+
+    Args:
+    ----
+        root: Root node of the tree
+        relative_path: Slash-separated path of the file relative to the root
+
+    """
+    *directories, file_name = relative_path.split("/")
+    current = root
+    for name in directories:
+        current = current.insert(TreeNode(name))
+    current.insert(TreeNode(file_name, is_dir=False))
+
+
+def remove_from_tree(root: TreeNode, relative_path: str) -> None:
+    """Remove a file from a tree, pruning directories left empty.
+
+    Args:
+    ----
+        root: Root node of the tree
+        relative_path: Slash-separated path of the file relative to the root
+
+    """
+    *directories, file_name = relative_path.split("/")
+    ancestors = [root]
+    for name in directories:
+        child = ancestors[-1].child(name, is_dir=True)
+        if child is None:
+            return
+        ancestors.append(child)
+
+    ancestors[-1].remove(file_name, is_dir=False)
+    for depth in range(len(ancestors) - 1, 0, -1):
+        if ancestors[depth].children:
+            break
+        ancestors[depth - 1].remove(directories[depth - 1], is_dir=True)
+
+
+def count_files(node: TreeNode) -> int:
+    """Count the files in a subtree.
+
+    Args:
+    ----
+        node: Root of the subtree
+
+    Returns:
+    -------
+        Number of file nodes below node, or 1 if node is a file
+
+    """
+    count = 0
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if current.is_dir:
+            pending.extend(current.children)
+        else:
+            count += 1
+    return count
+
+
+def _summary(count: int, more: bool = False) -> str:
+    """Describe files left out of the rendering, e.g. "… 4,312 more files"."""
+    return f"… {count:,} {'more ' if more else ''}{'file' if count == 1 else 'files'}"
+
+
+def _entries(node: TreeNode, depth: int, max_depth: int, max_entries: int) -> List[TreeEntry]:
+    """List what is rendered below a directory: its children or a summary of them.
+
+    Args:
+    ----
+        node: Directory node
+        depth: Depth of node, 0 for the root
+        max_depth: Deepest level whose directories are expanded; 0 for no limit
+        max_entries: Most children shown per directory; 0 for no limit
+
+    Returns:
+    -------
+        Sorted child nodes, with summary lines standing in for omitted ones
+
+    """
+    if max_depth and depth >= max_depth:
+        return [_summary(count_files(node))] if node.children else []
+    children = node.children
+    if max_entries and len(children) > max_entries:
+        hidden = sum(count_files(child) for child in children[max_entries:])
+        return [*children[:max_entries], _summary(hidden, more=True)]
+    return list(children)
+
+
+def iter_tree_lines(
+    node: TreeNode,
+    prefix: str = "",
+    is_last: bool = True,
+    *,
+    max_depth: int = 0,
+    max_entries: int = 0,
+) -> Iterator[str]:
+    """Render a tree line by line, without recursion.
+
+    Each line is produced as it is reached, so trees of any size and depth can
+    be streamed; depth and width limits keep the rendering itself bounded.
+
+    Args:
+    ----
+        node: Root of the tree
+        prefix: Prefix for the first line, empty for a tree of its own
+        is_last: Whether node is the last child of its parent
+        max_depth: Deepest level whose directories are expanded, deeper
+            contents being summarized by their file count; 0 for no limit
+        max_entries: Most children shown per directory, the rest being
+            summarized by their file count; 0 for no limit
+
+    Yields:
+    ------
+        Lines of the rendered tree, each ending with a newline
+
+    """
+    name = f"{node.name}/" if node.is_dir else node.name
+    if prefix:
+        yield f"{prefix}{'└── ' if is_last else '├── '}{name}\n"
+    else:
+        yield f"{name}\n"
+    if not node.is_dir:
+        return
+
+    # Children of a root without prefix are indented like those of a last child
+    root_entries = _entries(node, 0, max_depth, max_entries)
+    root_prefix = prefix + ("    " if is_last else "│   ")
+    stack: List[Tuple[Iterator[Tuple[int, TreeEntry]], int, str, int]] = [
+        (enumerate(root_entries), len(root_entries), root_prefix, 0)
+    ]
+    while stack:
+        entries, count, prefix, depth = stack[-1]
+        item = next(entries, None)
+        if item is None:
+            stack.pop()
+            continue
+
+        index, entry = item
+        is_last = index == count - 1
+        connector = "└── " if is_last else "├── "
+        if isinstance(entry, str):
+            yield f"{prefix}{connector}{entry}\n"
+        elif not entry.is_dir:
+            yield f"{prefix}{connector}{entry.name}\n"
+        else:
+            yield f"{prefix}{connector}{entry.name}/\n"
+            children = _entries(entry, depth + 1, max_depth, max_entries)
+            if children:
+                child_prefix = prefix + ("    " if is_last else "│   ")
+                stack.append((enumerate(children), len(children), child_prefix, depth + 1))
+
+
 def format_tree(
     node: TreeNode,
     prefix: str = "",
     is_last: bool = True,
     include_indicators: bool = True,
+    *,
+    max_depth: int = 0,
+    max_entries: int = 0,
 ) -> str:
     """Format a tree node as a string.
 
@@ -83,43 +367,30 @@ def format_tree(
         prefix: Prefix for current line
         is_last: Whether this is the last child of its parent
         include_indicators: Whether to include file type indicators
+        max_depth: Deepest level whose directories are expanded; 0 for no limit
+        max_entries: Most children shown per directory; 0 for no limit
 
     Returns:
     -------
         Formatted string representation of the tree
 
     """
-    # Sort children: directories first, then files, both alphabetically
-    sorted_children = sorted(node.children.items(), key=lambda x: (not x[1].is_dir, x[0].lower()))
-
-    # Prepare the current line
-    if node.is_dir:
-        name = f"{node.name}/"
-    else:
-        name = node.name
+    return "".join(
+        iter_tree_lines(node, prefix, is_last, max_depth=max_depth, max_entries=max_entries)
+    )
 
-    # Build the line with proper prefixes
-    if prefix:
-        line = prefix + ("└── " if is_last else "├── ") + name + "\n"
-    else:
-        line = name + "\n"
-
-    # Process children
-    children_count = len(sorted_children)
-    for i, (_, child_node) in enumerate(sorted_children):  # Removed unused `child_name`
-        child_prefix = prefix + ("    " if is_last else "│   ")
-        line += format_tree(child_node, child_prefix, i == children_count - 1, include_indicators)
 
-    return line
-
-
-def generate_tree(root: PathLike, files: List[FileInfo]) -> str:
+def generate_tree(
+    root: PathLike, files: List[FileInfo], *, max_depth: int = 0, max_entries: int = 0
+) -> str:
     """Compose a tree representation of the repository structure.
 
     Args:
     ----
         root: Repository root path
         files: List of FileInfo objects
+        max_depth: Deepest level whose directories are expanded; 0 for no limit
+        max_entries: Most children shown per directory; 0 for no limit
 
     Returns:
     -------
@@ -127,4 +398,4 @@ def generate_tree(root: PathLike, files: List[FileInfo]) -> str:
 
     """
     tree = build_tree(root, files)
-    return format_tree(tree)
+    return format_tree(tree, max_depth=max_depth, max_entries=max_entries)
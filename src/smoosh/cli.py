@@ -1,7 +1,13 @@
 """Command line interface for smoosh."""
 
+import codecs
+import io
+import json
+import os
+import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional, cast
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union, cast
 
 import click
 import pyperclip
@@ -11,16 +17,27 @@ from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
 
 from . import AnalysisError, ConfigurationError, GenerationError, __version__
-from .analyzer.repository import analyze_repository
-from .composer.concatenator import concatenate_files
+from .analyzer.repository import RepositoryInfo, analyze_repository
+from .composer.concatenator import write_composition
+from .composer.formatter import STRUCTURED_FORMATS, write_structured
+from .composer.report import DEFAULT_TOP, build_report
+from .composer.stats import CompositionStats
+from .composer.watcher import DEFAULT_INTERVAL, WatchSession
+from .utils.cache import clear_cache, default_cache_dir
 from .utils.config import ConfigDict, load_config
 
 console = Console()
 
+# Used for progress and statistics while the composition is streamed to stdout
+err_console = Console(stderr=True)
 
-def show_welcome() -> None:
+# Value of --output that selects standard output
+STDOUT_PATH = "-"
+
+
+def show_welcome(out: Console = console) -> None:
     """Show welcome message with version."""
-    console.print(
+    out.print(
         Panel.fit(
             f"🐍 [bold green]smoosh v{__version__}[/bold green] - "
             "Making code repositories digestible!",
@@ -29,17 +46,168 @@ def show_welcome() -> None:
     )
 
 
-def show_stats(stats: Dict[str, Any]) -> None:
+def show_stats(stats: Dict[str, Any], out: Console = console) -> None:
     """Display analysis and generation statistics."""
     table = Table(title="Analysis Results", show_header=True)
     table.add_column("Metric", style="cyan")
     table.add_column("Value", style="magenta")
     for key, value in stats.items():
         table.add_row(key, str(value))
-    console.print(table)
+    out.print(table)
+
+
+def show_report(report: Dict[str, Any], out: Console = console) -> None:
+    """Display the top directories, extensions and files by tokens."""
+    total = report["totals"]["tokens"] or 1
+    for group in ("directories", "extensions", "files"):
+        table = Table(title=f"Top {group.capitalize()} by Tokens", show_header=True)
+        table.add_column(group[:-1].capitalize() if group != "directories" else "Directory")
+        for column in ("Tokens", "Share", "Lines", "Bytes"):
+            table.add_column(column, justify="right", style="magenta")
+        for entry in report[group]["tokens"]:
+            table.add_row(
+                entry["path"],
+                f"{entry['tokens']:,}",
+                f"{entry['tokens'] / total:.1%}",
+                f"{entry['lines']:,}",
+                f"{entry['bytes']:,}",
+            )
+        out.print(table)
+    out.print(f"Header and legend: {report['totals']['header_tokens']:,} tokens")
+
+
+def check_options(
+    output: Optional[str],
+    to_stdout: bool,
+    watch: bool,
+    since_and_focus: bool,
+    report: Optional[str],
+    output_format: str = "text",
+) -> bool:
+    """Reject conflicting command line options.
+
+    Args:
+    ----
+        output: Value of --output
+        to_stdout: Whether --stdout was given
+        watch: Whether --watch was given
+        since_and_focus: Whether both --since and --focus were given
+        report: Value of --report
+        output_format: Value of --format
+
+    Returns:
+    -------
+        Whether the output goes to standard output
+
+    Raises:
+    ------
+        click.UsageError: If options conflict
+
+    """
+    if to_stdout and output not in (None, STDOUT_PATH):
+        raise click.UsageError("--stdout cannot be combined with an --output file")
+    to_stdout = to_stdout or output == STDOUT_PATH
+    if since_and_focus:
+        raise click.UsageError("--since cannot be combined with --focus")
+    if watch and to_stdout:
+        raise click.UsageError("--watch needs an --output file or the clipboard")
+    if watch and output_format in STRUCTURED_FORMATS:
+        raise click.UsageError(f"--format {output_format} cannot be combined with --watch")
+    if report and watch:
+        raise click.UsageError("--report cannot be combined with --watch")
+    if report == "json" and to_stdout:
+        raise click.UsageError("--report json writes to standard output; use an --output file")
+    return to_stdout
+
+
+def write_output(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stream: TextIO,
+    output_format: str,
+    stats: CompositionStats,
+) -> Dict[str, Union[str, int]]:
+    """Stream the composition to a text stream in the selected format."""
+    if output_format in STRUCTURED_FORMATS:
+        return write_structured(repo_info, mode, config, stream, output_format, stats)
+    return write_composition(repo_info, mode, config, stream, stats)
+
+
+def apply_overrides(
+    config: ConfigDict,
+    jobs: Optional[int],
+    no_cache: bool,
+    git_index: Optional[bool],
+    untracked: bool,
+    pack: bool = False,
+    since: Optional[str] = None,
+    with_imports: bool = False,
+    focus: Tuple[str, ...] = (),
+    depth: Optional[int] = None,
+) -> None:
+    """Apply command line options on top of the loaded configuration."""
+    if pack:
+        config["output"]["pack"] = True
+    if jobs is not None:
+        config["performance"]["jobs"] = jobs
+    if no_cache:
+        config["cache"]["enabled"] = False
+    if git_index is not None:
+        config["git"]["use_index"] = git_index
+    if untracked:
+        config["git"]["include_untracked"] = True
+    if since:
+        config["git"]["since"] = since
+    if with_imports:
+        config["git"]["with_imports"] = True
+    if focus:
+        config["focus"]["modules"] = list(focus)
+    if depth is not None:
+        config["focus"]["depth"] = depth
+
+
+class DefaultCommandGroup(click.Group):
+    """Click group that falls back to a default command.
+
+    Anything that is not a subcommand name is handed to the default command, so
+    ``smoosh TARGET [OPTIONS]`` keeps working next to ``smoosh cache clear``. A
+    subcommand name shadows a target of the same name, which then has to be
+    given as ``smoosh snapshot cache`` or ``smoosh ./cache``. The group's help
+    shows the default command's usage and options followed by the subcommands.
+    """
+
+    default_command = "snapshot"
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        """Insert the default command unless a subcommand or help is asked for."""
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
 
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        """Describe the default command and list the subcommands."""
+        default = self.commands[self.default_command]
+        formatter.write_usage(ctx.command_path, " ".join(default.collect_usage_pieces(ctx)))
+        formatter.write_usage(ctx.command_path, "COMMAND [ARGS]...", prefix="   or: ")
+        default.format_help_text(ctx, formatter)
+        default.format_options(ctx, formatter)
+        self.format_commands(ctx, formatter)
+        default.format_epilog(ctx, formatter)
 
-@click.command()
+
+@click.group(cls=DefaultCommandGroup)
+def main() -> None:
+    """Smoosh software packages into plaintext summaries on the clipboard."""
+
+
+@main.command(
+    "snapshot",
+    epilog=(
+        "Run 'smoosh cache clear' to delete the analysis cache. A TARGET named like a "
+        "subcommand, e.g. cache, must be given as 'smoosh snapshot cache' or 'smoosh ./cache'."
+    ),
+)
 @click.argument(
     "target",
     type=click.Path(exists=True, file_okay=True, dir_okay=True),
@@ -48,59 +216,316 @@ def show_stats(stats: Dict[str, Any]) -> None:
     "--mode",
     type=click.Choice(["cat", "fold", "smoosh"]),
     default="cat",
-    help="Compression mode (cat: full concatenation, fold/smoosh: coming soon)",
+    help=(
+        "Compression mode (cat: full concatenation, fold: Python signatures and "
+        "docstrings with bodies elided, smoosh: fold plus cross-file deduplication)"
+    ),
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "json", "jsonl"]),
+    default="text",
+    show_default=True,
+    help=(
+        "Output format (text: the composition as one document, json: a document with one "
+        "object per file, jsonl: one JSON record per line)"
+    ),
+)
+@click.option("--output", "-o", type=str, help="Output file path, or '-' for standard output")
+@click.option(
+    "--stdout",
+    "to_stdout",
+    is_flag=True,
+    help="Stream the output to standard output (same as --output -)",
 )
-@click.option("--output", "-o", type=str, help="Output file path")
 @click.option("--force-cat", is_flag=True, help="Override gitignore and size limits")
+@click.option(
+    "--pack",
+    is_flag=True,
+    help="Select the most relevant files to fit output.max_tokens instead of only warning",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=0),
+    help="Number of concurrent workers (default: performance.jobs, 0 for automatic)",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running and recompose the output whenever files change",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.05),
+    default=DEFAULT_INTERVAL,
+    show_default=True,
+    help="Seconds between checks for changes in --watch mode",
+)
+@click.option("--no-cache", is_flag=True, help="Do not read or update the analysis cache")
+@click.option(
+    "--git-index/--no-git-index",
+    default=None,
+    help=(
+        "In git repositories, list tracked files from .git/index instead of walking the tree "
+        "(default: git.use_index, off)"
+    ),
+)
+@click.option(
+    "--untracked", is_flag=True, help="With the git index, also include untracked, unignored files"
+)
+@click.option(
+    "--since",
+    metavar="REF",
+    help="Only include files changed since a git revision, e.g. main or HEAD~3",
+)
+@click.option(
+    "--with-imports",
+    is_flag=True,
+    help="With --since, also include Python modules the changed files import or are imported by",
+)
+@click.option(
+    "--focus",
+    metavar="MODULE",
+    multiple=True,
+    help="Only include a dotted Python module or package and the modules it imports",
+)
+@click.option(
+    "--depth",
+    type=click.IntRange(min=0),
+    help="Levels of imports followed from --focus modules (default: focus.depth)",
+)
+@click.option(
+    "--report",
+    type=click.Choice(["table", "json"]),
+    help=(
+        "Break down the output by directory, extension and file: tables after the "
+        "statistics, or JSON on standard output"
+    ),
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    default=DEFAULT_TOP,
+    show_default=True,
+    help="Entries listed per ranking with --report",
+)
 @click.version_option(version=__version__)
-def main(target: str, mode: str, output: Optional[str], force_cat: bool) -> None:
+def snapshot(
+    target: str,
+    mode: str,
+    output_format: str,
+    output: Optional[str],
+    to_stdout: bool,
+    force_cat: bool,
+    pack: bool,
+    jobs: Optional[int],
+    watch: bool,
+    interval: float,
+    no_cache: bool,
+    git_index: Optional[bool],
+    untracked: bool,
+    since: Optional[str],
+    with_imports: bool,
+    focus: Tuple[str, ...],
+    depth: Optional[int],
+    report: Optional[str],
+    top: int,
+) -> None:
     """Smoosh software packages into plaintext summaries on the clipboard.
 
     TARGET can be a code repository, directory of text files, or a text file.
+    With --stdout or --output -, the output is streamed to standard output as it
+    is produced and progress and statistics go to standard error. With --watch,
+    the output file or clipboard is updated until interrupted. With --report json,
+    the breakdown is written to standard output instead.
     """
-    show_welcome()
+    to_stdout = check_options(
+        output, to_stdout, watch, bool(since and focus), report, output_format
+    )
+    ui = err_console if to_stdout or report == "json" else console
+
+    show_welcome(ui)
 
     try:
         # Convert paths
         target_path = Path(target)
-        output_path = Path(output) if output else None
+        output_path = Path(output) if output and not to_stdout else None
 
         # Load configuration, looking for smoosh.yaml in the directory
         config_dir = target_path if target_path.is_dir() else target_path.parent
         config = cast(ConfigDict, load_config(config_dir))
+        apply_overrides(
+            config, jobs, no_cache, git_index, untracked, pack, since, with_imports, focus, depth
+        )
+        if watch:
+            run_watch(target_path, mode, config, force_cat, output_path, interval)
+            return
 
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
-            console=console,
+            console=ui,
         ) as progress:
             # Analyze repository
             progress.add_task("Analyzing repository...", total=None)
-            repo_info = analyze_repository(target_path, config, force_cat)
+            # File contents are read as the composition is written, so only the
+            # output itself is ever held in memory as a whole. Small files read
+            # while probing are kept for composition unless packing may drop them
+            repo_info = analyze_repository(
+                target_path, config, force_cat, prefetch=not config["output"]["pack"]
+            )
 
             # Compose output
             progress.add_task("Generating summary...", total=None)
-            result, stats = concatenate_files(repo_info, mode, config)
-
-            # Handle output
-            if output_path:
-                output_path.write_text(result)
-                console.print(f"✨ Output written to: [bold blue]{output_path}[/bold blue]")
+            collector = CompositionStats.for_config(config)
+            if to_stdout:
+                stream = utf8_stdout()
+                stats = write_output(repo_info, mode, config, stream, output_format, collector)
+                stream.flush()
+            elif output_path:
+                with open(output_path, "w", encoding="utf-8") as stream:
+                    stats = write_output(repo_info, mode, config, stream, output_format, collector)
+                ui.print(f"✨ Output written to: [bold blue]{output_path}[/bold blue]")
             else:
-                pyperclip.copy(result)
-                console.print("✨ Output copied to clipboard!")
+                buffer = io.StringIO()
+                stats = write_output(repo_info, mode, config, buffer, output_format, collector)
+                pyperclip.copy(buffer.getvalue())
+                ui.print("✨ Output copied to clipboard!")
 
             # Show statistics
-            show_stats(stats)
+            show_stats(stats, ui)
+            if report == "table":
+                show_report(build_report(collector, top), ui)
+            elif report == "json":
+                click.echo(json.dumps(build_report(collector, top), indent=2))
 
+    except BrokenPipeError:
+        # The reader went away (e.g. `smoosh repo | head`); silence the final
+        # flush at interpreter exit, which would fail again
+        _discard_stdout()
+        sys.exit(1)
     except (ConfigurationError, AnalysisError, GenerationError) as e:
-        console.print(f"[bold red]Error:[/bold red] {e!s}")
+        ui.print(f"[bold red]Error:[/bold red] {e!s}")
         raise click.Abort() from e
     except Exception as e:
-        console.print("[bold red]An unexpected error occurred![/bold red]")
-        console.print(f"[red]{e!s}[/red]")
+        ui.print("[bold red]An unexpected error occurred![/bold red]")
+        ui.print(f"[red]{e!s}[/red]")
         raise click.Abort() from e
 
 
+def _publish(session: WatchSession, output_path: Optional[Path]) -> None:
+    """Write the composition of a watch session to its file or the clipboard."""
+    if output_path:
+        session.write_file(output_path)
+    else:
+        pyperclip.copy(session.render())
+
+
+def run_watch(
+    target_path: Path,
+    mode: str,
+    config: ConfigDict,
+    force_cat: bool,
+    output_path: Optional[Path],
+    interval: float,
+) -> None:
+    """Compose a repository and keep recomposing it as files change.
+
+    Runs until interrupted with Ctrl+C.
+
+    Args:
+    ----
+        target_path: Repository to watch
+        mode: Composition mode
+        config: Configuration dictionary
+        force_cat: Whether to ignore gitignore rules and size limits
+        output_path: File to keep up to date, or None for the clipboard
+        interval: Seconds between checks for changes
+
+    """
+    destination = f"[bold blue]{output_path}[/bold blue]" if output_path else "the clipboard"
+    with console.status("Analyzing repository..."):
+        session = WatchSession(target_path, mode, config, force_cat, output_path)
+        _publish(session, output_path)
+    console.print(f"👀 Watching {session.repo_info.root} and updating {destination}")
+    console.print("Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(interval)
+            update = session.poll()
+            if update is None:
+                continue
+            _publish(session, output_path)
+            how = "rebuilt" if update.rebuilt else "recomposed"
+            console.print(
+                f"🔄 {update.changed} changed, {update.removed} removed: "
+                f"{how} in {update.seconds * 1000:.0f} ms"
+            )
+    except KeyboardInterrupt:
+        console.print("Stopped watching.")
+
+
+def utf8_stdout() -> TextIO:
+    """Return standard output, switched to UTF-8 like output files regardless of the locale."""
+    stream = sys.stdout
+    if isinstance(stream, io.TextIOWrapper):
+        try:
+            is_utf8 = codecs.lookup(stream.encoding).name == "utf-8"
+        except LookupError:
+            is_utf8 = False
+        if not is_utf8:
+            stream.reconfigure(encoding="utf-8")
+    return stream
+
+
+def _discard_stdout() -> None:
+    """Point the stdout file descriptor at the null device."""
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except (OSError, ValueError):
+        pass
+
+
+@main.group("cache")
+def cache() -> None:
+    """Manage the persistent analysis cache."""
+
+
+@cache.command("clear")
+@click.argument(
+    "target", required=False, default=".", type=click.Path(exists=True, file_okay=False)
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help=(
+        "Cache directory (default: cache.directory from TARGET's smoosh.yaml, else "
+        "$XDG_CACHE_HOME/smoosh or ~/.cache/smoosh)"
+    ),
+)
+def cache_clear(target: str, cache_dir: Optional[str]) -> None:
+    """Delete all cached analysis results.
+
+    The cache directory is the one snapshots of TARGET (default: the current
+    directory) use, as configured in its smoosh.yaml.
+    """
+    if cache_dir:
+        directory = Path(cache_dir)
+    else:
+        try:
+            config = cast(ConfigDict, load_config(Path(target)))
+        except ConfigurationError as e:
+            console.print(f"[bold red]Error:[/bold red] {e!s}")
+            raise click.Abort() from e
+        configured = config["cache"]["directory"]
+        directory = Path(configured) if configured else default_cache_dir()
+    removed = clear_cache(directory)
+    console.print(f"🧹 Removed {removed} cache file(s) from [bold blue]{directory}[/bold blue]")
+
+
 if __name__ == "__main__":
     main()
@@ -13,6 +13,6 @@ repository content and arranging it into useful, digestible formats.
 """
 
 from .concatenator import concatenate_files
-from .formatter import format_output
+from .formatter import format_output, write_structured
 
-__all__ = ["concatenate_files", "format_output"]
+__all__ = ["concatenate_files", "format_output", "write_structured"]
@@ -1,11 +1,30 @@
 """Repository content composition functionality for smoosh."""
 
-from typing import Dict, Tuple, Union
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 from .. import GenerationError
-from ..analyzer.repository import RepositoryInfo, load_file_contents
+from ..analyzer.repository import RepositoryInfo, iter_file_contents, iter_file_sources
+from ..custom_types import FileInfo
+from ..utils.cache import MemoryStore
 from ..utils.config import ConfigDict
 from ..utils.logger import logger
+from ..utils.zerocopy import binary_output
+from .deduplicator import RedundancyIndex, build_index
+from .folder import FoldResult, fold_store, iter_folded
+from .packer import LEVEL_FOLD, LEVEL_OMIT, PackPlan, pack_files
+from .stats import CompositionStats
 
 
 class CompositionError(GenerationError):
@@ -14,59 +33,218 @@ class CompositionError(GenerationError):
     pass
 
 
-def concatenate_files(
-    repo_info: RepositoryInfo, mode: str, config: ConfigDict
-) -> Tuple[str, Dict[str, Union[str, int]]]:
-    """Compose repository files into a single coherent representation.
+def iter_composition(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stats: Optional[CompositionStats] = None,
+) -> Iterator[str]:
+    """Produce the composition as a stream of chunks.
+
+    File contents that are not already loaded are read a few files ahead and
+    dropped once emitted, so memory is bounded by the largest files rather
+    than the whole repository. With output.pack set, files are first packed
+    to fit output.max_tokens.
+
+    Args:
+    ----
+        repo_info: Repository information
+        mode: Composition mode ('cat', 'fold', or 'smoosh')
+        config: Configuration dictionary
+        stats: Accumulator updated as chunks are produced
+
+    Yields:
+    ------
+        Consecutive chunks of the composition
+
+    """
+    stats = stats if stats is not None else CompositionStats.for_config(config)
+
+    header, plan = planned_header(repo_info, mode, config, stats)
+    yield header
+    yield "\n\n"
+
+    jobs = config["performance"]["jobs"]
+    for chunk in iter_content(repo_info, mode, jobs, stats, plan):
+        stats.add_composed(chunk)
+        stats.add_tokens(chunk)
+        yield chunk
+
+    check_budget(config, stats)
+
+
+def planned_tree(repo_info: RepositoryInfo, config: ConfigDict) -> str:
+    """Render the repository structure with the configured limits."""
+    return repo_info.get_tree_representation(
+        max_depth=config["tree"]["max_depth"], max_entries=config["tree"]["max_entries"]
+    )
+
+
+def planned_header(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stats: CompositionStats,
+    tree: Optional[str] = None,
+) -> Tuple[str, Optional[PackPlan]]:
+    """Compose the header, packing the files first if output.pack is set."""
+    tree = planned_tree(repo_info, config) if tree is None else tree
+    header = compose_header(repo_info, mode, tree=tree)
+    plan: Optional[PackPlan] = None
+    if config["output"].get("pack") and config["output"].get("max_tokens"):
+        plan = pack_files(repo_info, config, stats.counter, mode, stats.counter.count(header))
+        header = compose_header(repo_info, mode, plan, tree)
+    stats.add_tokens(header)
+    return header, plan
+
+
+def check_budget(config: ConfigDict, stats: CompositionStats) -> None:
+    """Warn if the composition is over output.max_tokens."""
+    max_tokens = config["output"].get("max_tokens")
+    if max_tokens and stats.tokens > max_tokens:
+        logger.warning(
+            f"Composition exceeds max_tokens ({max_tokens}). "
+            "Consider using a different mode or adjusting the limit."
+        )
+
+
+def _write_cat_zero_copy(
+    repo_info: RepositoryInfo,
+    config: ConfigDict,
+    stream: TextIO,
+    out: BinaryIO,
+    stats: CompositionStats,
+) -> None:
+    """Write a cat mode composition, copying large UTF-8 files without decoding them.
+
+    Produces exactly what iter_composition would: mapped files are only used
+    when their bytes equal the encoded text, and their statistics are counted
+    from the bytes.
+    """
+    header, _ = planned_header(repo_info, "cat", config, stats)
+    stream.write(header)
+    stream.write("\n\n")
+
+    separator = "\n"
+    for file_info, content in iter_file_sources(repo_info.files, config["performance"]["jobs"]):
+        if content is None:
+            continue
+        if isinstance(content, str):
+            stats.add_file(file_info, content)
+        else:
+            stats.add_mapped(file_info, content)
+        marker = separator + section_marker(file_info.relative_path)
+        stream.write(marker)
+        stats.add_composed(marker)
+        stats.add_tokens(marker)
+        if isinstance(content, str):
+            stream.write(content)
+            stats.add_composed(content)
+            stats.add_tokens(content)
+        else:
+            try:
+                stats.add_composed_mapped(content)
+                stream.flush()
+                content.write_to(out)
+            finally:
+                content.close()
+        separator = "\n\n"
+
+    check_budget(config, stats)
+
+
+def write_composition(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stream: TextIO,
+    stats: Optional[CompositionStats] = None,
+) -> Dict[str, Union[str, int]]:
+    """Stream the composition to a text stream without building it in memory.
 
     Args:
     ----
         repo_info: Repository information
         mode: Composition mode ('cat', 'fold', or 'smoosh')
         config: Configuration dictionary
+        stream: Writable text stream, e.g. an open output file or stdout
+        stats: Accumulator to fill, e.g. to inspect per-file statistics afterwards
 
     Returns:
     -------
-        Tuple of (composed content, statistics dictionary)
+        Statistics dictionary
 
     Raises:
     ------
         CompositionError: If composition fails
+        BrokenPipeError: If the reading end of a pipe is closed
 
     """
     try:
-        # Load file contents if not already loaded
-        load_file_contents(repo_info)
+        stats = stats if stats is not None else CompositionStats.for_config(config)
+        # Cat mode copies large files to the output as they are when it can
+        out = binary_output(stream) if mode == "cat" and not config["output"].get("pack") else None
+        if out is not None:
+            _write_cat_zero_copy(repo_info, config, stream, out, stats)
+        else:
+            for chunk in iter_composition(repo_info, mode, config, stats):
+                stream.write(chunk)
+        return stats.as_dict(repo_info)
+
+    except BrokenPipeError:
+        # The consumer closed the stream; let the caller decide how to exit
+        raise
+    except Exception as e:
+        raise CompositionError(f"Failed to compose repository content: {e}") from e
+
+
+def concatenate_files(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stats: Optional[CompositionStats] = None,
+) -> Tuple[str, Dict[str, Union[str, int]]]:
+    """Compose repository files into a single coherent representation.
 
-        # Compose the parts
-        header = compose_header(repo_info, mode)
-        content = compose_content(repo_info, mode)
-        stats = gather_statistics(repo_info, content)
+    Args:
+    ----
+        repo_info: Repository information
+        mode: Composition mode ('cat', 'fold', or 'smoosh')
+        config: Configuration dictionary
+        stats: Accumulator to fill, e.g. to inspect per-file statistics afterwards
 
-        # Combine all parts
-        full_composition = f"{header}\n\n{content}"
+    Returns:
+    -------
+        Tuple of (composed content, statistics dictionary)
 
-        # Check against max tokens if configured
-        max_tokens = config["output"].get("max_tokens")
-        if max_tokens and len(full_composition.split()) > max_tokens:
-            logger.warning(
-                f"Composition exceeds max_tokens ({max_tokens}). "
-                "Consider using a different mode or adjusting the limit."
-            )
+    Raises:
+    ------
+        CompositionError: If composition fails
 
-        return full_composition, stats
+    """
+    try:
+        stats = stats if stats is not None else CompositionStats.for_config(config)
+        full_composition = "".join(iter_composition(repo_info, mode, config, stats))
+        return full_composition, stats.as_dict(repo_info)
 
     except Exception as e:
         raise CompositionError(f"Failed to compose repository content: {e}") from e
 
 
-def compose_header(repo_info: RepositoryInfo, mode: str) -> str:
+def compose_header(
+    repo_info: RepositoryInfo,
+    mode: str,
+    plan: Optional[PackPlan] = None,
+    tree: Optional[str] = None,
+) -> str:
     """Compose the header section.
 
     Args:
     ----
         repo_info: Repository information
         mode: Composition mode
+        plan: Packing plan, summarized in the header if given
+        tree: Rendered repository structure, generated from the files if None
 
     Returns:
     -------
@@ -78,9 +256,10 @@ def compose_header(repo_info: RepositoryInfo, mode: str) -> str:
         f"Mode: {mode}",
         f"Files: {repo_info.total_files_count} ({repo_info.python_files_count} Python)",
         f"Total Size: {repo_info.total_size_mb:.2f}MB",
+        *([plan.summary()] if plan is not None else []),
         "",
         "Repository Structure:",
-        repo_info.get_tree_representation(),
+        repo_info.get_tree_representation() if tree is None else tree,
     ]
 
     return "\n".join(header)
@@ -98,17 +277,188 @@ def compose_content(repo_info: RepositoryInfo, mode: str) -> str:
     -------
         Composed content string
 
+    """
+    return "".join(iter_content(repo_info, mode))
+
+
+def iter_content(
+    repo_info: RepositoryInfo,
+    mode: str,
+    jobs: Optional[int] = None,
+    stats: Optional[CompositionStats] = None,
+    plan: Optional[PackPlan] = None,
+) -> Iterator[str]:
+    """Stream the main content based on the specified mode.
+
+    Args:
+    ----
+        repo_info: Repository information
+        mode: Composition mode
+        jobs: Number of reader threads for files whose content is not loaded
+        stats: Accumulator receiving the original content of each file
+        plan: Packing plan selecting the files to include, all files if None
+
+    Returns:
+    -------
+        Iterator over content chunks
+
     """
     if mode == "cat":
-        return compose_cat_mode(repo_info)
+        return iter_cat_mode(repo_info, jobs, stats, plan)
     elif mode == "fold":
-        return compose_fold_mode(repo_info)
+        return iter_fold_mode(repo_info, jobs, stats, plan)
     elif mode == "smoosh":
-        return compose_smoosh_mode(repo_info)
+        return iter_smoosh_mode(repo_info, jobs, stats, plan)
     else:
         raise CompositionError(f"Unknown composition mode: {mode}")
 
 
+def section_marker(relative_path: str, note: str = "") -> str:
+    """Return the line introducing the section of a file."""
+    return f"### File: {relative_path}{note} ###\n"
+
+
+class Section(NamedTuple):
+    """What a composition holds for one file."""
+
+    file_info: FileInfo
+    # Content as composed, None for a file identical to an earlier one
+    text: Optional[str]
+    folded: bool = False
+    same_as: Optional[str] = None
+
+    @property
+    def note(self) -> str:
+        """Annotation of the section marker."""
+        if self.same_as is not None:
+            return f" (same as {self.same_as})"
+        return " (folded)" if self.folded else ""
+
+
+# Label, number of files and block of a legend entry
+LegendEntry = Tuple[str, int, str]
+
+
+def _iter_file_sections(
+    results: Iterable[FoldResult],
+    stats: Optional[CompositionStats] = None,
+    index: Optional[RedundancyIndex] = None,
+) -> Iterator[Section]:
+    """Stream one section per file, using the folded content where there is one.
+
+    With a redundancy index, identical files are replaced by a reference to
+    their first occurrence and repeated blocks by references to the legend.
+    """
+    for file_info, content, folded in results:
+        if stats is not None:
+            stats.add_file(file_info, content)
+
+        original = index.duplicate_of(file_info.relative_path) if index is not None else None
+        if original is not None:
+            yield Section(file_info, None, same_as=original)
+        else:
+            text = content if folded is None else folded
+            if index is not None:
+                text = index.substitute(text, file_info.is_python)
+            yield Section(file_info, text, folded is not None)
+
+
+def _iter_sections(
+    results: Iterable[FoldResult],
+    stats: Optional[CompositionStats] = None,
+    index: Optional[RedundancyIndex] = None,
+    separator: str = "\n",
+) -> Iterator[str]:
+    """Stream the marker and text of each file's section."""
+    for section in _iter_file_sections(results, stats, index):
+        yield separator + section_marker(section.file_info.relative_path, section.note)
+        if section.text is not None:
+            yield section.text
+        separator = "\n\n"
+
+
+def iter_file_sections(
+    repo_info: RepositoryInfo,
+    mode: str,
+    jobs: Optional[int] = None,
+    stats: Optional[CompositionStats] = None,
+    plan: Optional[PackPlan] = None,
+) -> Tuple[List[LegendEntry], Iterator[Section]]:
+    """Compose the content file by file, for structured output formats.
+
+    Args:
+    ----
+        repo_info: Repository information
+        mode: Composition mode
+        jobs: Number of reader threads and parser processes
+        stats: Accumulator receiving the original content of each file
+        plan: Packing plan selecting the files to include
+
+    Returns:
+    -------
+        Tuple of (legend of smoosh mode, iterator over the sections of the files)
+
+    """
+    if mode == "cat":
+        return [], _iter_file_sections(_cat_results(repo_info, jobs, plan), stats)
+    elif mode == "fold":
+        return [], _iter_file_sections(_fold_results(repo_info, jobs, plan), stats)
+    elif mode == "smoosh":
+        index, folded = _smoosh_results(repo_info, jobs, plan)
+        return index.legend(), _iter_file_sections(folded, stats, index)
+    else:
+        raise CompositionError(f"Unknown composition mode: {mode}")
+
+
+def _fold_predicate(plan: Optional[PackPlan]) -> Callable[[FileInfo], bool]:
+    """Return which files fold and smoosh modes fold: the plan's, or all Python files."""
+    if plan is not None:
+        return lambda file_info: plan.level(file_info) == LEVEL_FOLD
+    return lambda file_info: file_info.is_python
+
+
+def _planned_files(repo_info: RepositoryInfo, plan: Optional[PackPlan]) -> List[FileInfo]:
+    """Return the files to compose, leaving out those the plan omits."""
+    if plan is None:
+        return repo_info.files
+    return [f for f in repo_info.files if plan.level(f) != LEVEL_OMIT]
+
+
+def iter_cat_mode(
+    repo_info: RepositoryInfo,
+    jobs: Optional[int] = None,
+    stats: Optional[CompositionStats] = None,
+    plan: Optional[PackPlan] = None,
+) -> Iterator[str]:
+    """Stream content in full concatenation mode.
+
+    Args:
+    ----
+        repo_info: Repository information
+        jobs: Number of reader threads for files whose content is not loaded
+        stats: Accumulator receiving the original content and token count of each file
+        plan: Packing plan; files it omits are skipped and those it folds are folded
+
+    Yields:
+    ------
+        A separator and header chunk followed by the content of each file
+
+    """
+    yield from _iter_sections(_cat_results(repo_info, jobs, plan), stats)
+
+
+def _cat_results(
+    repo_info: RepositoryInfo, jobs: Optional[int], plan: Optional[PackPlan]
+) -> Iterable[FoldResult]:
+    """Read the files of cat mode, folding only those the plan folds."""
+    pairs = iter_file_contents(_planned_files(repo_info, plan), jobs)
+    if plan is not None and plan.count(LEVEL_FOLD):
+        return iter_folded(
+            pairs, lambda f: plan.level(f) == LEVEL_FOLD, jobs, fold_store(repo_info)
+        )
+    return ((file_info, content, None) for file_info, content in pairs if content is not None)
+
+
 def compose_cat_mode(repo_info: RepositoryInfo) -> str:
     """Compose content in full concatenation mode.
 
@@ -121,19 +471,45 @@ def compose_cat_mode(repo_info: RepositoryInfo) -> str:
         Concatenated content
 
     """
-    sections = []
+    return "".join(iter_cat_mode(repo_info))
 
-    for file_info in repo_info.files:
-        if file_info.content is None:
-            continue
 
-        sections.extend(["", f"### File: {file_info.relative_path} ###", file_info.content])
+def iter_fold_mode(
+    repo_info: RepositoryInfo,
+    jobs: Optional[int] = None,
+    stats: Optional[CompositionStats] = None,
+    plan: Optional[PackPlan] = None,
+) -> Iterator[str]:
+    """Stream content in structure-preserving mode.
+
+    Python files are folded to their imports, signatures and docstring
+    summaries; other files and Python files that fail to parse are kept in full.
+
+    Args:
+    ----
+        repo_info: Repository information
+        jobs: Number of reader threads and parser processes
+        stats: Accumulator receiving the original content of each file
+        plan: Packing plan selecting the files to include
+
+    Returns:
+    -------
+        Iterator over structure-preserved content chunks
+
+    """
+    return _iter_sections(_fold_results(repo_info, jobs, plan), stats)
 
-    return "\n".join(sections)
+
+def _fold_results(
+    repo_info: RepositoryInfo, jobs: Optional[int], plan: Optional[PackPlan]
+) -> Iterable[FoldResult]:
+    """Read the files of fold mode, folding Python files or those the plan folds."""
+    pairs = iter_file_contents(_planned_files(repo_info, plan), jobs)
+    return iter_folded(pairs, _fold_predicate(plan), jobs, fold_store(repo_info))
 
 
 def compose_fold_mode(repo_info: RepositoryInfo) -> str:
-    """Compose content in structure-preserving mode (placeholder).
+    """Compose content in structure-preserving mode.
 
     Args:
     ----
@@ -144,59 +520,71 @@ def compose_fold_mode(repo_info: RepositoryInfo) -> str:
         Structure-preserved content
 
     """
-    # TODO: Implement fold mode composition
-    return compose_cat_mode(repo_info)
+    return "".join(iter_fold_mode(repo_info))
 
 
-def compose_smoosh_mode(repo_info: RepositoryInfo) -> str:
-    """Compose content in maximum compression mode (placeholder).
+def iter_smoosh_mode(
+    repo_info: RepositoryInfo,
+    jobs: Optional[int] = None,
+    stats: Optional[CompositionStats] = None,
+    plan: Optional[PackPlan] = None,
+) -> Iterator[str]:
+    """Stream content in maximum compression mode.
+
+    Builds on fold mode and removes redundancy across files: identical files
+    are emitted once and referenced afterwards, and license headers,
+    boilerplate and import blocks repeated in several files are hoisted into a
+    legend at the top. A first pass indexes content hashes, the second emits.
 
     Args:
     ----
         repo_info: Repository information
+        jobs: Number of reader threads and parser processes
+        stats: Accumulator receiving the original content of each file
+        plan: Packing plan selecting the files to include
 
-    Returns:
-    -------
-        Compressed content
+    Yields:
+    ------
+        The legend, if any, followed by compressed content chunks
 
     """
-    # TODO: Implement smoosh mode composition
-    return compose_cat_mode(repo_info)
+    index, folded = _smoosh_results(repo_info, jobs, plan)
+
+    separator = "\n"
+    legend = index.legend()
+    if legend:
+        entries = [
+            f"[{label}] (in {count} files)\n{block.rstrip()}" for label, count, block in legend
+        ]
+        yield "\n### Legend ###\n" + "\n\n".join(entries)
+        separator = "\n\n"
 
+    yield from _iter_sections(folded, stats, index, separator)
 
-def gather_statistics(repo_info: RepositoryInfo, content: str) -> Dict[str, Union[str, int]]:
-    """Gather statistics about the composed content.
+
+def _smoosh_results(
+    repo_info: RepositoryInfo, jobs: Optional[int], plan: Optional[PackPlan]
+) -> Tuple[RedundancyIndex, Iterable[FoldResult]]:
+    """Index the redundancy across files, then read them again to emit them."""
+    files = _planned_files(repo_info, plan)
+    should_fold = _fold_predicate(plan)
+    # Without the fold cache, keep this run's folds so the second pass does not parse again
+    store = fold_store(repo_info) or MemoryStore()
+
+    index = build_index(iter_folded(iter_file_contents(files, jobs), should_fold, jobs, store))
+    return index, iter_folded(iter_file_contents(files, jobs), should_fold, jobs, store)
+
+
+def compose_smoosh_mode(repo_info: RepositoryInfo) -> str:
+    """Compose content in maximum compression mode.
 
     Args:
     ----
         repo_info: Repository information
-        content: Composed content
 
     Returns:
     -------
-        Dictionary of statistics
+        Compressed content
 
     """
-    # Calculate original sizes
-    original_lines = sum(
-        len(f.content.splitlines()) for f in repo_info.files if f.content is not None
-    )
-    original_chars = sum(len(f.content) for f in repo_info.files if f.content is not None)
-
-    # Calculate composition sizes
-    composed_lines = len(content.splitlines())
-    composed_chars = len(content)
-
-    return {
-        "Repository Size": f"{repo_info.total_size_mb:.2f}MB",
-        "Total Files": repo_info.total_files_count,
-        "Python Files": repo_info.python_files_count,
-        "Original Lines": original_lines,
-        "Composed Lines": composed_lines,
-        "Original Characters": original_chars,
-        "Composed Characters": composed_chars,
-        "Lines Ratio": (f"{composed_lines / original_lines:.2f}x" if original_lines else "N/A"),
-        "Characters Ratio": (
-            f"{composed_chars / original_chars:.2f}x" if original_chars else "N/A"
-        ),
-    }
+    return "".join(iter_smoosh_mode(repo_info))
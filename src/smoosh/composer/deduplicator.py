@@ -0,0 +1,199 @@
+"""Cross-file redundancy removal for smoosh mode."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..utils.file_utils import hash_content
+from .folder import FoldResult
+
+# Blocks shorter than this many lines are not worth a legend entry
+MIN_BLOCK_LINES = 3
+
+# Prefixes of comment lines that make up license headers and boilerplate
+COMMENT_PREFIXES = ("#", "//", "/*", "*", "*/", "--", ";", "<!--", "-->", "'''", '"""')
+
+IMPORT_PREFIXES = ("import ", "from ")
+
+KIND_HEADER = "H"
+KIND_IMPORTS = "I"
+
+
+def _hash(text: str) -> str:
+    """Return the content hash of text."""
+    return hash_content(text.encode("utf-8", errors="surrogatepass"))
+
+
+def _line_end(text: str, start: int) -> int:
+    """Return the index just past the line starting at start."""
+    end = text.find("\n", start)
+    return len(text) if end == -1 else end + 1
+
+
+def _docstring_end(text: str) -> int:
+    """Return the end of a leading triple-quoted string, or 0 if there is none."""
+    for quote in ('"""', "'''"):
+        if text.startswith(quote):
+            close = text.find(quote, len(quote))
+            return 0 if close == -1 else _line_end(text, close + len(quote))
+    return 0
+
+
+def leading_header(text: str) -> str:
+    """Return the leading comment or docstring block of a file, if long enough.
+
+    Args:
+    ----
+        text: File content
+
+    Returns:
+    -------
+        The block including its final newline, or an empty string
+
+    """
+    end = _docstring_end(text)
+    if not end:
+        while end < len(text):
+            line_end = _line_end(text, end)
+            if not text[end:line_end].lstrip().startswith(COMMENT_PREFIXES):
+                break
+            end = line_end
+    block = text[:end]
+    return block if block.count("\n") >= MIN_BLOCK_LINES else ""
+
+
+def import_block(text: str) -> Tuple[int, str]:
+    """Return the first run of consecutive import lines, if long enough.
+
+    Args:
+    ----
+        text: Python source, typically folded
+
+    Returns:
+    -------
+        (offset, block) with the block including its final newline, or (0, "")
+
+    """
+    start = end = lines = 0
+    pos = 0
+    while pos < len(text):
+        line_end = _line_end(text, pos)
+        if text.startswith(IMPORT_PREFIXES, pos):
+            if not lines:
+                start = pos
+            end = line_end
+            lines += 1
+        elif lines:
+            break
+        pos = line_end
+    if lines < MIN_BLOCK_LINES:
+        return 0, ""
+    return start, text[start:end]
+
+
+@dataclass
+class RedundancyIndex:
+    """Content-hash index of identical files and blocks repeated across files.
+
+    Built in one pass over all files, with memory proportional to the number
+    of distinct blocks rather than to the size of the repository.
+    """
+
+    first_by_hash: Dict[str, str] = field(default_factory=dict)
+    duplicates: Dict[str, str] = field(default_factory=dict)
+    block_counts: Dict[str, int] = field(default_factory=dict)
+    block_text: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    def _count_block(self, kind: str, block: str) -> None:
+        """Count an occurrence of a block, remembering its text the first time."""
+        if not block:
+            return
+        key = _hash(block)
+        self.block_counts[key] = self.block_counts.get(key, 0) + 1
+        self.block_text.setdefault(key, (kind, block))
+
+    def add(self, relative_path: str, content: str, text: str, is_python: bool) -> None:
+        """Index a file.
+
+        Args:
+        ----
+            relative_path: Path of the file
+            content: Original content, used to recognize identical files
+            text: Content as it will be emitted, e.g. folded
+            is_python: Whether the file is Python, whose imports are indexed
+
+        """
+        if content.strip():
+            content_key = _hash(content)
+            first = self.first_by_hash.setdefault(content_key, relative_path)
+            if first != relative_path:
+                self.duplicates[relative_path] = first
+                return
+
+        self._count_block(KIND_HEADER, leading_header(text))
+        if is_python:
+            self._count_block(KIND_IMPORTS, import_block(text)[1])
+
+    def finalize(self) -> None:
+        """Label the blocks that occur in more than one file."""
+        numbers = {KIND_HEADER: 0, KIND_IMPORTS: 0}
+        for key, (kind, _) in self.block_text.items():
+            if self.block_counts[key] > 1:
+                numbers[kind] += 1
+                self.labels[key] = f"{kind}{numbers[kind]}"
+
+    def legend(self) -> List[Tuple[str, int, str]]:
+        """Return (label, occurrences, block) of every labelled block."""
+        return [
+            (label, self.block_counts[key], self.block_text[key][1])
+            for key, label in self.labels.items()
+        ]
+
+    def duplicate_of(self, relative_path: str) -> Optional[str]:
+        """Return the earlier file identical to a file, if any."""
+        return self.duplicates.get(relative_path)
+
+    def substitute(self, text: str, is_python: bool) -> str:
+        """Replace legend blocks in the text of a file with references.
+
+        Args:
+        ----
+            text: Content as it is emitted
+            is_python: Whether the file is Python
+
+        Returns:
+        -------
+            Text with repeated header and import blocks replaced
+
+        """
+        header = leading_header(text)
+        label = self.labels.get(_hash(header)) if header else None
+        if label is not None:
+            text = f"[{label}]\n{text[len(header) :]}"
+
+        if is_python:
+            start, block = import_block(text)
+            label = self.labels.get(_hash(block)) if block else None
+            if label is not None:
+                text = f"{text[:start]}[{label}]\n{text[start + len(block) :]}"
+        return text
+
+
+def build_index(results: Iterable[FoldResult]) -> RedundancyIndex:
+    """Index the files of a composition.
+
+    Args:
+    ----
+        results: (file_info, content, folded) triples in output order
+
+    Returns:
+    -------
+        Finalized redundancy index
+
+    """
+    index = RedundancyIndex()
+    for file_info, content, folded in results:
+        text = folded if folded is not None else content
+        index.add(file_info.relative_path, content, text, file_info.is_python)
+    index.finalize()
+    return index
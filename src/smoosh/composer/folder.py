@@ -0,0 +1,235 @@
+"""Structure-preserving folding of Python source for smoosh."""
+
+import ast
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..analyzer.repository import RepositoryInfo
+from ..custom_types import FileInfo
+from ..utils.cache import ContentStore
+from ..utils.concurrency import BatchedProcessPool
+from ..utils.file_utils import hash_content
+
+# Bump whenever the folded output changes so stored folds are not reused
+FOLD_VERSION = 1
+
+# Namespace of folded sources in the content-addressed cache
+FOLD_STORE = "fold"
+
+# Module-level assignments up to this length are kept as constants
+MAX_ASSIGNMENT_LENGTH = 100
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _ellipsis() -> ast.stmt:
+    """Return a ``...`` statement standing in for an elided body."""
+    return ast.Expr(value=ast.Constant(value=...))
+
+
+def _docstring(body: List[ast.stmt], summary_only: bool) -> List[ast.stmt]:
+    """Return the docstring statement of a body, if any."""
+    if not body:
+        return []
+    first = body[0]
+    if not (
+        isinstance(first, ast.Expr)
+        and isinstance(first.value, ast.Constant)
+        and isinstance(first.value.value, str)
+    ):
+        return []
+    if not summary_only:
+        return [first]
+    lines = [line.strip() for line in first.value.value.strip().splitlines()]
+    return [ast.Expr(value=ast.Constant(value=lines[0] if lines else ""))]
+
+
+def _fold_function(node: Union[ast.FunctionDef, ast.AsyncFunctionDef]) -> ast.stmt:
+    """Keep a function's decorators, signature and docstring summary."""
+    node.body = [*_docstring(node.body, summary_only=True), _ellipsis()]
+    return node
+
+
+def _fold_class(node: ast.ClassDef) -> ast.stmt:
+    """Keep a class's decorators, bases, docstring summary, fields and methods."""
+    body = _docstring(node.body, summary_only=True)
+    for child in node.body:
+        if isinstance(child, _FUNCTION_NODES):
+            body.append(_fold_function(child))
+        elif isinstance(child, ast.ClassDef):
+            body.append(_fold_class(child))
+        elif isinstance(child, ast.AnnAssign):
+            # Annotated class attributes are the fields of dataclasses and the like
+            body.append(child)
+    node.body = body or [_ellipsis()]
+    return node
+
+
+def _is_short_assignment(node: Union[ast.Assign, ast.AnnAssign]) -> bool:
+    """Whether an assignment is ``__all__`` or a one-line constant or type alias."""
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    if not all(isinstance(target, ast.Name) for target in targets):
+        return False
+    if any(isinstance(target, ast.Name) and target.id == "__all__" for target in targets):
+        return True
+    return len(ast.unparse(node)) <= MAX_ASSIGNMENT_LENGTH
+
+
+def _fold_block(body: List[ast.stmt]) -> List[ast.stmt]:
+    """Fold the statements of a module-level block."""
+    folded: List[ast.stmt] = []
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            folded.append(node)
+        elif isinstance(node, _FUNCTION_NODES):
+            folded.append(_fold_function(node))
+        elif isinstance(node, ast.ClassDef):
+            folded.append(_fold_class(node))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)) and _is_short_assignment(node):
+            folded.append(node)
+        elif isinstance(node, (ast.If, ast.Try)):
+            # Conditional and guarded imports, e.g. under TYPE_CHECKING
+            kept = _fold_compound(node)
+            if kept is not None:
+                folded.append(kept)
+    return folded
+
+
+def _fold_compound(node: Union[ast.If, ast.Try]) -> Optional[ast.stmt]:
+    """Fold the blocks of an if or try statement, dropping it if nothing is kept."""
+    if isinstance(node, ast.If):
+        if (
+            isinstance(node.test, ast.Compare)
+            and isinstance(node.test.left, ast.Name)
+            and node.test.left.id == "__name__"
+        ):
+            # Script entry point guard
+            return None
+        node.body = _fold_block(node.body)
+        node.orelse = _fold_block(node.orelse)
+        kept = bool(node.body or node.orelse)
+    else:
+        node.body = _fold_block(node.body)
+        for handler in node.handlers:
+            handler.body = _fold_block(handler.body) or [_ellipsis()]
+        node.orelse = _fold_block(node.orelse)
+        node.finalbody = _fold_block(node.finalbody)
+        kept = bool(node.body or node.orelse)
+    if not kept:
+        return None
+    node.body = node.body or [_ellipsis()]
+    return node
+
+
+def fold_python(source: str) -> Optional[str]:
+    """Fold Python source to its structure.
+
+    Keeps the module docstring, imports, ``__all__`` and short module-level
+    constants, and the decorators and signatures of classes and functions with
+    the first line of their docstrings. Function bodies are elided as ``...``.
+
+    Args:
+    ----
+        source: Python source code
+
+    Returns:
+    -------
+        Folded source, or None if the source cannot be parsed
+
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    tree.body = [*_docstring(tree.body, summary_only=False), *_fold_block(tree.body)]
+    try:
+        folded = ast.unparse(tree)
+    except RecursionError:
+        return None
+    return f"{folded}\n" if folded else ""
+
+
+def fold_key(content: str) -> str:
+    """Return the cache key of the folded form of content."""
+    return f"{FOLD_VERSION}-{hash_content(content.encode('utf-8', errors='surrogatepass'))}"
+
+
+def fold_store(repo_info: RepositoryInfo) -> Optional[ContentStore]:
+    """Return the store of folded sources, or None if caching is disabled."""
+    if repo_info.cache is None:
+        return None
+    return ContentStore(FOLD_STORE, repo_info.cache.cache_dir)
+
+
+def fold_batch(sources: List[str]) -> List[Optional[str]]:
+    """Fold a batch of Python sources; runs in worker processes."""
+    return [fold_python(source) for source in sources]
+
+
+FoldResult = Tuple[FileInfo, str, Optional[str]]
+
+# Ticket of a source submitted for folding
+_Ticket = Tuple[Any, int]
+
+
+def iter_folded(
+    pairs: Iterable[Tuple[FileInfo, Optional[str]]],
+    should_fold: Callable[[FileInfo], bool],
+    jobs: Optional[int] = None,
+    store: Optional[ContentStore] = None,
+) -> Iterator[FoldResult]:
+    """Fold file contents in order, parsing cache misses on a process pool.
+
+    Folds are looked up in the store by content hash first. Misses are parsed
+    in batches on worker processes, a bounded amount of content ahead of the
+    consumer; small repositories and a single job parse in-process.
+
+    Args:
+    ----
+        pairs: (file_info, content) pairs in output order; None contents are skipped
+        should_fold: Whether a file is to be folded
+        jobs: Number of worker processes; None or 0 uses one per CPU
+        store: Store of previously folded sources
+
+    Yields:
+    ------
+        (file_info, content, folded) triples, folded None if the file is not
+        folded or cannot be parsed
+
+    """
+    pending: Deque[Tuple[FileInfo, str, str, Union[_Ticket, str, None]]] = deque()
+    pending_weight = 0
+
+    with BatchedProcessPool(fold_batch, jobs) as pool:
+
+        def finish() -> FoldResult:
+            nonlocal pending_weight
+            file_info, content, key, outcome = pending.popleft()
+            if not isinstance(outcome, tuple):
+                return file_info, content, outcome
+            pending_weight -= len(content)
+            folded = pool.result(outcome)
+            if folded is not None and store is not None:
+                store.put(key, folded)
+            return file_info, content, folded
+
+        for file_info, content in pairs:
+            if content is None:
+                continue
+            key = ""
+            outcome: Union[_Ticket, str, None] = None
+            if should_fold(file_info):
+                key = fold_key(content)
+                outcome = store.get(key) if store is not None else None
+                if outcome is None:
+                    outcome = pool.submit(content, len(content))
+                    pending_weight += len(content)
+            pending.append((file_info, content, key, outcome))
+
+            # Results are emitted in order; wait on parsing only once enough is in flight
+            while pending and (
+                pending_weight > pool.window_weight or not isinstance(pending[0][3], tuple)
+            ):
+                yield finish()
+        while pending:
+            yield finish()
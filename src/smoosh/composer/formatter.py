@@ -1,11 +1,26 @@
 """Format composition outputs in various styles."""
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, TextIO, Union
 
 import yaml
 
 from .. import GenerationError
+from ..analyzer.repository import RepositoryInfo
+from ..utils.config import ConfigDict
+from .concatenator import (
+    LegendEntry,
+    Section,
+    check_budget,
+    iter_file_sections,
+    planned_header,
+    planned_tree,
+)
+from .packer import PackPlan
+from .stats import CompositionStats
+
+# Formats written one object per file instead of as a single text
+STRUCTURED_FORMATS = ("json", "jsonl")
 
 
 class FormattingError(GenerationError):
@@ -140,3 +155,137 @@ def format_markdown(content: str, stats: Dict[str, Any]) -> str:
     ]
 
     return "\n".join(sections)
+
+
+def _repository_record(
+    repo_info: RepositoryInfo,
+    mode: str,
+    tree: str,
+    plan: Optional[PackPlan],
+    legend: List[LegendEntry],
+) -> Dict[str, Any]:
+    """Describe the repository: what the header and legend of a text composition hold."""
+    return {
+        "repository": repo_info.root.name,
+        "mode": mode,
+        "total_files": repo_info.total_files_count,
+        "python_files": repo_info.python_files_count,
+        "total_size_mb": round(repo_info.total_size_mb, 2),
+        "plan": plan.summary() if plan is not None else None,
+        "tree": tree,
+        "legend": [
+            {"label": label, "files": count, "block": block} for label, count, block in legend
+        ],
+    }
+
+
+def _file_record(section: Section, stats: CompositionStats) -> Dict[str, Any]:
+    """Describe one file, counting the tokens of its content."""
+    if section.text is not None:
+        stats.add_tokens(section.text)
+    file_stats = stats.current
+    return {
+        "path": section.file_info.relative_path,
+        "size": file_stats.bytes if file_stats is not None else 0,
+        "tokens": file_stats.tokens if file_stats is not None else 0,
+        "folded": section.folded,
+        "same_as": section.same_as,
+        # Last, so stream parsers see the other fields before the largest one
+        "content": section.text,
+    }
+
+
+class _RecordWriter:
+    """Encode records chunk by chunk into a stream, accounting for what is written."""
+
+    def __init__(self, stream: TextIO, stats: CompositionStats) -> None:
+        """Write to a stream, adding what is written to the statistics."""
+        self.stream = stream
+        self.stats = stats
+        self.encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False)
+
+    def write(self, text: str) -> None:
+        """Write JSON syntax between records."""
+        self.stream.write(text)
+        self.stats.add_composed(text)
+
+    def write_record(self, record: Dict[str, Any], prefix: str = "", suffix: str = "") -> None:
+        """Write a record, encoded incrementally, between a prefix and a suffix."""
+        self.write(prefix)
+        for chunk in self.encoder.iterencode(record):
+            self.write(chunk)
+        self.write(suffix)
+
+
+def write_structured(
+    repo_info: RepositoryInfo,
+    mode: str,
+    config: ConfigDict,
+    stream: TextIO,
+    format_type: str = "json",
+    stats: Optional[CompositionStats] = None,
+) -> Dict[str, Union[str, int]]:
+    """Stream the composition as JSON or JSON Lines with one object per file.
+
+    The JSON document holds the repository description, the files array with
+    one file per line and the statistics. JSON Lines writes them as records
+    told apart by their type: "repository", one "file" per file and a final
+    "statistics". Each record is encoded and written on its own, so memory is
+    bounded by the largest file when writing as well as when reading.
+
+    Args:
+    ----
+        repo_info: Repository information
+        mode: Composition mode ('cat', 'fold', or 'smoosh')
+        config: Configuration dictionary
+        stream: Writable text stream, e.g. an open output file or stdout
+        format_type: One of STRUCTURED_FORMATS
+        stats: Accumulator to fill, e.g. to inspect per-file statistics afterwards
+
+    Returns:
+    -------
+        Statistics dictionary
+
+    Raises:
+    ------
+        FormattingError: If the format is unknown or composition fails
+        BrokenPipeError: If the reading end of a pipe is closed
+
+    """
+    if format_type not in STRUCTURED_FORMATS:
+        raise FormattingError(f"Unknown structured format: {format_type}")
+    try:
+        stats = stats if stats is not None else CompositionStats.for_config(config)
+        writer = _RecordWriter(stream, stats)
+        tree = planned_tree(repo_info, config)
+        _, plan = planned_header(repo_info, mode, config, stats, tree)
+        jobs = config["performance"]["jobs"]
+        legend, sections = iter_file_sections(repo_info, mode, jobs, stats, plan)
+        for _, _, block in legend:
+            stats.add_tokens(block)
+        repository = _repository_record(repo_info, mode, tree, plan, legend)
+
+        # The statistics cover everything written before them
+        if format_type == "jsonl":
+            writer.write_record({"type": "repository", **repository}, suffix="\n")
+            for section in sections:
+                writer.write_record({"type": "file", **_file_record(section, stats)}, suffix="\n")
+            statistics = {"type": "statistics", "statistics": stats.as_dict(repo_info)}
+            writer.write_record(statistics, suffix="\n")
+        else:
+            writer.write_record(repository, prefix='{"repository": ', suffix=',\n"files": [')
+            separator = "\n"
+            for section in sections:
+                writer.write_record(_file_record(section, stats), prefix=separator)
+                separator = ",\n"
+            writer.write("\n],\n")
+            writer.write_record(stats.as_dict(repo_info), prefix='"statistics": ', suffix="}\n")
+
+        check_budget(config, stats)
+        return stats.as_dict(repo_info)
+
+    except BrokenPipeError:
+        # The consumer closed the stream; let the caller decide how to exit
+        raise
+    except Exception as e:
+        raise FormattingError(f"Failed to write {format_type} output: {e}") from e
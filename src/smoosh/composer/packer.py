@@ -0,0 +1,208 @@
+"""Token-budget packing of repository files for smoosh."""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from ..analyzer.repository import RepositoryInfo, iter_file_contents
+from ..custom_types import FileInfo
+from ..utils.config import ConfigDict
+from ..utils.logger import logger
+from ..utils.tokens import TokenCounter
+from .folder import fold_store, iter_folded
+
+# Levels a file can be packed at, most complete first
+LEVEL_CAT = "cat"
+LEVEL_FOLD = "fold"
+LEVEL_OMIT = "omit"
+
+# Names of files that explain or start a project, preferred when packing
+ENTRY_POINT_NAMES = frozenset(
+    {
+        "__init__.py",
+        "__main__.py",
+        "app.py",
+        "cli.py",
+        "main.py",
+        "manage.py",
+        "pyproject.toml",
+        "README",
+        "README.md",
+        "README.rst",
+        "setup.cfg",
+        "setup.py",
+    }
+)
+
+# Directory names whose files matter less for understanding a package
+LOW_PRIORITY_DIRS = frozenset({"benchmarks", "docs", "examples", "test", "tests"})
+
+# Tokens kept free for the packing summary added to the header
+HEADER_RESERVE = 32
+
+
+@dataclass
+class PackPlan:
+    """Level chosen for every file so that the composition fits a token budget."""
+
+    budget: int
+    levels: Dict[str, str] = field(default_factory=dict)
+    tokens: int = 0
+
+    def level(self, file_info: FileInfo) -> str:
+        """Return the level a file is packed at."""
+        return self.levels.get(file_info.relative_path, LEVEL_OMIT)
+
+    def count(self, level: str) -> int:
+        """Return the number of files packed at a level."""
+        return sum(1 for packed in self.levels.values() if packed == level)
+
+    def summary(self) -> str:
+        """Describe the plan in one line for the composition header."""
+        return (
+            f"Packed: {self.count(LEVEL_CAT)} files in full, {self.count(LEVEL_FOLD)} folded, "
+            f"{self.count(LEVEL_OMIT)} omitted to fit {self.budget} tokens"
+        )
+
+
+def file_priority(file_info: FileInfo, newest_mtime_ns: int, oldest_mtime_ns: int) -> float:
+    """Score how much a file contributes to understanding the repository.
+
+    Entry points and Python modules score higher, files deep in the tree or in
+    test and documentation directories lower, and recently modified files get
+    a bonus relative to the rest of the repository. Small files are favoured
+    by the packer itself, which ranks files by score per token.
+
+    Args:
+    ----
+        file_info: File to score
+        newest_mtime_ns: Modification time of the most recently changed file
+        oldest_mtime_ns: Modification time of the least recently changed file
+
+    Returns:
+    -------
+        Positive priority score
+
+    """
+    parts = file_info.relative_path.split("/")
+    score = 1.0
+    if file_info.name in ENTRY_POINT_NAMES:
+        score += 3.0
+    if file_info.is_python:
+        score += 1.0
+    if newest_mtime_ns > oldest_mtime_ns:
+        score += 2.0 * (file_info.mtime_ns - oldest_mtime_ns) / (newest_mtime_ns - oldest_mtime_ns)
+    if any(part in LOW_PRIORITY_DIRS for part in parts[:-1]):
+        score *= 0.5
+    return score / (1.0 + 0.25 * (len(parts) - 1))
+
+
+def measure_files(
+    repo_info: RepositoryInfo, counter: TokenCounter, jobs: Optional[int] = None
+) -> Dict[str, Dict[str, int]]:
+    """Count the tokens each file adds to the composition at each level.
+
+    Python files are also folded to measure their folded cost; the folds are
+    kept in the fold cache so composing them afterwards does not parse again.
+
+    Args:
+    ----
+        repo_info: Repository information
+        counter: Token counter
+        jobs: Number of reader threads and parser processes
+
+    Returns:
+    -------
+        Token cost per level of each readable file, including its section
+        marker, keyed by relative path
+
+    """
+    costs: Dict[str, Dict[str, int]] = {}
+    pairs = iter_file_contents(repo_info.files, jobs)
+    for file_info, content, folded in iter_folded(
+        pairs, lambda f: f.is_python, jobs, fold_store(repo_info)
+    ):
+        file_info.tokens = counter.count(content)
+        marker = counter.count(f"\n\n### File: {file_info.relative_path} ###\n")
+        levels = {LEVEL_CAT: file_info.tokens + marker}
+        if folded is not None:
+            levels[LEVEL_FOLD] = counter.count(folded) + marker + 1
+        costs[file_info.relative_path] = levels
+    return costs
+
+
+def _options(
+    costs: Dict[str, int], mode: str, cat_threshold: int, fold_threshold: int
+) -> List[Tuple[str, int]]:
+    """Return the levels a file may be packed at with their costs, best first."""
+    options: List[Tuple[str, int]] = []
+    fold_cost = costs.get(LEVEL_FOLD)
+    if costs[LEVEL_CAT] <= cat_threshold and (mode == "cat" or fold_cost is None):
+        options.append((LEVEL_CAT, costs[LEVEL_CAT]))
+    if fold_cost is not None and fold_cost <= fold_threshold:
+        options.append((LEVEL_FOLD, fold_cost))
+    return options
+
+
+def pack_files(
+    repo_info: RepositoryInfo,
+    config: ConfigDict,
+    counter: TokenCounter,
+    mode: str = "cat",
+    header_tokens: int = 0,
+) -> PackPlan:
+    """Choose the level of every file so the composition fits output.max_tokens.
+
+    A greedy knapsack: files are taken in order of priority per token, each at
+    the most complete level that still fits the remaining budget. Files above
+    thresholds.cat_threshold tokens are never included in full, and Python
+    files whose folded form is above thresholds.fold_threshold are omitted. In
+    fold mode Python files are only ever folded.
+
+    Args:
+    ----
+        repo_info: Repository information
+        config: Configuration dictionary
+        counter: Token counter used for the composition
+        mode: Composition mode
+        header_tokens: Tokens already taken by the composition header
+
+    Returns:
+    -------
+        Packing plan
+
+    """
+    budget = config["output"].get("max_tokens") or 0
+    cat_threshold = config["thresholds"]["cat_threshold"]
+    fold_threshold = config["thresholds"]["fold_threshold"]
+    plan = PackPlan(budget=budget)
+
+    costs = measure_files(repo_info, counter, config["performance"]["jobs"])
+    mtimes = [f.mtime_ns for f in repo_info.files if f.relative_path in costs]
+    newest, oldest = (max(mtimes), min(mtimes)) if mtimes else (0, 0)
+
+    ranked: List[Tuple[float, FileInfo, List[Tuple[str, int]]]] = []
+    for file_info in repo_info.files:
+        file_costs = costs.get(file_info.relative_path)
+        if file_costs is None:
+            continue
+        options = _options(file_costs, mode, cat_threshold, fold_threshold)
+        if not options:
+            plan.levels[file_info.relative_path] = LEVEL_OMIT
+            continue
+        priority = file_priority(file_info, newest, oldest)
+        ranked.append((priority / max(options[0][1], 1), file_info, options))
+    ranked.sort(key=lambda item: (-item[0], item[1].relative_path))
+
+    remaining = budget - header_tokens - HEADER_RESERVE
+    for _, file_info, options in ranked:
+        level = LEVEL_OMIT
+        for candidate, cost in options:
+            if cost <= remaining:
+                level = candidate
+                remaining -= cost
+                plan.tokens += cost
+                break
+        plan.levels[file_info.relative_path] = level
+
+    logger.info(plan.summary())
+    return plan
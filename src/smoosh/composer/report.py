@@ -0,0 +1,103 @@
+"""Breakdown of where the tokens, lines and bytes of a composition come from."""
+
+import heapq
+from typing import Any, Dict, Iterable, List
+
+from .stats import CompositionStats, FileStats, directory_totals
+
+# Measures entries are ranked by
+METRICS = ("tokens", "lines", "bytes")
+
+# Default number of entries listed per ranking
+DEFAULT_TOP = 10
+
+# Group of files without an extension
+NO_EXTENSION = "(none)"
+
+
+def extension_of(path: str) -> str:
+    """Return the lower-cased extension of a path, e.g. ".py", or NO_EXTENSION."""
+    name = path.rpartition("/")[2]
+    stem, dot, extension = name.rpartition(".")
+    return f".{extension.lower()}" if dot and stem else NO_EXTENSION
+
+
+def extension_totals(files: Iterable[FileStats]) -> Dict[str, FileStats]:
+    """Sum file statistics per extension.
+
+    Args:
+    ----
+        files: Statistics of individual files
+
+    Returns:
+    -------
+        Totals keyed by extension, whose path is the extension
+
+    """
+    totals: Dict[str, FileStats] = {}
+    for file_stats in files:
+        extension = extension_of(file_stats.path)
+        total = totals.get(extension)
+        if total is None:
+            total = totals[extension] = FileStats(extension)
+        total.add(file_stats)
+    return totals
+
+
+def top_entries(entries: Iterable[FileStats], metric: str, count: int) -> List[FileStats]:
+    """Return the entries with the largest value of a metric, largest first.
+
+    Args:
+    ----
+        entries: Statistics to rank
+        metric: One of METRICS
+        count: Number of entries to return
+
+    Returns:
+    -------
+        Up to count entries, ties ordered by path
+
+    """
+    return heapq.nsmallest(count, entries, key=lambda entry: (-getattr(entry, metric), entry.path))
+
+
+def build_report(stats: CompositionStats, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+    """Rank the directories, extensions and files of a composition.
+
+    Directories include their subdirectories; the root is left out of the
+    rankings, as its totals are those of the whole composition.
+
+    Args:
+    ----
+        stats: Statistics gathered while composing
+        top: Number of entries per ranking
+
+    Returns:
+    -------
+        JSON-serializable report with the totals and, for each of directories,
+        extensions and files, the top entries by each metric
+
+    """
+    directories = directory_totals(stats.files)
+    directories.pop(".", None)
+    groups = {
+        "directories": list(directories.values()),
+        "extensions": list(extension_totals(stats.files).values()),
+        "files": stats.files,
+    }
+    return {
+        "totals": {
+            "files": len(stats.files),
+            "tokens": stats.tokens,
+            "header_tokens": stats.overhead_tokens,
+            "lines": stats.original_lines,
+            "bytes": stats.original_bytes,
+        },
+        **{
+            group: {
+                metric: [entry.as_dict() for entry in top_entries(entries, metric, top)]
+                for metric in METRICS
+            }
+            for group, entries in groups.items()
+        },
+    }
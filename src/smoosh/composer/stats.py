@@ -0,0 +1,241 @@
+"""Statistics accumulated while a composition is produced."""
+
+from typing import Dict, Iterable, List, Optional, Union
+
+from ..analyzer.repository import RepositoryInfo
+from ..custom_types import FileInfo
+from ..utils.config import ConfigDict
+from ..utils.file_utils import count_lines
+from ..utils.tokens import EstimatingTokenCounter, TokenCounter, get_token_counter
+from ..utils.zerocopy import MappedFile
+
+
+def utf8_length(text: str) -> int:
+    """Return the size of text encoded as UTF-8, without encoding ASCII text."""
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+
+class FileStats:
+    """Size of one file and what its section adds to the composition."""
+
+    __slots__ = ("bytes", "chars", "lines", "path", "tokens")
+
+    def __init__(
+        self, path: str, lines: int = 0, chars: int = 0, size: int = 0, tokens: int = 0
+    ) -> None:
+        """Record the size of a file or the totals of a group of files.
+
+        Args:
+        ----
+            path: Slash-separated path relative to the repository root
+            lines: Lines of the original content
+            chars: Characters of the original content
+            size: UTF-8 size of the original content in bytes
+            tokens: Tokens of the file's section of the composition, including
+                its marker
+
+        """
+        self.path = path
+        self.lines = lines
+        self.chars = chars
+        self.bytes = size
+        self.tokens = tokens
+
+    def add(self, other: "FileStats") -> None:
+        """Add the sizes of another file to these totals."""
+        self.lines += other.lines
+        self.chars += other.chars
+        self.bytes += other.bytes
+        self.tokens += other.tokens
+
+    def as_dict(self) -> Dict[str, Union[str, int]]:
+        """Return the statistics as a JSON-serializable dictionary."""
+        return {
+            "path": self.path,
+            "lines": self.lines,
+            "chars": self.chars,
+            "bytes": self.bytes,
+            "tokens": self.tokens,
+        }
+
+    def __repr__(self) -> str:
+        """Summarize the statistics for debugging."""
+        return f"FileStats({self.path!r}, lines={self.lines}, tokens={self.tokens})"
+
+
+def directory_totals(files: Iterable[FileStats]) -> Dict[str, FileStats]:
+    """Sum file statistics into every directory that contains the files.
+
+    Args:
+    ----
+        files: Statistics of individual files
+
+    Returns:
+    -------
+        Totals keyed by slash-separated directory path, "." for the root, each
+        directory including its subdirectories
+
+    """
+    totals: Dict[str, FileStats] = {}
+    for file_stats in files:
+        directory = file_stats.path
+        while True:
+            directory = directory.rpartition("/")[0]
+            key = directory or "."
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = FileStats(key)
+            total.add(file_stats)
+            if not directory:
+                break
+    return totals
+
+
+class CompositionStats:
+    """Statistics accumulated incrementally while a composition is produced.
+
+    The composer reports each file's original content as its section starts
+    and every chunk it emits. Sizes are counted without splitting any text
+    into lines, and chunks after a file is reported are attributed to that
+    file, giving a per-file breakdown of where the tokens go.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None) -> None:
+        """Start with empty totals.
+
+        Args:
+        ----
+            counter: Token counter, the fast estimator if None
+
+        """
+        self.counter = counter or EstimatingTokenCounter()
+        self.original_lines = 0
+        self.original_chars = 0
+        self.original_bytes = 0
+        self.composed_chars = 0
+        self.composed_bytes = 0
+        self.tokens = 0
+        self.files: List[FileStats] = []
+        self._current: Optional[FileStats] = None
+        self._composed_newlines = 0
+        self._ends_with_newline = False
+        self._last_file: Optional[FileInfo] = None
+        self._last_content: Optional[str] = None
+        self._last_mapped = (0, 0, 0)
+
+    @classmethod
+    def for_config(cls, config: ConfigDict) -> "CompositionStats":
+        """Create an accumulator using the configured token counter."""
+        return cls(get_token_counter(config["tokens"]["vocabulary"]))
+
+    def _start_file(self, file_info: FileInfo, lines: int, chars: int, size: int) -> None:
+        """Begin the section of a file, to which following chunks are attributed."""
+        self.original_lines += lines
+        self.original_chars += chars
+        self.original_bytes += size
+        self._current = FileStats(file_info.relative_path, lines, chars, size)
+        self.files.append(self._current)
+
+    def add_file(self, file_info: FileInfo, content: str) -> None:
+        """Account for the original content of a file.
+
+        Its tokens are counted when it is emitted, so content that is folded or
+        deduplicated away is never tokenized.
+        """
+        self._start_file(file_info, count_lines(content), len(content), utf8_length(content))
+        self._last_file = file_info
+        self._last_content = content
+
+    def add_mapped(self, file_info: FileInfo, mapped: MappedFile) -> None:
+        """Account for the original content of a file that is emitted from its mapped bytes."""
+        newlines = mapped.count_newlines()
+        lines = newlines + (0 if mapped.ends_with_newline else 1)
+        chars = mapped.count_chars()
+        self._start_file(file_info, lines, chars, mapped.size)
+        file_info.tokens = self.counter.count_bytes(mapped.mapping)
+        self._last_mapped = (newlines, chars, file_info.tokens)
+
+    def add_composed_mapped(self, mapped: MappedFile) -> None:
+        """Account for the mapped bytes of the current file being emitted unchanged."""
+        newlines, chars, tokens = self._last_mapped
+        self.composed_chars += chars
+        self.composed_bytes += mapped.size
+        self._composed_newlines += newlines
+        self._ends_with_newline = mapped.ends_with_newline
+        self._add_tokens(tokens)
+
+    def add_composed(self, chunk: str) -> None:
+        """Account for a chunk of composed content."""
+        if not chunk:
+            return
+        self.composed_chars += len(chunk)
+        self.composed_bytes += utf8_length(chunk)
+        self._composed_newlines += chunk.count("\n")
+        self._ends_with_newline = chunk.endswith("\n")
+
+    def add_tokens(self, chunk: str) -> None:
+        """Account for the tokens of an output chunk."""
+        tokens = self.counter.count(chunk)
+        if chunk is self._last_content and self._last_file is not None:
+            # The file's content is emitted unchanged: record its count
+            self._last_file.tokens = tokens
+        self._add_tokens(tokens)
+
+    def _add_tokens(self, tokens: int) -> None:
+        """Add tokens to the total and to the section of the current file."""
+        self.tokens += tokens
+        if self._current is not None:
+            self._current.tokens += tokens
+
+    @property
+    def current(self) -> Optional[FileStats]:
+        """Statistics of the file whose section is being composed."""
+        return self._current
+
+    @property
+    def composed_lines(self) -> int:
+        """Number of lines of the composed content."""
+        trailing = 1 if self.composed_chars and not self._ends_with_newline else 0
+        return self._composed_newlines + trailing
+
+    @property
+    def overhead_tokens(self) -> int:
+        """Tokens outside the file sections: the header and smoosh mode's legend."""
+        return self.tokens - sum(file_stats.tokens for file_stats in self.files)
+
+    def directories(self) -> Dict[str, FileStats]:
+        """Return the statistics of the composed files summed per directory."""
+        return directory_totals(self.files)
+
+    def as_dict(self, repo_info: RepositoryInfo) -> Dict[str, Union[str, int]]:
+        """Return the statistics in display form.
+
+        Args:
+        ----
+            repo_info: Repository information
+
+        Returns:
+        -------
+            Dictionary of statistics
+
+        """
+        original_lines = self.original_lines
+        original_chars = self.original_chars
+        composed_lines = self.composed_lines
+        composed_chars = self.composed_chars
+
+        return {
+            "Repository Size": f"{repo_info.total_size_mb:.2f}MB",
+            "Total Files": repo_info.total_files_count,
+            "Python Files": repo_info.python_files_count,
+            "Original Lines": original_lines,
+            "Composed Lines": composed_lines,
+            "Original Characters": original_chars,
+            "Composed Characters": composed_chars,
+            "Composed Bytes": self.composed_bytes,
+            "Composed Tokens": self.tokens,
+            "Lines Ratio": (f"{composed_lines / original_lines:.2f}x" if original_lines else "N/A"),
+            "Characters Ratio": (
+                f"{composed_chars / original_chars:.2f}x" if original_chars else "N/A"
+            ),
+        }
@@ -0,0 +1,364 @@
+"""Incremental recomposition of a repository as its files change."""
+
+import io
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple, Union
+
+from ..analyzer.repository import RepositoryInfo, analyze_repository, iter_file_contents
+from ..analyzer.tree import TreeNode, add_to_tree, build_tree, format_tree, remove_from_tree
+from ..custom_types import FileInfo
+from ..utils.cache import ContentStore
+from ..utils.concurrency import thread_map
+from ..utils.config import ConfigDict
+from ..utils.file_utils import (
+    find_git_dir,
+    find_git_root,
+    get_exclude_files,
+    git_common_dir,
+    load_ignore_rules,
+    probe_file,
+    scan_repository,
+)
+from ..utils.gitignore import IgnoreStack
+from .concatenator import compose_header, section_marker, write_composition
+from .folder import FoldResult, fold_store, iter_folded
+
+# Define PathLike type consistently with other modules
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Seconds between two scans of the repository
+DEFAULT_INTERVAL = 1.0
+
+# Modes whose sections depend only on their own file and can be patched in place
+INCREMENTAL_MODES = frozenset({"cat", "fold"})
+
+# Changes to these files alter which files are included, so they force a rebuild
+RULE_FILES = frozenset({".gitignore"})
+
+
+def _signature(stat_result: os.stat_result) -> Tuple[int, int, int]:
+    """Return the parts of a stat result that change when a file is written."""
+    return stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino
+
+
+@dataclass
+class WatchUpdate:
+    """Summary of one recomposition."""
+
+    changed: int
+    removed: int
+    rebuilt: bool
+    seconds: float
+
+
+class WatchSession:
+    """Keeps the composition of a repository up to date as its files change.
+
+    The repository is polled by re-scanning its directories, which only stats
+    files. Changed and new files are probed and re-read, and in fold mode
+    re-folded; every other file keeps the section composed earlier, and the
+    tree in the header is patched rather than rebuilt. Smoosh mode, whose
+    sections depend on the other files, packed output and snapshots limited to
+    a git diff or an import focus are composed from scratch on every change, as is everything
+    when ignore rules change: a ``.gitignore``, ``.git/info/exclude`` or the global
+    excludes file. The configuration is read once, when the session starts.
+
+    Files are always found by walking the tree, not from the git index. Output
+    files written inside the repository, and their temporary files, are left
+    out so that writing the composition does not count as a change.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        mode: str,
+        config: ConfigDict,
+        force_cat: bool = False,
+        output: Optional[PathLike] = None,
+    ) -> None:
+        """Analyze and compose the repository for the first time.
+
+        Args:
+        ----
+            path: Path to the repository
+            mode: Composition mode ('cat', 'fold', or 'smoosh')
+            config: Configuration dictionary
+            force_cat: Whether to ignore gitignore rules and size limits
+            output: Output file that will be written with write_file, if any
+
+        """
+        self.path = path
+        self.mode = mode
+        self.config: ConfigDict = {**config, "git": {**config["git"], "use_index": False}}
+        self.force_cat = force_cat
+        self.incremental = (
+            mode in INCREMENTAL_MODES
+            and not config["output"].get("pack")
+            and not config["git"].get("since")
+            and not config["focus"]["modules"]
+        )
+        self.max_size_mb: Optional[float] = (
+            None if force_cat else config["output"]["size_limits"]["file_max_mb"]
+        )
+
+        self.repo_info: RepositoryInfo
+        self.ignore: IgnoreStack
+        self.tree: TreeNode
+        self.snapshot: Dict[str, Tuple[int, int, int]] = {}
+        # Excludes files outside the walked tree, which the scan does not see
+        self.exclude_files: List[str] = []
+        self.exclude_snapshot: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self.files: Dict[str, FileInfo] = {}
+        self.sections: Dict[str, str] = {}
+        # Output files inside the repository, relative to its root
+        self.outputs: Set[str] = set()
+        self._output_paths = [output] if output is not None else []
+        self.rebuild()
+
+    @property
+    def jobs(self) -> int:
+        """Number of worker threads and processes."""
+        return self.config["performance"]["jobs"]
+
+    def _relative_output(self, output: PathLike) -> Optional[str]:
+        """Return the path of an output file relative to the root, None if outside it."""
+        root = os.path.realpath(self.repo_info.root)
+        path = os.path.realpath(output)
+        if os.path.commonpath([root, path]) != root:
+            return None
+        return os.path.relpath(path, root).replace(os.sep, "/")
+
+    def _is_output(self, relative_path: str) -> bool:
+        """Whether a file is an output of this session or one of its temporary files."""
+        if relative_path in self.outputs:
+            return True
+        directory, _, name = relative_path.rpartition("/")
+        return name.endswith(".tmp") and any(
+            output.rpartition("/")[0] == directory
+            and name.startswith(f".{output.rpartition('/')[2]}.")
+            for output in self.outputs
+        )
+
+    def _watched_excludes(self, git_root: Optional[PathLike]) -> List[str]:
+        """Return the excludes files to watch, including a missing .git/info/exclude."""
+        paths = [str(path) for path in get_exclude_files(git_root)]
+        git_dir = find_git_dir(git_root) if git_root else None
+        if git_dir is not None:
+            info_exclude = str(git_common_dir(git_dir) / "info" / "exclude")
+            if info_exclude not in paths:
+                paths.append(info_exclude)
+        return paths
+
+    def _stat_excludes(self) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        """Return the signature of every watched excludes file, None if missing."""
+        signatures: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        for path in self.exclude_files:
+            try:
+                signatures[path] = _signature(os.stat(path))
+            except OSError:
+                signatures[path] = None
+        return signatures
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        """Stat the candidate files of the repository, leaving out the outputs."""
+        found = scan_repository(self.repo_info.root, self.ignore, self.max_size_mb)
+        if not self.outputs:
+            return found
+        return {rel: st for rel, st in found.items() if not self._is_output(rel)}
+
+    def rebuild(self) -> None:
+        """Analyze the repository and compose every file from scratch."""
+        self.repo_info = analyze_repository(self.path, self.config, self.force_cat)
+        self.outputs = {
+            rel for rel in map(self._relative_output, self._output_paths) if rel is not None
+        }
+        if self.outputs:
+            self._set_files(
+                [f for f in self.repo_info.files if not self._is_output(f.relative_path)]
+            )
+        respect = self.config["gitignore"]["respect"] and not self.force_cat
+        root = self.repo_info.root
+        git_root = find_git_root(root)
+        self.ignore = load_ignore_rules(root, git_root, respect)
+        self.exclude_files = self._watched_excludes(git_root) if respect else []
+        self.exclude_snapshot = self._stat_excludes()
+        # Files written from here on are picked up by the next poll
+        self.snapshot = {rel: _signature(st) for rel, st in self._scan().items()}
+        self.files = {f.relative_path: f for f in self.repo_info.files}
+        self.tree = build_tree(root, self.repo_info.files)
+
+        self.sections = {}
+        if self.incremental:
+            pairs = iter_file_contents(self.repo_info.files, self.jobs)
+            self._add_sections(iter_folded(pairs, self._should_fold, self.jobs, self._store()))
+
+    def _should_fold(self, file_info: FileInfo) -> bool:
+        """Whether a file is folded in this session's mode."""
+        return self.mode == "fold" and file_info.is_python
+
+    def _store(self) -> Optional[ContentStore]:
+        """Return the store of folded sources."""
+        return fold_store(self.repo_info)
+
+    def _add_sections(self, results: Iterator[FoldResult]) -> None:
+        """Compose and keep the section of each file."""
+        for file_info, content, folded in results:
+            note = "" if folded is None else " (folded)"
+            text = content if folded is None else folded
+            self.sections[file_info.relative_path] = (
+                section_marker(file_info.relative_path, note) + text
+            )
+
+    def poll(self) -> Optional[WatchUpdate]:
+        """Scan the repository once and recompose what changed.
+
+        Returns:
+        -------
+            Summary of the update, or None if nothing changed
+
+        """
+        start = time.perf_counter()
+        current = self._scan()
+        changed = [
+            rel
+            for rel, stat_result in current.items()
+            if self.snapshot.get(rel) != _signature(stat_result)
+        ]
+        removed = [rel for rel in self.snapshot if rel not in current]
+        excludes = self._stat_excludes()
+        excludes_changed = excludes != self.exclude_snapshot
+        if not changed and not removed and not excludes_changed:
+            return None
+
+        rebuilt = (
+            not self.incremental
+            or excludes_changed
+            or any(os.path.basename(rel) in RULE_FILES for rel in changed + removed)
+        )
+        if rebuilt:
+            self.rebuild()
+        else:
+            self.snapshot = {rel: _signature(st) for rel, st in current.items()}
+            self._update(changed, removed, current)
+        return WatchUpdate(len(changed), len(removed), rebuilt, time.perf_counter() - start)
+
+    def _drop(self, relative_path: str) -> None:
+        """Forget a file that was deleted or is no longer text."""
+        if self.files.pop(relative_path, None) is not None:
+            remove_from_tree(self.tree, relative_path)
+        self.sections.pop(relative_path, None)
+
+    def _update(
+        self, changed: List[str], removed: List[str], current: Dict[str, os.stat_result]
+    ) -> None:
+        """Probe, re-read and recompose the changed files and drop the removed ones."""
+        for rel in removed:
+            self._drop(rel)
+
+        root = str(self.repo_info.root)
+        cache = self.repo_info.cache
+        probed = thread_map(
+            lambda rel: probe_file(root, rel, current[rel], True, cache),
+            changed,
+            self.jobs,
+        )
+        pairs: List[Tuple[FileInfo, Optional[str]]] = []
+        for file_info in probed:
+            if not file_info.is_text or file_info.content is None:
+                self._drop(file_info.relative_path)
+                continue
+            if file_info.relative_path not in self.files:
+                add_to_tree(self.tree, file_info.relative_path)
+            self.files[file_info.relative_path] = file_info
+            # The section keeps the text; the file need not
+            pairs.append((file_info, file_info.content))
+            file_info.release()
+        self._add_sections(iter_folded(pairs, self._should_fold, self.jobs, self._store()))
+        if cache is not None:
+            cache.save()
+
+        self._set_files(sorted(self.files.values(), key=lambda f: f.relative_path))
+
+    def _set_files(self, files: List[FileInfo]) -> None:
+        """Replace the files of the repository and their totals."""
+        self.repo_info.files = files
+        self.repo_info.total_files_count = len(files)
+        self.repo_info.python_files_count = sum(1 for f in files if f.is_python)
+        self.repo_info.total_size_mb = sum(f.size_mb for f in files)
+
+    def iter_output(self) -> Iterator[str]:
+        """Stream the current composition, as write_composition would produce it.
+
+        Yields:
+        ------
+            Consecutive chunks of the composition
+
+        """
+        tree_config = self.config["tree"]
+        tree = format_tree(
+            self.tree, max_depth=tree_config["max_depth"], max_entries=tree_config["max_entries"]
+        )
+        yield compose_header(self.repo_info, self.mode, tree=tree)
+        yield "\n\n"
+        separator = "\n"
+        for file_info in self.repo_info.files:
+            section = self.sections.get(file_info.relative_path)
+            if section is not None:
+                yield separator
+                yield section
+                separator = "\n\n"
+
+    def write(self, stream: TextIO) -> None:
+        """Write the current composition to a text stream.
+
+        Args:
+        ----
+            stream: Writable text stream
+
+        """
+        if self.incremental:
+            for chunk in self.iter_output():
+                stream.write(chunk)
+        else:
+            write_composition(self.repo_info, self.mode, self.config, stream)
+
+    def render(self) -> str:
+        """Return the current composition as a string."""
+        if self.incremental:
+            return "".join(self.iter_output())
+        stream = io.StringIO()
+        write_composition(self.repo_info, self.mode, self.config, stream)
+        return stream.getvalue()
+
+    def write_file(self, output: PathLike) -> None:
+        """Replace an output file with the current composition atomically.
+
+        Readers of the file never see a partly written composition.
+
+        Args:
+        ----
+            output: Path of the output file
+
+        """
+        if output not in self._output_paths:
+            # A new output inside the repository must not be seen as a change
+            self._output_paths.append(output)
+            relative_output = self._relative_output(output)
+            if relative_output is not None:
+                self.outputs.add(relative_output)
+                self.snapshot.pop(relative_output, None)
+                if relative_output in self.files:
+                    self._drop(relative_output)
+                    self._set_files(sorted(self.files.values(), key=lambda f: f.relative_path))
+        directory, name = os.path.split(os.path.abspath(str(output)))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as stream:
+                self.write(stream)
+            os.replace(tmp_path, str(output))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
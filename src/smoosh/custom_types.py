@@ -1,16 +1,147 @@
 """Type definitions for smoosh."""
 
-from dataclasses import dataclass
-from pathlib import Path
+import os
+import sys
 from typing import Optional
 
 
-@dataclass
 class FileInfo:
-    """Information about a file in the repository."""
+    """Information about a file in the repository.
 
-    path: Path
-    relative_path: Path
-    size_mb: float = 0.0
-    is_python: bool = False
-    content: Optional[str] = None
+    Kept small, as there is one per file of the repository: attributes live in
+    slots, the relative path is an interned slash-separated string and the
+    absolute path is derived from the root shared by all files. Content is only
+    held while loaded; read_text() reads it on demand without keeping it and
+    release() drops loaded content. A small file read whole while probing is
+    handed over with prefetch() and served by the next read_text() instead of
+    opening the file again.
+    """
+
+    __slots__ = (
+        "_content",
+        "content_hash",
+        "encoding",
+        "is_python",
+        "is_text",
+        "line_count",
+        "mtime_ns",
+        "prefetched",
+        "relative_path",
+        "root",
+        "size_mb",
+        "text_tier",
+        "tokens",
+    )
+
+    def __init__(
+        self,
+        root: str,
+        relative_path: str,
+        size_mb: float = 0.0,
+        is_python: bool = False,
+        content: Optional[str] = None,
+        is_text: bool = True,
+        encoding: Optional[str] = None,
+        text_tier: Optional[str] = None,
+        mtime_ns: int = 0,
+        line_count: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        tokens: Optional[int] = None,
+    ) -> None:
+        """Describe a file.
+
+        Args:
+        ----
+            root: Repository root; pass the same string for every file to share it
+            relative_path: Slash-separated path of the file relative to root
+            size_mb: Size of the file in MB
+            is_python: Whether the file is a Python module
+            content: Decoded content, if already loaded
+            is_text: Whether the file was classified as text
+            encoding: Encoding of the file's text
+            text_tier: Classifier tier that decided whether the file is text
+            mtime_ns: Modification time in nanoseconds
+            line_count: Number of lines, if known
+            content_hash: Hash of the file's bytes, if known
+            tokens: Token count of the content, once counted
+
+        """
+        self.root = root
+        self.relative_path = sys.intern(relative_path)
+        self.size_mb = size_mb
+        self.is_python = is_python
+        self._content = content
+        self.prefetched: Optional[str] = None
+        self.is_text = is_text
+        self.encoding = encoding
+        self.text_tier = text_tier
+        self.mtime_ns = mtime_ns
+        self.line_count = line_count
+        self.content_hash = content_hash
+        self.tokens = tokens
+
+    @property
+    def path(self) -> str:
+        """Filesystem path of the file."""
+        return os.path.join(self.root, *self.relative_path.split("/"))
+
+    @property
+    def name(self) -> str:
+        """Name of the file without its directories."""
+        return self.relative_path.rpartition("/")[2]
+
+    @property
+    def content(self) -> Optional[str]:
+        """Loaded content of the file, None if it is not loaded."""
+        return self._content
+
+    @content.setter
+    def content(self, content: Optional[str]) -> None:
+        self._content = content
+
+    def read_text(self) -> str:
+        """Return the loaded content, or read the file without keeping its content.
+
+        Returns:
+        -------
+            Decoded content with universal newlines
+
+        Raises:
+        ------
+            OSError: If the file cannot be read
+            UnicodeDecodeError: If the file does not decode with its encoding
+
+        """
+        if self._content is not None:
+            return self._content
+        prefetched = self.prefetched
+        if prefetched is not None:
+            self.prefetched = None
+            return prefetched
+        with open(self.path, encoding=self.encoding or "utf-8") as f:
+            return f.read()
+
+    def load(self) -> str:
+        """Read the content of the file and keep it until released.
+
+        Returns:
+        -------
+            Decoded content with universal newlines
+
+        """
+        self._content = self.read_text()
+        return self._content
+
+    def prefetch(self, content: str) -> None:
+        """Hand over content read while probing, to be returned once by read_text()."""
+        self.prefetched = content
+
+    def release(self) -> None:
+        """Drop the loaded or prefetched content, if any."""
+        self._content = None
+        self.prefetched = None
+
+    def __repr__(self) -> str:
+        """Summarize the file for debugging."""
+        loaded = "loaded" if self._content is not None else "not loaded"
+        return f"FileInfo({self.relative_path!r}, {self.size_mb:.3f}MB, {loaded})"
@@ -1,16 +1,30 @@
 """Utility modules for smoosh."""
 
 from .config import load_config
-from .file_utils import find_git_root, get_file_size_mb, get_gitignore_patterns, walk_repository
+from .file_utils import (
+    find_git_root,
+    get_file_size_mb,
+    get_gitignore_patterns,
+    load_ignore_rules,
+    probe_file,
+    probe_repository,
+    walk_repository,
+)
+from .gitignore import GitignoreMatcher, IgnoreStack
 from .logger import logger
 from .path_resolver import resolve_path
 
 __all__ = [
+    "GitignoreMatcher",
+    "IgnoreStack",
     "find_git_root",
     "get_file_size_mb",
     "get_gitignore_patterns",
     "load_config",
+    "load_ignore_rules",
     "logger",
+    "probe_file",
+    "probe_repository",
     "resolve_path",
     "walk_repository",
 ]
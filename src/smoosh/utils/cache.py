@@ -0,0 +1,345 @@
+"""Persistent on-disk analysis cache for smoosh."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .logger import logger
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Bump whenever the layout of cache entries changes
+CACHE_FORMAT_VERSION = 1
+
+# Eviction defaults: entries unused for this long are dropped, and only the
+# most recently used repository caches are kept
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_REPOSITORIES = 64
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+# Every file smoosh writes to the cache directory starts with this prefix, so
+# clearing a cache directory shared with other files only deletes smoosh's own
+CACHE_FILE_PREFIX = "smoosh-"
+
+# Subdirectory of the cache directory holding content-addressed stores
+STORE_DIRNAME = f"{CACHE_FILE_PREFIX}store"
+
+# File in the stores directory whose modification time records the last eviction
+EVICTION_MARKER = ".evicted"
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory, honouring ``$XDG_CACHE_HOME``."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(cache_home) / "smoosh"
+
+
+def stat_key(stat_result: os.stat_result) -> List[int]:
+    """Return the part of a stat result that identifies an unchanged file."""
+    return [stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino]
+
+
+class AnalysisCache:
+    """Per-file analysis metadata of one repository, persisted between runs.
+
+    Entries are keyed by relative path and validated against the file's
+    (mtime_ns, size, inode), so any change to a file invalidates its entry.
+    Each repository gets its own JSON file in the cache directory, named
+    with CACHE_FILE_PREFIX.
+    """
+
+    def __init__(
+        self,
+        root: PathLike,
+        cache_dir: Optional[PathLike] = None,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        max_repositories: int = DEFAULT_MAX_REPOSITORIES,
+    ) -> None:
+        """Open the cache of a repository, starting empty if it is missing or stale.
+
+        Args:
+        ----
+            root: Repository root the entries are relative to
+            cache_dir: Directory holding cache files, default_cache_dir() if None
+            max_age_days: Drop entries not used for this many days
+            max_repositories: Number of repository caches to keep in cache_dir
+
+        """
+        self.root = os.path.abspath(str(root))
+        self.cache_dir = Path(str(cache_dir)) if cache_dir else default_cache_dir()
+        self.max_age_days = max_age_days
+        self.max_repositories = max_repositories
+        self.hits = 0
+        self.misses = 0
+
+        digest = hashlib.sha1(self.root.encode("utf-8"), usedforsecurity=False).hexdigest()
+        self.path = self.cache_dir / f"{CACHE_FILE_PREFIX}{digest[:20]}.json"
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._now = time.time()
+        self._entries: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        """Read the cache file, discarding it if unreadable or from another version."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_FORMAT_VERSION or data.get("root") != self.root:
+            return {}
+        entries = data.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def lookup(self, rel_path: str, stat_result: os.stat_result) -> Optional[Dict[str, Any]]:
+        """Return the cached metadata of a file if it has not changed.
+
+        Args:
+        ----
+            rel_path: Slash-separated path relative to the repository root
+            stat_result: Current stat result of the file
+
+        Returns:
+        -------
+            Cached metadata, or None if missing or outdated
+
+        """
+        key = stat_key(stat_result)
+        with self._lock:
+            entry = self._entries.get(rel_path)
+            if entry is None or entry.get("key") != key:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self._now - entry.get("used", 0) > _SECONDS_PER_DAY:
+                # Only refresh the timestamp daily to avoid rewriting the cache every run
+                entry["used"] = self._now
+                self._dirty = True
+            return entry
+
+    def store(self, rel_path: str, stat_result: os.stat_result, **metadata: Any) -> None:
+        """Record metadata of a file.
+
+        Args:
+        ----
+            rel_path: Slash-separated path relative to the repository root
+            stat_result: Stat result the metadata was computed from
+            **metadata: JSON-serializable metadata, merged into any existing entry
+
+        """
+        key = stat_key(stat_result)
+        with self._lock:
+            entry = self._entries.get(rel_path)
+            if entry is None or entry.get("key") != key:
+                entry = {"key": key}
+                self._entries[rel_path] = entry
+            for name, value in metadata.items():
+                if entry.get(name) != value:
+                    entry[name] = value
+                    self._dirty = True
+            entry["used"] = self._now
+
+    def save(self) -> None:
+        """Write the cache back to disk if it changed and evict stale data."""
+        self._evict_stores()
+        cutoff = self._now - self.max_age_days * _SECONDS_PER_DAY
+        with self._lock:
+            stale = [path for path, entry in self._entries.items() if entry.get("used", 0) < cutoff]
+            for path in stale:
+                del self._entries[path]
+            if not self._dirty and not stale:
+                return
+            data = {"version": CACHE_FORMAT_VERSION, "root": self.root, "entries": self._entries}
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial cache
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.cache_dir, prefix=CACHE_FILE_PREFIX, suffix=".tmp"
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Failed to write analysis cache {self.path}: {e}")
+            return
+
+        self._evict_repositories()
+
+    def _evict_repositories(self) -> None:
+        """Remove the least recently written repository caches beyond the limit."""
+        try:
+            cache_files = sorted(
+                self.cache_dir.glob(f"{CACHE_FILE_PREFIX}*.json"),
+                key=lambda p: p.stat().st_mtime,
+                reverse=True,
+            )
+        except OSError:
+            return
+        for stale_file in cache_files[self.max_repositories :]:
+            try:
+                stale_file.unlink()
+            except OSError:
+                pass
+
+    def _evict_stores(self) -> None:
+        """Evict stale store entries, at most once a day as it walks every store."""
+        marker = self.cache_dir / STORE_DIRNAME / EVICTION_MARKER
+        try:
+            if self._now - marker.stat().st_mtime < _SECONDS_PER_DAY:
+                return
+        except OSError:
+            if not marker.parent.is_dir():
+                return
+        evict_stores(self.cache_dir, self.max_age_days, self._now)
+        try:
+            marker.touch()
+        except OSError:
+            pass
+
+
+class ContentStore:
+    """Content-addressed text store, e.g. for derived forms of file contents.
+
+    Values are keyed by a hash of the content they were derived from, so they
+    stay valid when files move and are shared across repositories. Each value
+    is a file, sharded into subdirectories by the first two key characters.
+    Reading a value refreshes its modification time daily, so evict_stores()
+    drops the values that were not used for a while.
+    """
+
+    def __init__(self, namespace: str, cache_dir: Optional[PathLike] = None) -> None:
+        """Open a store.
+
+        Args:
+        ----
+            namespace: Name of the store, one directory per namespace
+            cache_dir: Directory holding cache files, default_cache_dir() if None
+
+        """
+        base = Path(str(cache_dir)) if cache_dir else default_cache_dir()
+        self.directory = base / STORE_DIRNAME / namespace
+
+    def _path(self, key: str) -> Path:
+        """Return the file holding the value of key."""
+        return self.directory / key[:2] / key[2:]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value stored under key, or None if missing."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = f.read()
+                if time.time() - os.fstat(f.fileno()).st_mtime > _SECONDS_PER_DAY:
+                    os.utime(path)
+                return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value under key, logging instead of failing on I/O errors."""
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Failed to write {path}: {e}")
+
+
+class MemoryStore(ContentStore):
+    """ContentStore kept in memory for one run, used when caching is disabled."""
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self._values: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value stored under key, or None if missing."""
+        return self._values.get(key)
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value under key."""
+        self._values[key] = value
+
+
+def evict_stores(
+    cache_dir: Optional[PathLike] = None,
+    max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    now: Optional[float] = None,
+) -> int:
+    """Delete store entries not written or read for max_age_days.
+
+    Args:
+    ----
+        cache_dir: Directory holding cache files, default_cache_dir() if None
+        max_age_days: Age in days, by modification time, of the entries to delete
+        now: Current time, time.time() if None
+
+    Returns:
+    -------
+        Number of files removed
+
+    """
+    directory = (Path(str(cache_dir)) if cache_dir else default_cache_dir()) / STORE_DIRNAME
+    cutoff = (time.time() if now is None else now) - max_age_days * _SECONDS_PER_DAY
+    removed = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if dirpath == str(directory) and filename == EVICTION_MARKER:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def clear_cache(cache_dir: Optional[PathLike] = None) -> int:
+    """Delete all cache files.
+
+    Only smoosh's own files are removed, those named with CACHE_FILE_PREFIX, so
+    a cache directory shared with a project keeps its other files.
+
+    Args:
+    ----
+        cache_dir: Directory holding cache files, default_cache_dir() if None
+
+    Returns:
+    -------
+        Number of files removed
+
+    """
+    directory = Path(str(cache_dir)) if cache_dir else default_cache_dir()
+    removed = 0
+    if not directory.is_dir():
+        return removed
+    for path in directory.iterdir():
+        if (
+            path.name.startswith(CACHE_FILE_PREFIX)
+            and path.suffix in (".json", ".tmp")
+            and path.is_file()
+        ):
+            path.unlink()
+            removed += 1
+
+    stores = directory / STORE_DIRNAME
+    if stores.is_dir():
+        removed += sum(1 for path in stores.rglob("*") if path.is_file())
+        shutil.rmtree(stores)
+    return removed
@@ -0,0 +1,160 @@
+"""Tiered text/binary classification of files for smoosh."""
+
+import codecs
+import os
+from typing import NamedTuple, Optional, Union
+
+import chardet
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Number of leading bytes inspected by the content-based tiers
+SAMPLE_SIZE = 8192
+
+# Tiers, cheapest first; each classification records the one that decided it
+TIER_EXTENSION = "extension"
+TIER_EMPTY = "empty"
+TIER_CONTROL_BYTES = "control-bytes"
+TIER_UTF8 = "utf-8"
+TIER_CHARDET = "chardet"
+TIER_UNREADABLE = "unreadable"
+TIERS = (TIER_EXTENSION, TIER_EMPTY, TIER_CONTROL_BYTES, TIER_UTF8, TIER_CHARDET, TIER_UNREADABLE)
+
+# fmt: off
+TEXT_EXTENSIONS = frozenset(
+    {
+        ".bat", ".c", ".cc", ".cfg", ".cjs", ".clj", ".cmake", ".conf", ".cpp", ".cs",
+        ".css", ".csv", ".cxx", ".dart", ".el", ".env", ".erl", ".ex", ".exs", ".fish",
+        ".go", ".gradle", ".graphql", ".h", ".hpp", ".hs", ".htm", ".html", ".ini",
+        ".ipynb", ".java", ".jl", ".js", ".json", ".jsx", ".kt", ".kts", ".less", ".lua",
+        ".m", ".md", ".mjs", ".ml", ".php", ".pl", ".pm", ".properties", ".proto",
+        ".ps1", ".py", ".pyi", ".pyx", ".r", ".rb", ".rs", ".rst", ".sass", ".scala",
+        ".scss", ".sh", ".sql", ".svelte", ".svg", ".swift", ".tex", ".toml", ".ts",
+        ".tsv", ".tsx", ".txt", ".vue", ".xml", ".yaml", ".yml", ".zsh",
+    }
+)
+
+TEXT_FILENAMES = frozenset(
+    {
+        ".editorconfig", ".flake8", ".gitattributes", ".gitignore", ".gitmodules",
+        "AUTHORS", "CHANGELOG", "CODEOWNERS", "Dockerfile", "Gemfile", "LICENSE",
+        "Makefile", "MANIFEST.in", "NOTICE", "Procfile", "README", "Vagrantfile",
+    }
+)
+
+BINARY_EXTENSIONS = frozenset(
+    {
+        ".7z", ".a", ".avi", ".bin", ".bmp", ".bz2", ".class", ".db", ".dll", ".dmg",
+        ".doc", ".docx", ".dylib", ".eot", ".exe", ".flac", ".gif", ".gz", ".h5",
+        ".ico", ".iso", ".jar", ".jpeg", ".jpg", ".lib", ".mkv", ".mov", ".mp3", ".mp4",
+        ".npy", ".npz", ".o", ".obj", ".ogg", ".otf", ".parquet", ".pdf", ".pickle",
+        ".pkl", ".png", ".ppt", ".pptx", ".psd", ".pt", ".pyc", ".pyd", ".pyo", ".rar",
+        ".so", ".sqlite", ".sqlite3", ".tar", ".tgz", ".tif", ".tiff", ".ttf", ".wasm",
+        ".wav", ".webm", ".webp", ".whl", ".woff", ".woff2", ".xls", ".xlsx", ".xz",
+        ".zip", ".zst",
+    }
+)
+# fmt: on
+
+# Bytes that commonly appear in text: printable ASCII, common whitespace and
+# escape, and everything >= 0x80 (left for the encoding tiers to judge)
+_TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+# Share of control bytes above which a sample is considered binary
+MAX_CONTROL_RATIO = 0.3
+
+
+class Classification(NamedTuple):
+    """Outcome of classifying a file as text or binary."""
+
+    is_text: bool
+    tier: str
+    encoding: Optional[str] = None
+
+
+def classify_name(name: str) -> Optional[Classification]:
+    """Classify a file from its name alone.
+
+    Args:
+    ----
+        name: File name
+
+    Returns:
+    -------
+        Classification if the extension or name is known, None otherwise
+
+    """
+    if name in TEXT_FILENAMES:
+        return Classification(True, TIER_EXTENSION, "utf-8")
+    extension = os.path.splitext(name)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        return Classification(True, TIER_EXTENSION, "utf-8")
+    if extension in BINARY_EXTENSIONS:
+        return Classification(False, TIER_EXTENSION)
+    return None
+
+
+def classify_sample(sample: bytes) -> Classification:
+    """Classify a file from a sample of its leading bytes.
+
+    Args:
+    ----
+        sample: Up to SAMPLE_SIZE leading bytes of the file
+
+    Returns:
+    -------
+        Classification decided by the cheapest conclusive content tier
+
+    """
+    if not sample:
+        return Classification(True, TIER_EMPTY, "utf-8")
+
+    if b"\0" in sample:
+        return Classification(False, TIER_CONTROL_BYTES)
+    control_bytes = len(sample.translate(None, _TEXT_BYTES))
+    if control_bytes > MAX_CONTROL_RATIO * len(sample):
+        return Classification(False, TIER_CONTROL_BYTES)
+
+    try:
+        # Incremental decoding tolerates a multi-byte character cut off at the end
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return Classification(True, TIER_UTF8, "utf-8")
+    except UnicodeDecodeError:
+        pass
+
+    # Last resort: statistical detection of legacy encodings
+    encoding = chardet.detect(sample)["encoding"]
+    if encoding is None:
+        return Classification(False, TIER_CHARDET)
+    try:
+        sample.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return Classification(False, TIER_CHARDET)
+    return Classification(True, TIER_CHARDET, encoding)
+
+
+def classify_file(path: PathLike, sample: Optional[bytes] = None) -> Classification:
+    """Classify a file as text or binary, reading its head only if needed.
+
+    Args:
+    ----
+        path: Path to the file
+        sample: Leading bytes of the file if already read
+
+    Returns:
+    -------
+        Classification, with unreadable files reported as binary
+
+    """
+    by_name = classify_name(os.path.basename(str(path)))
+    if by_name is not None:
+        return by_name
+
+    if sample is None:
+        try:
+            with open(str(path), "rb") as f:
+                sample = f.read(SAMPLE_SIZE)
+        except OSError:
+            return Classification(False, TIER_UNREADABLE)
+    return classify_sample(sample)
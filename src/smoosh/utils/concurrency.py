@@ -0,0 +1,265 @@
+"""Concurrency helpers for smoosh."""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Deque, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Upper bound for automatically sized I/O pools, matching ThreadPoolExecutor
+MAX_AUTO_THREADS = 32
+
+# Batches sent to worker processes are closed at this total weight (e.g. bytes)
+# or item count, large enough to amortize pickling and scheduling per batch
+DEFAULT_BATCH_WEIGHT = 128 * 1024
+DEFAULT_BATCH_ITEMS = 256
+
+# Workers are started from a clean server process (or spawned where there is no
+# fork server) rather than forked, as reader threads are running by then and
+# forking a multi-threaded process can deadlock on locks they hold
+PROCESS_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Below this total weight work is done in-process, as starting workers would
+# cost more than it saves
+DEFAULT_MIN_PARALLEL_WEIGHT = 512 * 1024
+
+
+def resolve_jobs(jobs: Optional[int]) -> int:
+    """Resolve a configured job count to a number of workers.
+
+    Args:
+    ----
+        jobs: Configured job count; None or values below 1 mean automatic
+
+    Returns:
+    -------
+        Number of workers to use, at least 1
+
+    """
+    if jobs is not None and jobs >= 1:
+        return jobs
+    return min(MAX_AUTO_THREADS, (os.cpu_count() or 1) + 4)
+
+
+def resolve_processes(jobs: Optional[int]) -> int:
+    """Resolve a configured job count to a number of worker processes.
+
+    Args:
+    ----
+        jobs: Configured job count; None or values below 1 mean one per CPU
+
+    Returns:
+    -------
+        Number of processes to use, at least 1
+
+    """
+    if jobs is not None and jobs >= 1:
+        return jobs
+    return os.cpu_count() or 1
+
+
+def thread_map(func: Callable[[T], R], items: Iterable[T], jobs: Optional[int] = None) -> List[R]:
+    """Apply func to every item on a bounded thread pool, preserving order.
+
+    Falls back to a plain loop when a single worker is requested or there is
+    nothing to parallelize.
+
+    Args:
+    ----
+        func: Function to apply; exceptions propagate to the caller
+        items: Items to process
+        jobs: Configured job count, see resolve_jobs
+
+    Returns:
+    -------
+        Results in the order of items
+
+    """
+    item_list = list(items)
+    workers = min(resolve_jobs(jobs), len(item_list))
+    if workers <= 1:
+        return [func(item) for item in item_list]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smoosh") as executor:
+        return list(executor.map(func, item_list))
+
+
+def thread_imap(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    jobs: Optional[int] = None,
+    window: Optional[int] = None,
+) -> Iterator[R]:
+    """Lazily apply func on a bounded thread pool, yielding results in order.
+
+    At most ``window`` items are in flight or buffered at any time, so memory
+    stays bounded no matter how many items there are.
+
+    Args:
+    ----
+        func: Function to apply; exceptions propagate when their result is reached
+        items: Items to process, consumed lazily
+        jobs: Configured job count, see resolve_jobs
+        window: Maximum number of results computed ahead, twice the workers if None
+
+    Yields:
+    ------
+        Results in the order of items
+
+    """
+    workers = resolve_jobs(jobs)
+    item_iter = iter(items)
+    if workers <= 1:
+        yield from map(func, item_iter)
+        return
+
+    window = window or workers * 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smoosh") as executor:
+        pending: Deque[Future[R]] = deque()
+        try:
+            for item in item_iter:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class _Batch(Generic[T, R]):
+    """Items sent to a worker process together, and their results."""
+
+    def __init__(self) -> None:
+        self.items: List[T] = []
+        self.weight = 0
+        self.future: Optional[Future[List[R]]] = None
+        self.results: Optional[List[R]] = None
+
+
+class BatchedProcessPool(Generic[T, R]):
+    """Ordered, batched execution of a CPU-bound function on worker processes.
+
+    Items are submitted one at a time and grouped into batches by weight, so
+    small items do not each pay for pickling and scheduling. The pool is only
+    started once the submitted weight reaches min_parallel_weight; until then,
+    and always with a single job, batches run in-process when their results
+    are requested.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[List[T]], List[R]],
+        jobs: Optional[int] = None,
+        batch_weight: int = DEFAULT_BATCH_WEIGHT,
+        batch_items: int = DEFAULT_BATCH_ITEMS,
+        min_parallel_weight: int = DEFAULT_MIN_PARALLEL_WEIGHT,
+    ) -> None:
+        """Create a pool; no processes are started yet.
+
+        Args:
+        ----
+            func: Picklable function mapping a batch of items to their results
+            jobs: Configured job count, see resolve_processes
+            batch_weight: Weight at which a batch is closed
+            batch_items: Number of items at which a batch is closed
+            min_parallel_weight: Submitted weight from which workers are used
+
+        """
+        self.func = func
+        self.workers = resolve_processes(jobs)
+        self.batch_weight = batch_weight
+        self.batch_items = batch_items
+        self.min_parallel_weight = min_parallel_weight
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._current: _Batch[T, R] = _Batch()
+        self._queued: List[_Batch[T, R]] = []
+        self._total_weight = 0
+
+    @property
+    def window_weight(self) -> int:
+        """Weight a consumer should allow in flight to keep all workers busy."""
+        return max(2 * self.workers * self.batch_weight, 2 * self.min_parallel_weight)
+
+    def submit(self, item: T, weight: int = 1) -> Tuple[_Batch[T, R], int]:
+        """Queue an item and return a ticket for its result.
+
+        Args:
+        ----
+            item: Picklable item
+            weight: Cost of the item, e.g. its size in bytes
+
+        Returns:
+        -------
+            Ticket to pass to result()
+
+        """
+        batch = self._current
+        batch.items.append(item)
+        batch.weight += weight
+        self._total_weight += weight
+        ticket = (batch, len(batch.items) - 1)
+        if batch.weight >= self.batch_weight or len(batch.items) >= self.batch_items:
+            self._close_batch()
+        return ticket
+
+    def result(self, ticket: Tuple[_Batch[T, R], int]) -> R:
+        """Return the result of a submitted item, waiting for it if needed.
+
+        Args:
+        ----
+            ticket: Ticket returned by submit()
+
+        Returns:
+        -------
+            Result of the item; exceptions raised by func propagate
+
+        """
+        batch, index = ticket
+        if batch.results is None:
+            if batch is self._current:
+                self._close_batch()
+            if batch.future is not None:
+                batch.results = batch.future.result()
+            else:
+                self._queued.remove(batch)
+                batch.results = self.func(batch.items)
+            batch.items = []
+        return batch.results[index]
+
+    def _close_batch(self) -> None:
+        """Queue the current batch and dispatch queued batches if parallel."""
+        self._queued.append(self._current)
+        self._current = _Batch()
+        if self.workers <= 1 or self._total_weight < self.min_parallel_weight:
+            return
+        if self._executor is None:
+            context = multiprocessing.get_context(PROCESS_START_METHOD)
+            if PROCESS_START_METHOD == "forkserver":
+                # Import the main module and the function once in the server, not per worker
+                context.set_forkserver_preload(["__main__", self.func.__module__])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        for batch in self._queued:
+            batch.future = self._executor.submit(self.func, batch.items)
+            batch.items = []
+        self._queued = []
+
+    def close(self) -> None:
+        """Shut the workers down, cancelling batches that were not started."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "BatchedProcessPool[T, R]":
+        """Use the pool as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the pool."""
+        self.close()
@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from typing import Any, Dict, TypedDict, Union
+from typing import Any, Dict, List, TypedDict, Union
 
 import yaml
 
@@ -22,6 +22,7 @@ class OutputDict(TypedDict):
     """TypedDict for output configuration."""
 
     max_tokens: int
+    pack: bool
     size_limits: SizeLimitsDict
 
 
@@ -38,18 +39,73 @@ class GitignoreDict(TypedDict):
     respect: bool
 
 
+class GitDict(TypedDict):
+    """TypedDict for git integration configuration."""
+
+    use_index: bool
+    include_untracked: bool
+    since: str
+    with_imports: bool
+
+
+class PerformanceDict(TypedDict):
+    """TypedDict for performance configuration."""
+
+    jobs: int
+
+
+class CacheDict(TypedDict):
+    """TypedDict for analysis cache configuration."""
+
+    enabled: bool
+    directory: str
+    max_age_days: float
+
+
+class TokensDict(TypedDict):
+    """TypedDict for token counting configuration."""
+
+    vocabulary: str
+
+
+class FocusDict(TypedDict):
+    """TypedDict for import-graph focus configuration."""
+
+    modules: List[str]
+    depth: int
+
+
+class TreeDict(TypedDict):
+    """TypedDict for repository structure rendering configuration."""
+
+    max_depth: int
+    max_entries: int
+
+
 class ConfigDict(TypedDict):
     """TypedDict for the overall configuration."""
 
     output: OutputDict
     thresholds: ThresholdsDict
     gitignore: GitignoreDict
+    git: GitDict
+    performance: PerformanceDict
+    cache: CacheDict
+    tokens: TokensDict
+    focus: FocusDict
+    tree: TreeDict
 
 
 DEFAULT_CONFIG: ConfigDict = {
-    "output": {"max_tokens": 5000, "size_limits": {"file_max_mb": 1.0}},
+    "output": {"max_tokens": 5000, "pack": False, "size_limits": {"file_max_mb": 1.0}},
     "thresholds": {"cat_threshold": 5000, "fold_threshold": 15000},
     "gitignore": {"respect": True},
+    "git": {"use_index": False, "include_untracked": False, "since": "", "with_imports": False},
+    "performance": {"jobs": 0},
+    "cache": {"enabled": True, "directory": "", "max_age_days": 30},
+    "tokens": {"vocabulary": ""},
+    "focus": {"modules": [], "depth": 3},
+    "tree": {"max_depth": 0, "max_entries": 200},
 }
 
 
@@ -58,6 +114,8 @@ def _merge_output(base_output: OutputDict, update_output: Dict[str, Any]) -> Out
     output_dict = base_output.copy()
     if "max_tokens" in update_output:
         output_dict["max_tokens"] = update_output["max_tokens"]
+    if "pack" in update_output:
+        output_dict["pack"] = update_output["pack"]
     if "size_limits" in update_output and isinstance(update_output["size_limits"], dict):
         size_limits = output_dict["size_limits"].copy()
         if "file_max_mb" in update_output["size_limits"]:
@@ -88,6 +146,70 @@ def _merge_gitignore(
     return gitignore_dict
 
 
+def _merge_git(base_git: GitDict, update_git: Dict[str, Any]) -> GitDict:
+    """Merge git section of configuration."""
+    git_dict = base_git.copy()
+    if "use_index" in update_git:
+        git_dict["use_index"] = update_git["use_index"]
+    if "include_untracked" in update_git:
+        git_dict["include_untracked"] = update_git["include_untracked"]
+    if "since" in update_git:
+        git_dict["since"] = update_git["since"]
+    if "with_imports" in update_git:
+        git_dict["with_imports"] = update_git["with_imports"]
+    return git_dict
+
+
+def _merge_performance(
+    base_performance: PerformanceDict, update_performance: Dict[str, Any]
+) -> PerformanceDict:
+    """Merge performance section of configuration."""
+    performance_dict = base_performance.copy()
+    if "jobs" in update_performance:
+        performance_dict["jobs"] = update_performance["jobs"]
+    return performance_dict
+
+
+def _merge_cache(base_cache: CacheDict, update_cache: Dict[str, Any]) -> CacheDict:
+    """Merge cache section of configuration."""
+    cache_dict = base_cache.copy()
+    if "enabled" in update_cache:
+        cache_dict["enabled"] = update_cache["enabled"]
+    if "directory" in update_cache:
+        cache_dict["directory"] = update_cache["directory"]
+    if "max_age_days" in update_cache:
+        cache_dict["max_age_days"] = update_cache["max_age_days"]
+    return cache_dict
+
+
+def _merge_tokens(base_tokens: TokensDict, update_tokens: Dict[str, Any]) -> TokensDict:
+    """Merge tokens section of configuration."""
+    tokens_dict = base_tokens.copy()
+    if "vocabulary" in update_tokens:
+        tokens_dict["vocabulary"] = update_tokens["vocabulary"]
+    return tokens_dict
+
+
+def _merge_focus(base_focus: FocusDict, update_focus: Dict[str, Any]) -> FocusDict:
+    """Merge focus section of configuration."""
+    focus_dict = base_focus.copy()
+    if "modules" in update_focus:
+        focus_dict["modules"] = update_focus["modules"]
+    if "depth" in update_focus:
+        focus_dict["depth"] = update_focus["depth"]
+    return focus_dict
+
+
+def _merge_tree(base_tree: TreeDict, update_tree: Dict[str, Any]) -> TreeDict:
+    """Merge tree section of configuration."""
+    tree_dict = base_tree.copy()
+    if "max_depth" in update_tree:
+        tree_dict["max_depth"] = update_tree["max_depth"]
+    if "max_entries" in update_tree:
+        tree_dict["max_entries"] = update_tree["max_entries"]
+    return tree_dict
+
+
 def load_config(config_dir: Path) -> Dict[str, Any]:
     """Load configuration from smoosh.yaml in the specified directory.
 
@@ -103,7 +225,30 @@ def load_config(config_dir: Path) -> Dict[str, Any]:
     # Define default configuration
     default_config = {
         "gitignore": {"respect": True},
-        "output": {"size_limits": {"file_max_mb": 1.0}, "max_tokens": 10000},
+        # In git repositories, optionally enumerate tracked files from .git/index
+        # instead of walking the tree, or only the files changed since a revision
+        # (plus their direct imports)
+        "git": {
+            "use_index": False,
+            "include_untracked": False,
+            "since": "",
+            "with_imports": False,
+        },
+        # With pack set, files are selected to fit max_tokens instead of only warning
+        "output": {"size_limits": {"file_max_mb": 1.0}, "max_tokens": 10000, "pack": False},
+        # Per-file token limits for packing: larger files are not included in full
+        "thresholds": {"cat_threshold": 5000, "fold_threshold": 15000},
+        # Worker count for concurrent file I/O; 0 sizes the pool automatically
+        "performance": {"jobs": 0},
+        # Persistent per-file analysis cache; an empty directory means ~/.cache/smoosh
+        "cache": {"enabled": True, "directory": "", "max_age_days": 30},
+        # Local .tiktoken vocabulary for exact token counts; empty uses a fast estimate
+        "tokens": {"vocabulary": ""},
+        # Only these dotted modules (or packages) and their imports up to depth levels
+        "focus": {"modules": [], "depth": 3},
+        # Limits of the structure in the header: directories below max_depth and
+        # children beyond max_entries are summarized by file count; 0 for no limit
+        "tree": {"max_depth": 0, "max_entries": 200},
     }
 
     try:
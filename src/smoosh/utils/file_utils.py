@@ -1,15 +1,36 @@
 """File handling utilities for smoosh."""
 
-import fnmatch
+import hashlib
 import os
+import stat
 from pathlib import Path
-from typing import Iterator, Optional, Set, Union
-
-import chardet
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from ..custom_types import FileInfo
+from .cache import AnalysisCache
+from .classifier import (
+    SAMPLE_SIZE,
+    TIER_UNREADABLE,
+    Classification,
+    classify_file,
+    classify_name,
+    classify_sample,
+)
+from .concurrency import thread_map
+from .gitignore import (
+    GitignoreMatcher,
+    IgnoreLevel,
+    IgnoreStack,
+    normalize_pattern,
+    read_ignore_file,
+)
+from .logger import logger
 
 # Define a more specific PathLike type that only includes str paths
 PathLike = Union[str, "os.PathLike[str]"]
 
+BYTES_PER_MB = 1024 * 1024
+
 # Default Python patterns that should always be ignored
 DEFAULT_PYTHON_IGNORE = {
     # Python bytecode
@@ -50,9 +71,15 @@ DEFAULT_PYTHON_IGNORE = {
     "**/.DS_Store",
 }
 
+# Names that are always skipped, whatever the ignore patterns say
+ALWAYS_IGNORED_NAMES = frozenset({"__pycache__", ".git", ".pytest_cache", "venv", ".env", "env"})
+
+# The default patterns compiled once, for paths that are listed rather than walked
+_DEFAULT_IGNORE_MATCHER = GitignoreMatcher(sorted(DEFAULT_PYTHON_IGNORE))
+
 
 def is_text_file(path: PathLike) -> bool:
-    """Check if a file is a text file by analyzing its content.
+    """Check if a file is a text file by its name and leading content.
 
     Args:
     ----
@@ -63,23 +90,7 @@ def is_text_file(path: PathLike) -> bool:
         True if the file appears to be text, False otherwise
 
     """
-    try:
-        with open(str(path), "rb") as f:
-            # Read first 1024 bytes for detection
-            sample = f.read(1024)
-            if not sample:  # Empty file
-                return True
-
-            # Try to detect encoding
-            result = chardet.detect(sample)
-            if result["encoding"] is None:
-                return False
-
-            # Check if file can be decoded as text
-            sample.decode(result["encoding"])
-            return True
-    except (UnicodeDecodeError, OSError):
-        return False
+    return classify_file(path).is_text
 
 
 def get_file_size_mb(path: PathLike) -> float:
@@ -94,7 +105,7 @@ def get_file_size_mb(path: PathLike) -> float:
         File size in MB
 
     """
-    return os.path.getsize(str(path)) / (1024 * 1024)
+    return os.path.getsize(str(path)) / BYTES_PER_MB
 
 
 def find_git_root(start_path: PathLike) -> Optional[Path]:
@@ -118,42 +129,124 @@ def find_git_root(start_path: PathLike) -> Optional[Path]:
 
     current = start_path
     while current != current.parent:
-        if (current / ".git").is_dir():
+        # A .git file marks a worktree or submodule checkout
+        if (current / ".git").exists():
             return current
         current = current.parent
     return None
 
 
-def _normalize_pattern(pattern: str) -> str:
-    """Normalize a gitignore pattern.
+def find_git_dir(git_root: PathLike) -> Optional[Path]:
+    """Find the git directory of a work tree, following ``gitdir:`` files.
 
     Args:
     ----
-        pattern: Raw pattern from gitignore
+        git_root: Root of the work tree
 
     Returns:
     -------
-        Normalized pattern or empty string if invalid
+        Path to the git directory if found, None otherwise
 
     """
-    pattern = pattern.strip()
+    dot_git = Path(str(git_root)) / ".git"
+    if dot_git.is_dir():
+        return dot_git
+
+    try:
+        content = dot_git.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+
+    git_dir = Path(content[len("gitdir:") :].strip())
+    if not git_dir.is_absolute():
+        git_dir = dot_git.parent / git_dir
+    return git_dir if git_dir.is_dir() else None
+
+
+def git_common_dir(git_dir: Path) -> Path:
+    """Return the directory shared by all worktrees of a repository."""
+    try:
+        common = (git_dir / "commondir").read_text(encoding="utf-8").strip()
+    except OSError:
+        return git_dir
+    common_dir = Path(common)
+    return common_dir if common_dir.is_absolute() else git_dir / common_dir
+
+
+def _read_excludes_file_setting(config_path: Path) -> Optional[str]:
+    """Read ``core.excludesFile`` from a git config file, if set."""
+    try:
+        lines = config_path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+
+    section = ""
+    value: Optional[str] = None
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            section = line[1 : line.find("]")].strip().lower()
+            continue
+        name, sep, setting = line.partition("=")
+        if sep and section == "core" and name.strip().lower() == "excludesfile":
+            value = setting.strip().strip('"')
+    return value
 
-    # Skip empty lines and comments
-    if not pattern or pattern.startswith("#"):
-        return ""
 
-    # Skip negation patterns for now
-    if pattern.startswith("!"):
-        return ""
+def get_exclude_files(git_root: Optional[PathLike]) -> List[Path]:
+    """Get the excludes files that apply below the gitignore files.
+
+    These are the global excludes file (``core.excludesFile``, defaulting to
+    ``$XDG_CONFIG_HOME/git/ignore``) followed by ``$GIT_DIR/info/exclude``.
+
+    Args:
+    ----
+        git_root: Root of the git work tree, if any
+
+    Returns:
+    -------
+        Existing excludes files in increasing precedence
+
+    """
+    config_home = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config")
+    git_dir = find_git_dir(git_root) if git_root else None
+
+    config_files = [config_home / "git" / "config", Path.home() / ".gitconfig"]
+    if git_dir is not None:
+        config_files.append(git_common_dir(git_dir) / "config")
+
+    excludes_file = str(config_home / "git" / "ignore")
+    for config_file in config_files:
+        setting = _read_excludes_file_setting(config_file)
+        if setting:
+            excludes_file = os.path.expanduser(setting)
+
+    candidates = [Path(excludes_file)]
+    if git_dir is not None:
+        candidates.append(git_common_dir(git_dir) / "info" / "exclude")
+    return [path for path in candidates if path.is_file()]
+
+
+def _normalize_pattern(pattern: str) -> str:
+    """Normalize a gitignore pattern.
+
+    Args:
+    ----
+        pattern: Raw pattern from gitignore
 
-    # Remove leading slashes
-    if pattern.startswith("/"):
-        pattern = pattern[1:]
+    Returns:
+    -------
+        Normalized pattern or empty string if invalid
 
-    return pattern
+    """
+    return normalize_pattern(pattern)
 
 
-def get_gitignore_patterns(repo_root: PathLike) -> Set[str]:
+def get_gitignore_patterns(repo_root: PathLike) -> List[str]:
     """Get patterns from .gitignore file.
 
     Args:
@@ -162,10 +255,10 @@ def get_gitignore_patterns(repo_root: PathLike) -> Set[str]:
 
     Returns:
     -------
-        Set of gitignore patterns
+        List of gitignore patterns in precedence order, defaults first
 
     """
-    patterns = set(DEFAULT_PYTHON_IGNORE)  # Start with default patterns
+    patterns = list(DEFAULT_PYTHON_IGNORE)  # Start with default patterns
     gitignore_path = Path(str(repo_root)) / ".gitignore"
 
     if gitignore_path.is_file():
@@ -173,19 +266,86 @@ def get_gitignore_patterns(repo_root: PathLike) -> Set[str]:
             for line in f:
                 pattern = _normalize_pattern(line)
                 if pattern:
-                    patterns.add(pattern)
+                    patterns.append(pattern)
 
     return patterns
 
 
-def should_ignore_path(path: Path, relative_to: Path, ignore_patterns: Set[str]) -> bool:
+def load_ignore_rules(
+    root: PathLike, git_root: Optional[PathLike] = None, respect_gitignore: bool = True
+) -> IgnoreStack:
+    """Build the ignore rules for walking a directory.
+
+    Rules are stacked in git's order of precedence: smoosh's defaults, the global
+    excludes file, ``.git/info/exclude`` and then every ``.gitignore`` from the
+    git root down, the latter loaded lazily as the walker enters directories.
+    The ``.git`` directory is always ignored.
+
+    Args:
+    ----
+        root: Directory that will be walked
+        git_root: Root of the enclosing git work tree, if any
+        respect_gitignore: Whether to honour ignore files and default patterns
+
+    Returns:
+    -------
+        IgnoreStack for the walk
+
+    """
+    root_str = str(root)
+    ignore_root = str(git_root) if git_root else root_str
+
+    patterns: List[str] = []
+    if respect_gitignore:
+        patterns.extend(DEFAULT_PYTHON_IGNORE)
+        for exclude_file in get_exclude_files(git_root):
+            patterns.extend(read_ignore_file(str(exclude_file)))
+    patterns.append(".git/")
+
+    prefix = os.path.relpath(os.path.abspath(root_str), os.path.abspath(ignore_root))
+    prefix = "" if prefix == os.curdir or prefix.startswith(os.pardir) else prefix
+    base = GitignoreMatcher(patterns, prefix=prefix.replace(os.sep, "/"))
+
+    return IgnoreStack(root_str, base, ignore_root=ignore_root, nested=respect_gitignore)
+
+
+def is_default_ignored(rel_path: str) -> bool:
+    """Check whether the walker would skip a path under smoosh's default rules.
+
+    Args:
+    ----
+        rel_path: Slash-separated path of a file relative to the walked root
+
+    Returns:
+    -------
+        True if the path or one of its directories is always skipped or matches
+        a default pattern
+
+    """
+    if not ALWAYS_IGNORED_NAMES.isdisjoint(rel_path.split("/")):
+        return True
+    return _DEFAULT_IGNORE_MATCHER.is_ignored(rel_path)
+
+
+def _as_matcher(ignore_patterns: Union[GitignoreMatcher, Iterable[str], None]) -> GitignoreMatcher:
+    """Compile ignore patterns unless they are already a matcher."""
+    if isinstance(ignore_patterns, GitignoreMatcher):
+        return ignore_patterns
+    return GitignoreMatcher(ignore_patterns or ())
+
+
+def should_ignore_path(
+    path: Path,
+    relative_to: Path,
+    ignore_patterns: Union[GitignoreMatcher, Iterable[str]],
+) -> bool:
     """Check if a path should be ignored based on gitignore patterns.
 
     Args:
     ----
         path: Path to check
         relative_to: Repository root path to make path relative to
-        ignore_patterns: Set of patterns to check against
+        ignore_patterns: Compiled matcher or patterns to check against
 
     Returns:
     -------
@@ -193,42 +353,393 @@ def should_ignore_path(path: Path, relative_to: Path, ignore_patterns: Set[str])
 
     """
     # Quick check for common ignored directories
-    if path.name in {"__pycache__", ".git", ".pytest_cache", "venv", ".env", "env"}:
+    if path.name in ALWAYS_IGNORED_NAMES:
         return True
 
     # Get path relative to repo root
     try:
-        rel_path = str(path.relative_to(relative_to))
+        rel_path = path.relative_to(relative_to).as_posix()
     except ValueError:
         return False
 
-    # Normalize path separators
-    rel_path = rel_path.replace(os.sep, "/")
+    return _as_matcher(ignore_patterns).is_ignored(rel_path, path.is_dir())
+
+
+def _scan_files(root: Path, ignore: IgnoreStack) -> Iterator["os.DirEntry[str]"]:
+    """Yield directory entries for candidate files below root.
+
+    Directory patterns are checked once per directory and ignored directories are
+    pruned, so their subtrees are never enumerated. Symlinked directories are not
+    followed.
+
+    Args:
+    ----
+        root: Repository root path
+        ignore: Hierarchical ignore rules, extended as directories are entered
+
+    Yields:
+    ------
+        os.DirEntry objects for every non-ignored, non-directory entry
+
+    """
+    root_str = str(root)
+    prefix_len = len(os.path.join(root_str, ""))
+    pending: List[Tuple[str, str, IgnoreLevel]] = [(root_str, "", ignore.root_level)]
+
+    while pending:
+        current, rel_dir, parent_level = pending.pop()
+        level = ignore.enter(parent_level, current, rel_dir) if rel_dir else parent_level
+        try:
+            with os.scandir(current) as iterator:
+                entries = list(iterator)
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {current}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.name in ALWAYS_IGNORED_NAMES:
+                continue
+
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+
+            rel_path = entry.path[prefix_len:].replace(os.sep, "/")
+            if level.match(rel_path, is_dir):
+                continue
+
+            if is_dir:
+                subdirs.append((entry.path, rel_path, level))
+            else:
+                yield entry
+
+        # Reverse so that subdirectories are visited in listing order
+        pending.extend(reversed(subdirs))
+
+
+def _iter_candidates(
+    root: Path,
+    ignore_patterns: Union[IgnoreStack, GitignoreMatcher, Iterable[str], None],
+    max_size_mb: Optional[float],
+) -> Iterator[Tuple["os.DirEntry[str]", os.stat_result]]:
+    """Yield non-ignored regular files within the size limit with their stat results."""
+    if isinstance(ignore_patterns, IgnoreStack):
+        ignore = ignore_patterns
+    else:
+        ignore = IgnoreStack(str(root), _as_matcher(ignore_patterns), nested=False)
+
+    for entry in _scan_files(root, ignore):
+        try:
+            # Skip sockets, broken links and symlinks to directories
+            if not entry.is_file():
+                continue
+            # DirEntry caches the result, so this is the only stat of the file
+            stat_result = entry.stat()
+        except OSError:
+            continue
+
+        # Skip files exceeding size limit
+        if max_size_mb and stat_result.st_size / BYTES_PER_MB > max_size_mb:
+            continue
+
+        yield entry, stat_result
+
+
+def scan_repository(
+    root: PathLike,
+    ignore_patterns: Union[IgnoreStack, GitignoreMatcher, Iterable[str], None] = None,
+    max_size_mb: Optional[float] = None,
+) -> Dict[str, os.stat_result]:
+    """Stat every candidate file of a repository without opening any of them.
+
+    Args:
+    ----
+        root: Repository root path
+        ignore_patterns: Ignore stack, compiled matcher or flat patterns to ignore
+        max_size_mb: Maximum file size in MB
+
+    Returns:
+    -------
+        Stat result of every non-ignored regular file, keyed by slash-separated
+        path relative to root
+
+    """
+    root = Path(str(root))
+    prefix_len = len(os.path.join(str(root), ""))
+    return {
+        entry.path[prefix_len:].replace(os.sep, "/"): stat_result
+        for entry, stat_result in _iter_candidates(root, ignore_patterns, max_size_mb)
+    }
+
+
+def count_lines(text: str) -> int:
+    """Count the lines of text without splitting it into a list.
+
+    Args:
+    ----
+        text: Text with normalized newlines
+
+    Returns:
+    -------
+        Number of lines, counting a final unterminated line
+
+    """
+    return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+
+def hash_content(data: bytes) -> str:
+    """Return a short content hash used to recognize identical files.
+
+    Args:
+    ----
+        data: Raw file content
+
+    Returns:
+    -------
+        Hex digest
+
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _iter_tracked_candidates(
+    root: Path, tracked_files: Iterable[str], max_size_mb: Optional[float]
+) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """Yield tracked regular files within the size limit with their stat results."""
+    root_str = str(root)
+    for rel_path in tracked_files:
+        path = os.path.join(root_str, *rel_path.split("/"))
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            # Deleted in the work tree but still in the index
+            continue
+        if not stat.S_ISREG(stat_result.st_mode):
+            continue
+        if max_size_mb and stat_result.st_size / BYTES_PER_MB > max_size_mb:
+            continue
+        yield path, rel_path, stat_result
+
+
+def _decode(data: bytes, encoding: str) -> str:
+    """Decode file bytes with universal newlines, like reading in text mode."""
+    text = data.decode(encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
-    # Check against patterns
-    for pattern in ignore_patterns:
-        if pattern.endswith("/"):
-            # Directory matching
-            if any(fnmatch.fnmatch(part, pattern[:-1]) for part in path.parts):
-                return True
-        else:
-            # File matching
-            if fnmatch.fnmatch(rel_path, pattern):
-                return True
 
-    return False
+def _read_for_probe(
+    file_info: FileInfo,
+    classification: Optional[Classification],
+    load_content: bool,
+    prefetch: bool = False,
+) -> Classification:
+    """Open a file once to classify it and/or load its content.
+
+    Args:
+    ----
+        file_info: File being probed; receives content, line count and hash
+        classification: Classification known without reading, if any
+        load_content: Whether to read and decode the content of text files
+        prefetch: Whether to hand a file read whole to its next read_text()
+
+    Returns:
+    -------
+        Final classification of the file
+
+    """
+    path = str(file_info.path)
+    try:
+        with open(path, "rb") as f:
+            data = f.read(SAMPLE_SIZE)
+            # A short sample is the whole file
+            whole = len(data) < SAMPLE_SIZE
+            if classification is None:
+                classification = classify_sample(data)
+            if classification.is_text and load_content and not whole:
+                data += f.read()
+    except OSError as e:
+        logger.warning(f"Error reading file {path}: {e}")
+        return Classification(False, TIER_UNREADABLE)
+
+    if classification.is_text and (load_content or whole):
+        file_info.content_hash = hash_content(data)
+        try:
+            content = _decode(data, classification.encoding or "utf-8")
+        except (UnicodeDecodeError, LookupError) as e:
+            if load_content:
+                logger.warning(f"Error reading file {path}: {e}")
+            return classification
+        file_info.line_count = count_lines(content)
+        if load_content:
+            file_info.content = content
+        elif prefetch:
+            # Opened to classify it anyway: read_text() need not open it again
+            file_info.prefetch(content)
+    return classification
+
+
+def probe_file(
+    root: str,
+    relative_path: str,
+    stat_result: os.stat_result,
+    load_content: bool = False,
+    cache: Optional[AnalysisCache] = None,
+    prefetch: bool = False,
+) -> FileInfo:
+    """Gather everything smoosh needs to know about a file in a single open.
+
+    The size comes from the given stat result. Files with a known text or binary
+    name, or an up-to-date cache entry, are classified without opening them
+    unless their content is wanted; otherwise the leading sample read for
+    classification is reused as the start of the content.
+
+    Args:
+    ----
+        root: Repository root, shared by the FileInfo of every file
+        relative_path: Slash-separated path relative to the repository root
+        stat_result: Stat result of the file
+        load_content: Whether to read and decode the content of text files
+        cache: Persistent analysis cache to consult and update
+        prefetch: Whether to keep the text of a file read whole while
+            classifying it for its next read_text(); only set this when the
+            file will be read, as the text is held until then
+
+    Returns:
+    -------
+        FileInfo with size, text/binary verdict and, if requested, content
+
+    """
+    file_info = FileInfo(
+        root,
+        relative_path,
+        size_mb=stat_result.st_size / BYTES_PER_MB,
+        is_python=relative_path.endswith(".py"),
+        mtime_ns=stat_result.st_mtime_ns,
+    )
+
+    cached = cache.lookup(relative_path, stat_result) if cache is not None else None
+    if cached is not None and "is_text" in cached:
+        classification: Optional[Classification] = Classification(
+            cached["is_text"], cached["tier"], cached.get("encoding")
+        )
+        file_info.line_count = cached.get("lines")
+        file_info.content_hash = cached.get("hash")
+    else:
+        classification = classify_name(file_info.name)
+
+    if classification is None or (classification.is_text and load_content):
+        classification = _read_for_probe(file_info, classification, load_content, prefetch)
+
+    file_info.is_text = classification.is_text
+    file_info.encoding = classification.encoding
+    file_info.text_tier = classification.tier
+
+    if cache is not None and classification.tier != TIER_UNREADABLE:
+        metadata = {"is_text": file_info.is_text, "tier": file_info.text_tier}
+        metadata["encoding"] = file_info.encoding
+        if file_info.line_count is not None:
+            metadata["lines"] = file_info.line_count
+        if file_info.content_hash is not None:
+            metadata["hash"] = file_info.content_hash
+        cache.store(relative_path, stat_result, **metadata)
+
+    return file_info
+
+
+def probe_repository(
+    root: PathLike,
+    ignore_patterns: Union[IgnoreStack, GitignoreMatcher, Iterable[str], None] = None,
+    max_size_mb: Optional[float] = None,
+    load_content: bool = False,
+    jobs: Optional[int] = None,
+    tier_counts: Optional[Dict[str, int]] = None,
+    cache: Optional[AnalysisCache] = None,
+    tracked_files: Optional[Iterable[str]] = None,
+    include_untracked: bool = False,
+    prefetch: bool = False,
+) -> List[FileInfo]:
+    """Walk a repository and probe every relevant text file.
+
+    Every file is stat-ed once (by the directory scan) and opened at most once,
+    with the probes running on a bounded thread pool. When tracked_files is
+    given (e.g. from the git index) it replaces the directory walk, and ignore
+    rules only apply to the untracked files optionally walked in addition.
+
+    Args:
+    ----
+        root: Repository root path
+        ignore_patterns: Ignore stack, compiled matcher or flat patterns to ignore
+        max_size_mb: Maximum file size in MB
+        load_content: Whether to read the content of text files while probing
+        jobs: Number of probing threads; None or 0 sizes the pool automatically
+        tier_counts: Optional mapping updated with how many files each
+            classifier tier decided
+        cache: Persistent analysis cache; unchanged files skip classification
+        tracked_files: Slash-separated paths relative to root to probe instead
+            of walking the tree
+        include_untracked: With tracked_files, also walk the tree for files
+            that are neither tracked nor ignored
+        prefetch: Whether small files opened for classification keep their
+            text until read; only set this when every file will be read
+
+    Returns:
+    -------
+        FileInfo objects for the text files, in walk order
+
+    """
+    root = Path(str(root))
+    prefix_len = len(os.path.join(str(root), ""))
+    candidates: List[Tuple[str, str, os.stat_result]] = []
+    tracked: Set[str] = set()
+
+    if tracked_files is not None:
+        candidates.extend(_iter_tracked_candidates(root, tracked_files, max_size_mb))
+        tracked.update(rel_path for _, rel_path, _ in candidates)
+
+    if tracked_files is None or include_untracked:
+        for entry, stat_result in _iter_candidates(root, ignore_patterns, max_size_mb):
+            rel_path = entry.path[prefix_len:].replace(os.sep, "/")
+            if rel_path not in tracked:
+                candidates.append((entry.path, rel_path, stat_result))
+
+    # Every FileInfo refers to the same root string
+    root_str = str(root)
+    probed = thread_map(
+        lambda c: probe_file(root_str, c[1], c[2], load_content, cache, prefetch), candidates, jobs
+    )
+
+    text_files = []
+    for file_info in probed:
+        logger.debug(
+            f"{file_info.path}: {'text' if file_info.is_text else 'binary'} "
+            f"(decided by {file_info.text_tier})"
+        )
+        if tier_counts is not None and file_info.text_tier:
+            tier_counts[file_info.text_tier] = tier_counts.get(file_info.text_tier, 0) + 1
+        if file_info.is_text:
+            text_files.append(file_info)
+    return text_files
 
 
 def walk_repository(
-    root: PathLike, ignore_patterns: Optional[Set[str]] = None, max_size_mb: Optional[float] = None
+    root: PathLike,
+    ignore_patterns: Union[IgnoreStack, GitignoreMatcher, Iterable[str], None] = None,
+    max_size_mb: Optional[float] = None,
+    tier_counts: Optional[Dict[str, int]] = None,
 ) -> Iterator[Path]:
     """Walk through repository yielding relevant files.
 
     Args:
     ----
         root: Repository root path
-        ignore_patterns: Set of patterns to ignore
+        ignore_patterns: Ignore stack, compiled matcher or flat patterns to ignore
         max_size_mb: Maximum file size in MB
+        tier_counts: Optional mapping updated with how many files each
+            classifier tier decided
 
     Yields:
     ------
@@ -236,23 +747,17 @@ def walk_repository(
 
     """
     root = Path(str(root))
-    ignore_patterns = ignore_patterns or set()
-
-    for path in root.rglob("*"):
-        # Skip ignored paths
-        if should_ignore_path(path, root, ignore_patterns):
-            continue
-
-        # Skip directories
-        if path.is_dir():
-            continue
-
-        # Skip files exceeding size limit
-        if max_size_mb and get_file_size_mb(path) > max_size_mb:
-            continue
 
+    for entry, _ in _iter_candidates(root, ignore_patterns, max_size_mb):
         # Skip non-text files
-        if not is_text_file(path):
+        classification = classify_file(entry.path)
+        logger.debug(
+            f"{entry.path}: {'text' if classification.is_text else 'binary'} "
+            f"(decided by {classification.tier})"
+        )
+        if tier_counts is not None:
+            tier_counts[classification.tier] = tier_counts.get(classification.tier, 0) + 1
+        if not classification.is_text:
             continue
 
-        yield path
+        yield Path(entry.path)
@@ -0,0 +1,160 @@
+"""Files changed in a work tree since a git revision."""
+
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+from .file_utils import find_git_dir, git_common_dir
+from .git_index import IndexEntry, read_index
+from .git_objects import GitObjectError, ObjectDatabase, resolve_revision
+from .logger import logger
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Sizes in the index are truncated to 32 bits
+_SIZE_MASK = 0xFFFFFFFF
+
+
+def _hash_blob(path: str, stat_result: os.stat_result, id_length: int) -> Optional[str]:
+    """Return the id a file in the work tree would have as a git blob."""
+    try:
+        if stat.S_ISLNK(stat_result.st_mode):
+            data = os.fsencode(os.readlink(path))
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+    except OSError:
+        return None
+    digest = hashlib.sha256() if id_length == 32 else hashlib.sha1()  # noqa: S324
+    digest.update(b"blob %d\0" % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def _worktree_differs(work_tree: str, entry: IndexEntry, id_length: int) -> bool:
+    """Whether the work tree copy of an index entry has changed since it was staged.
+
+    Files whose size and modification time match the index are taken as
+    unchanged without reading them, as git does.
+    """
+    path = os.path.join(work_tree, *entry.path.split("/"))
+    try:
+        stat_result = os.lstat(path)
+    except OSError:
+        return True
+    if stat_result.st_mtime_ns == entry.mtime_ns and stat_result.st_size & _SIZE_MASK == entry.size:
+        return False
+    return _hash_blob(path, stat_result, id_length) != entry.sha.hex()
+
+
+def changed_files_from_objects(git_root: PathLike, revision: str) -> List[str]:
+    """List the files that differ between a revision and the work tree without git.
+
+    Compares the revision's tree with the index, and the index with the work
+    tree, like ``git diff --name-only REVISION``. Untracked files are not
+    listed.
+
+    Args:
+    ----
+        git_root: Root of the work tree
+        revision: Revision to compare against
+
+    Returns:
+    -------
+        Sorted slash-separated paths relative to git_root, including deleted files
+
+    Raises:
+    ------
+        GitObjectError: If the repository or revision cannot be read
+
+    """
+    git_dir = find_git_dir(git_root)
+    if git_dir is None:
+        raise GitObjectError(f"{git_root} is not a git work tree")
+
+    with ObjectDatabase(git_common_dir(git_dir)) as db:
+        commit_id = resolve_revision(git_dir, db, revision)
+        committed = db.read_tree_files(db.read_commit(commit_id).tree)
+
+        index: Dict[str, IndexEntry] = {}
+        changed: Set[str] = set()
+        for entry in read_index(git_dir):
+            if entry.stage:
+                # Unmerged paths always count as changed
+                changed.add(entry.path)
+            elif entry.is_file:
+                index[entry.path] = entry
+
+        changed.update(path for path in committed if path not in index)
+        work_tree = str(git_root)
+        for path, entry in index.items():
+            if committed.get(path) != (entry.mode, entry.sha.hex()) or _worktree_differs(
+                work_tree, entry, db.id_length
+            ):
+                changed.add(path)
+    return sorted(changed)
+
+
+def _changed_files_from_binary(git: str, root: PathLike, revision: str) -> List[str]:
+    """List changed files below root with the git binary."""
+    result = subprocess.run(  # noqa: S603
+        [
+            git,
+            "-C",
+            str(root),
+            "diff",
+            "--name-only",
+            "--no-renames",
+            "--relative",
+            "-z",
+            revision,
+            "--",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return sorted(os.fsdecode(path) for path in result.stdout.split(b"\0") if path)
+
+
+def changed_files(git_root: PathLike, root: PathLike, revision: str) -> List[str]:
+    """List the files below a directory that changed since a revision.
+
+    Uses the git binary if there is one and falls back to reading the object
+    database, refs and index directly, which covers branch, tag and commit
+    names with ``~N``/``^N`` suffixes.
+
+    Args:
+    ----
+        git_root: Root of the work tree
+        root: Directory within the work tree to list files of
+        revision: Revision to compare against
+
+    Returns:
+    -------
+        Sorted slash-separated paths relative to root, including deleted files
+
+    Raises:
+    ------
+        GitObjectError: If the changed files cannot be determined
+
+    """
+    git = shutil.which("git")
+    if git is not None:
+        try:
+            return _changed_files_from_binary(git, root, revision)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", b"") or b""
+            logger.debug(f"git diff failed: {stderr.decode(errors='replace').strip() or e}")
+
+    prefix = os.path.relpath(Path(str(root)).resolve(), Path(str(git_root)).resolve())
+    prefix = "" if prefix == os.curdir else prefix.replace(os.sep, "/") + "/"
+    return [
+        path[len(prefix) :]
+        for path in changed_files_from_objects(git_root, revision)
+        if path.startswith(prefix)
+    ]
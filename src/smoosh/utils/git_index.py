@@ -0,0 +1,222 @@
+"""Pure-Python reader for the git index (``.git/index``)."""
+
+import os
+import struct
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from .. import AnalysisError
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+INDEX_SIGNATURE = b"DIRC"
+SUPPORTED_VERSIONS = (2, 3, 4)
+
+# Object type bits of an entry's mode
+MODE_TYPE_MASK = 0o170000
+MODE_REGULAR = 0o100000
+MODE_SYMLINK = 0o120000
+MODE_DIRECTORY = 0o040000
+MODE_GITLINK = 0o160000
+
+# Entry flag bits
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_SHIFT = 12
+FLAG_NAME_MASK = 0x0FFF
+EXTENDED_SKIP_WORKTREE = 0x4000
+EXTENDED_INTENT_TO_ADD = 0x2000
+
+# ctime, mtime (seconds and nanoseconds each), dev, ino, mode, uid, gid, size
+_STAT_FIELDS = struct.Struct(">10I")
+
+
+class GitIndexError(AnalysisError):
+    """Raised when the git index cannot be read."""
+
+    pass
+
+
+class IndexEntry(NamedTuple):
+    """A single entry of the git index."""
+
+    path: str
+    mode: int
+    size: int
+    mtime_ns: int
+    sha: bytes
+    stage: int
+    skip_worktree: bool
+
+    @property
+    def is_file(self) -> bool:
+        """Whether the entry is a regular file or symlink checked out in the work tree."""
+        return (self.mode & MODE_TYPE_MASK) in (MODE_REGULAR, MODE_SYMLINK)
+
+
+def object_id_length(git_dir: Path) -> int:
+    """Return the object id length in bytes: 32 for SHA-256 repositories, else 20."""
+    try:
+        config = (git_dir / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return 20
+    for line in config.splitlines():
+        name, sep, value = line.strip().partition("=")
+        if sep and name.strip().lower() == "objectformat" and value.strip() == "sha256":
+            return 32
+    return 20
+
+
+def _read_offset(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode git's variable-length offset encoding used by index version 4."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def parse_index(data: bytes, id_length: int = 20) -> List[IndexEntry]:
+    """Parse the entries of a git index file.
+
+    Args:
+    ----
+        data: Complete content of the index file
+        id_length: Length of object ids in bytes
+
+    Returns:
+    -------
+        Index entries in index order (sorted by path, then stage)
+
+    Raises:
+    ------
+        GitIndexError: If the data is not a supported git index
+
+    """
+    if len(data) < 12 or data[:4] != INDEX_SIGNATURE:
+        raise GitIndexError("Not a git index file")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in SUPPORTED_VERSIONS:
+        raise GitIndexError(f"Unsupported git index version {version}")
+
+    entries: List[IndexEntry] = []
+    pos = 12
+    previous_path = b""
+    try:
+        for _ in range(count):
+            start = pos
+            fields = _STAT_FIELDS.unpack_from(data, pos)
+            pos += _STAT_FIELDS.size
+            sha = data[pos : pos + id_length]
+            pos += id_length
+            (flags,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+
+            extended = 0
+            if flags & FLAG_EXTENDED and version >= 3:
+                (extended,) = struct.unpack_from(">H", data, pos)
+                pos += 2
+
+            if version == 4:
+                # Path is stored as "strip N bytes of the previous path" + suffix
+                strip, pos = _read_offset(data, pos)
+                end = data.index(b"\0", pos)
+                path = previous_path[: len(previous_path) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                name_length = flags & FLAG_NAME_MASK
+                if name_length < FLAG_NAME_MASK:
+                    end = pos + name_length
+                else:
+                    end = data.index(b"\0", pos)
+                path = data[pos:end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                pos = start + ((end - start) // 8 + 1) * 8
+
+            previous_path = path
+            entries.append(
+                IndexEntry(
+                    path=path.decode("utf-8", errors="surrogateescape"),
+                    mode=fields[6],
+                    size=fields[9],
+                    mtime_ns=fields[2] * 1_000_000_000 + fields[3],
+                    sha=sha,
+                    stage=(flags >> FLAG_STAGE_SHIFT) & 3,
+                    skip_worktree=bool(extended & EXTENDED_SKIP_WORKTREE),
+                )
+            )
+    except (struct.error, ValueError, IndexError) as e:
+        raise GitIndexError(f"Truncated or corrupt git index: {e}") from e
+
+    return entries
+
+
+def read_index(git_dir: PathLike) -> List[IndexEntry]:
+    """Read the index of a git repository with a single sequential read.
+
+    Args:
+    ----
+        git_dir: Path to the git directory
+
+    Returns:
+    -------
+        Index entries
+
+    Raises:
+    ------
+        GitIndexError: If the index is missing or cannot be parsed
+
+    """
+    git_dir = Path(str(git_dir))
+    try:
+        with open(git_dir / "index", "rb") as f:
+            data = f.read()
+    except OSError as e:
+        raise GitIndexError(f"Cannot read git index: {e}") from e
+    return parse_index(data, object_id_length(git_dir))
+
+
+def list_tracked_files(
+    git_dir: PathLike, prefix: str = "", entries: Optional[List[IndexEntry]] = None
+) -> List[str]:
+    """List the tracked files checked out in the work tree.
+
+    Submodules, sparse directory entries and skip-worktree files are left out,
+    and files with merge conflicts are listed once.
+
+    Args:
+    ----
+        git_dir: Path to the git directory
+        prefix: Only list files below this slash-separated directory, with
+            paths made relative to it
+        entries: Already parsed index entries, read from git_dir if None
+
+    Returns:
+    -------
+        Slash-separated paths in index order
+
+    Raises:
+    ------
+        GitIndexError: If the index is missing or cannot be parsed
+
+    """
+    if entries is None:
+        entries = read_index(git_dir)
+    prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+
+    files: List[str] = []
+    previous = None
+    for entry in entries:
+        if not entry.is_file or entry.skip_worktree or entry.path == previous:
+            continue
+        previous = entry.path
+        if prefix:
+            if not entry.path.startswith(prefix):
+                continue
+            files.append(entry.path[len(prefix) :])
+        else:
+            files.append(entry.path)
+    return files
@@ -0,0 +1,552 @@
+"""Pure-Python reader for git objects and refs (``.git/objects``, ``.git/refs``)."""
+
+import mmap
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .git_index import GitIndexError, object_id_length
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Object types of pack entries
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NAMES = {OBJ_COMMIT: "commit", OBJ_TREE: "tree", OBJ_BLOB: "blob", OBJ_TAG: "tag"}
+
+PACK_INDEX_SIGNATURE = b"\xfftOc"
+
+# Mode of submodule entries in trees, which have no blob in this repository
+MODE_GITLINK = 0o160000
+MODE_DIRECTORY = 0o040000
+
+# Resolved delta bases kept in memory; trees share long delta chains
+MAX_BASE_CACHE = 256
+
+# Bytes fed to the decompressor at a time when inflating pack entries
+INFLATE_CHUNK = 64 * 1024
+
+# Places a short ref name is looked up, in git's order of precedence
+REF_PATTERNS = ("{}", "refs/{}", "refs/tags/{}", "refs/heads/{}", "refs/remotes/{}")
+
+# A revision is a name followed by any number of ~N and ^N parent steps
+_REVISION = re.compile(r"(.*?)((?:[~^]\d*)*)")
+_REVISION_SUFFIX = re.compile(r"([~^])(\d*)")
+
+
+class GitObjectError(GitIndexError):
+    """Raised when git objects or refs cannot be read."""
+
+    pass
+
+
+class Commit(NamedTuple):
+    """The parts of a commit object smoosh needs."""
+
+    tree: str
+    parents: List[str]
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode the little-endian base-128 sizes at the start of a delta."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and a git delta.
+
+    Args:
+    ----
+        base: Content of the base object
+        delta: Delta instructions
+
+    Returns:
+    -------
+        Content of the object
+
+    Raises:
+    ------
+        GitObjectError: If the delta does not fit the base
+
+    """
+    source_size, pos = _read_varint(delta, 0)
+    target_size, pos = _read_varint(delta, pos)
+    if source_size != len(base):
+        raise GitObjectError("Delta base has the wrong size")
+
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            # Copy a range of the base; the low bits say which offset and size bytes follow
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset : offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos : pos + op]
+            pos += op
+        else:
+            raise GitObjectError("Invalid delta instruction")
+    if len(out) != target_size:
+        raise GitObjectError("Delta produced an object of the wrong size")
+    return bytes(out)
+
+
+class _Pack:
+    """A packfile and its version 2 index, mapped into memory on first use."""
+
+    def __init__(self, index_path: Path, id_length: int) -> None:
+        """Read the index of a pack.
+
+        Args:
+        ----
+            index_path: Path of the ``.idx`` file
+            id_length: Length of object ids in bytes
+
+        """
+        with open(index_path, "rb") as f:
+            data = f.read()
+        if data[:4] != PACK_INDEX_SIGNATURE or struct.unpack_from(">I", data, 4)[0] != 2:
+            raise GitObjectError(f"Unsupported pack index {index_path.name}")
+
+        self.id_length = id_length
+        self.fanout = struct.unpack_from(">256I", data, 8)
+        self.count = self.fanout[255]
+        ids_start = 8 + 256 * 4
+        self.ids = data[ids_start : ids_start + self.count * id_length]
+        offsets_start = ids_start + self.count * (id_length + 4)
+        self.offsets = data[offsets_start : offsets_start + self.count * 4]
+        self.large_offsets = data[offsets_start + self.count * 4 :]
+        self.pack_path = index_path.with_suffix(".pack")
+        self._data: Optional[mmap.mmap] = None
+
+    def _id(self, i: int) -> bytes:
+        """Return the i-th object id of the index."""
+        return self.ids[i * self.id_length : (i + 1) * self.id_length]
+
+    def find(self, object_id: bytes) -> Optional[int]:
+        """Return the pack offset of an object, or None if it is not in this pack."""
+        lo = self.fanout[object_id[0] - 1] if object_id[0] else 0
+        hi = self.fanout[object_id[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._id(mid)
+            if current < object_id:
+                lo = mid + 1
+            elif current > object_id:
+                hi = mid
+            else:
+                (offset,) = struct.unpack_from(">I", self.offsets, mid * 4)
+                if offset & 0x80000000:
+                    index = offset & 0x7FFFFFFF
+                    (offset,) = struct.unpack_from(">Q", self.large_offsets, index * 8)
+                return int(offset)
+        return None
+
+    def ids_with_prefix(self, prefix: str) -> List[str]:
+        """Return the hex ids in this pack that start with a hex prefix."""
+        first = int(prefix[:2], 16)
+        lo = self.fanout[first - 1] if first else 0
+        hi = self.fanout[first]
+        matches = []
+        for i in range(lo, hi):
+            hex_id = self._id(i).hex()
+            if hex_id.startswith(prefix):
+                matches.append(hex_id)
+        return matches
+
+    @property
+    def data(self) -> mmap.mmap:
+        """The pack file mapped read-only."""
+        if self._data is None:
+            with open(self.pack_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def inflate(self, pos: int) -> bytes:
+        """Decompress the zlib stream starting at a pack position."""
+        decompressor = zlib.decompressobj()
+        chunks = []
+        data = self.data
+        while not decompressor.eof and pos < len(data):
+            chunks.append(decompressor.decompress(data[pos : pos + INFLATE_CHUNK]))
+            pos += INFLATE_CHUNK
+        if not decompressor.eof:
+            raise GitObjectError(f"Truncated object in {self.pack_path.name}")
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        """Unmap the pack file."""
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+class ObjectDatabase:
+    """Reads objects from the loose object directories and packfiles of a repository.
+
+    Alternates are not followed; repositories that borrow objects through
+    ``objects/info/alternates`` need the git binary.
+    """
+
+    def __init__(self, common_dir: PathLike) -> None:
+        """Open the object database of a git directory.
+
+        Args:
+        ----
+            common_dir: Git directory shared by all worktrees
+
+        """
+        self.common_dir = Path(str(common_dir))
+        self.objects_dir = self.common_dir / "objects"
+        self.id_length = object_id_length(self.common_dir)
+        self._packs: Optional[List[_Pack]] = None
+        self._bases: Dict[Tuple[str, int], Tuple[int, bytes]] = {}
+
+    @property
+    def packs(self) -> List[_Pack]:
+        """Packs of the repository, with their indexes loaded on first use."""
+        if self._packs is None:
+            pack_dir = self.objects_dir / "pack"
+            try:
+                names = sorted(os.listdir(pack_dir))
+            except OSError:
+                names = []
+            self._packs = [
+                _Pack(pack_dir / name, self.id_length)
+                for name in names
+                if name.endswith(".idx") and (pack_dir / name).with_suffix(".pack").exists()
+            ]
+        return self._packs
+
+    def close(self) -> None:
+        """Release the mapped packfiles."""
+        for pack in self._packs or []:
+            pack.close()
+        self._bases.clear()
+
+    def __enter__(self) -> "ObjectDatabase":
+        """Return the database itself."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Release the mapped packfiles."""
+        self.close()
+
+    def _read_loose(self, hex_id: str) -> Optional[Tuple[str, bytes]]:
+        """Read a loose object, or return None if there is none."""
+        path = self.objects_dir / hex_id[:2] / hex_id[2:]
+        try:
+            with open(path, "rb") as f:
+                raw = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error) as e:
+            raise GitObjectError(f"Cannot read object {hex_id}: {e}") from e
+        header, _, body = raw.partition(b"\0")
+        kind, _, _ = header.partition(b" ")
+        return kind.decode("ascii"), body
+
+    def _read_packed(self, pack: _Pack, offset: int) -> Tuple[int, bytes]:
+        """Read the object at a pack offset, resolving deltas."""
+        key = (str(pack.pack_path), offset)
+        cached = self._bases.get(key)
+        if cached is not None:
+            return cached
+
+        data = pack.data
+        byte = data[offset]
+        pos = offset + 1
+        kind = (byte >> 4) & 7
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+
+        if kind == OBJ_OFS_DELTA:
+            byte = data[pos]
+            pos += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            kind, base = self._read_packed(pack, offset - distance)
+            result = (kind, apply_delta(base, pack.inflate(pos)))
+        elif kind == OBJ_REF_DELTA:
+            base_id = bytes(data[pos : pos + self.id_length]).hex()
+            base_kind, base = self.read(base_id)
+            kind = next(k for k, name in TYPE_NAMES.items() if name == base_kind)
+            result = (kind, apply_delta(base, pack.inflate(pos + self.id_length)))
+        elif kind in TYPE_NAMES:
+            result = (kind, pack.inflate(pos))
+        else:
+            raise GitObjectError(f"Unknown object type {kind} in {pack.pack_path.name}")
+
+        if kind != OBJ_BLOB:
+            if len(self._bases) >= MAX_BASE_CACHE:
+                self._bases.clear()
+            self._bases[key] = result
+        return result
+
+    def read(self, hex_id: str) -> Tuple[str, bytes]:
+        """Read an object.
+
+        Args:
+        ----
+            hex_id: Full object id in hex
+
+        Returns:
+        -------
+            (type, content) with type one of commit, tree, blob and tag
+
+        Raises:
+        ------
+            GitObjectError: If the object is missing or cannot be read
+
+        """
+        loose = self._read_loose(hex_id)
+        if loose is not None:
+            return loose
+        object_id = bytes.fromhex(hex_id)
+        for pack in self.packs:
+            offset = pack.find(object_id)
+            if offset is not None:
+                kind, content = self._read_packed(pack, offset)
+                return TYPE_NAMES[kind], content
+        raise GitObjectError(f"Object {hex_id} not found")
+
+    def expand(self, prefix: str) -> Optional[str]:
+        """Return the full id of the object an abbreviated hex id names.
+
+        Args:
+        ----
+            prefix: At least four hex digits
+
+        Returns:
+        -------
+            Full hex id, or None if no object matches
+
+        Raises:
+        ------
+            GitObjectError: If the prefix is ambiguous
+
+        """
+        prefix = prefix.lower()
+        matches: Set[str] = set()
+        try:
+            names = os.listdir(self.objects_dir / prefix[:2])
+        except OSError:
+            names = []
+        matches.update(prefix[:2] + name for name in names if name.startswith(prefix[2:]))
+        for pack in self.packs:
+            matches.update(pack.ids_with_prefix(prefix))
+        if len(matches) > 1:
+            raise GitObjectError(f"Short object id {prefix} is ambiguous")
+        return matches.pop() if matches else None
+
+    def _peel(self, hex_id: str) -> Tuple[str, bytes]:
+        """Follow annotated tags to a commit and return its id and content."""
+        kind, content = self.read(hex_id)
+        while kind == "tag":
+            target = content.split(b"\n", 1)[0]
+            if not target.startswith(b"object "):
+                raise GitObjectError(f"Malformed tag {hex_id}")
+            hex_id = target[len(b"object ") :].decode("ascii")
+            kind, content = self.read(hex_id)
+        if kind != "commit":
+            raise GitObjectError(f"{hex_id} is a {kind}, not a commit")
+        return hex_id, content
+
+    def peel(self, hex_id: str) -> str:
+        """Return the id of the commit an object id names, following annotated tags.
+
+        Raises:
+        ------
+            GitObjectError: If the object is not a commit or a tag of one
+
+        """
+        return self._peel(hex_id)[0]
+
+    def read_commit(self, hex_id: str) -> Commit:
+        """Read a commit, peeling annotated tags that point at one.
+
+        Args:
+        ----
+            hex_id: Id of a commit or tag
+
+        Returns:
+        -------
+            Tree and parents of the commit
+
+        Raises:
+        ------
+            GitObjectError: If the object is not a commit
+
+        """
+        _, content = self._peel(hex_id)
+
+        tree = ""
+        parents: List[str] = []
+        for line in content.split(b"\n"):
+            if not line:
+                break
+            if line.startswith(b"tree "):
+                tree = line[5:].decode("ascii")
+            elif line.startswith(b"parent "):
+                parents.append(line[7:].decode("ascii"))
+        return Commit(tree, parents)
+
+    def read_tree_files(self, hex_id: str, prefix: str = "") -> Dict[str, Tuple[int, str]]:
+        """List the files of a tree recursively.
+
+        Args:
+        ----
+            hex_id: Id of the tree
+            prefix: Slash-separated directory prepended to the listed paths
+
+        Returns:
+        -------
+            (mode, blob id) of every file, keyed by slash-separated path;
+            submodules are left out
+
+        """
+        files: Dict[str, Tuple[int, str]] = {}
+        pending = [(hex_id, prefix)]
+        while pending:
+            tree_id, directory = pending.pop()
+            kind, content = self.read(tree_id)
+            if kind != "tree":
+                raise GitObjectError(f"{tree_id} is a {kind}, not a tree")
+            pos = 0
+            while pos < len(content):
+                space = content.index(b" ", pos)
+                nul = content.index(b"\0", space)
+                mode = int(content[pos:space], 8)
+                name = content[space + 1 : nul].decode("utf-8", errors="surrogateescape")
+                pos = nul + 1 + self.id_length
+                object_id = content[nul + 1 : pos].hex()
+                path = f"{directory}{name}"
+                if mode == MODE_DIRECTORY:
+                    pending.append((object_id, f"{path}/"))
+                elif mode != MODE_GITLINK:
+                    files[path] = (mode, object_id)
+        return files
+
+
+def _read_ref_file(git_dir: Path, common_dir: Path, name: str) -> Optional[str]:
+    """Return the content of a loose ref, looking in the worktree's directory first."""
+    for directory in (git_dir, common_dir):
+        try:
+            return (directory / name).read_text(encoding="utf-8").strip()
+        except OSError:
+            continue
+    return None
+
+
+def _read_packed_refs(common_dir: Path) -> Dict[str, str]:
+    """Parse ``packed-refs`` into a mapping of ref name to object id."""
+    refs: Dict[str, str] = {}
+    try:
+        lines = (common_dir / "packed-refs").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return refs
+    for line in lines:
+        if not line or line[0] in "#^":
+            continue
+        object_id, _, name = line.partition(" ")
+        refs[name.strip()] = object_id
+    return refs
+
+
+def _lookup_ref(git_dir: Path, common_dir: Path, name: str, depth: int = 0) -> Optional[str]:
+    """Resolve a full ref name to an object id, following symbolic refs."""
+    if depth > 5:
+        raise GitObjectError(f"Too many levels of symbolic refs at {name}")
+    value = _read_ref_file(git_dir, common_dir, name)
+    if value is None:
+        return _read_packed_refs(common_dir).get(name)
+    if value.startswith("ref:"):
+        return _lookup_ref(git_dir, common_dir, value[4:].strip(), depth + 1)
+    return value
+
+
+def resolve_revision(git_dir: PathLike, db: ObjectDatabase, revision: str) -> str:
+    """Resolve a revision to the id of a commit.
+
+    Supports full and abbreviated object ids, ``HEAD``, branch, tag and remote
+    names, and any number of ``~N`` and ``^N`` suffixes. Other revision syntax
+    needs the git binary.
+
+    Args:
+    ----
+        git_dir: Git directory of the worktree
+        db: Object database of the repository
+        revision: Revision, e.g. ``main``, ``v1.2`` or ``HEAD~3``
+
+    Returns:
+    -------
+        Hex id of the commit
+
+    Raises:
+    ------
+        GitObjectError: If the revision cannot be resolved
+
+    """
+    git_dir = Path(str(git_dir))
+    match = _REVISION.fullmatch(revision)
+    name, suffix = (match.group(1), match.group(2)) if match else (revision, "")
+
+    object_id: Optional[str] = None
+    for pattern in REF_PATTERNS:
+        object_id = _lookup_ref(git_dir, db.common_dir, pattern.format(name))
+        if object_id is not None:
+            break
+    if object_id is None and re.fullmatch(r"[0-9a-fA-F]{4,64}", name):
+        if len(name) == 2 * db.id_length:
+            object_id = name.lower()
+        else:
+            object_id = db.expand(name)
+    if object_id is None:
+        raise GitObjectError(f"Unknown revision {revision!r}")
+
+    commit_id = db.peel(object_id)
+    for operator, count_text in _REVISION_SUFFIX.findall(suffix):
+        count = int(count_text) if count_text else 1
+        if operator == "~":
+            for _ in range(count):
+                commit_id = _parent(db, commit_id, 0, revision)
+        elif count:
+            commit_id = _parent(db, commit_id, count - 1, revision)
+    return commit_id
+
+
+def _parent(db: ObjectDatabase, commit_id: str, index: int, revision: str) -> str:
+    """Return a parent of a commit."""
+    parents = db.read_commit(commit_id).parents
+    if index >= len(parents):
+        raise GitObjectError(f"Revision {revision!r} goes past the first commit")
+    return parents[index]
@@ -0,0 +1,495 @@
+"""Compiled gitignore pattern matching for smoosh."""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from .logger import logger
+
+# Name of the per-directory ignore file
+GITIGNORE_NAME = ".gitignore"
+
+# Characters that make a pattern a glob rather than a literal
+_GLOB_CHARS = frozenset("*?[\\")
+
+
+def _strip_trailing_spaces(pattern: str) -> str:
+    """Remove trailing spaces unless they are escaped with a backslash."""
+    end = len(pattern)
+    while end > 0 and pattern[end - 1] == " ":
+        if end > 1 and pattern[end - 2] == "\\":
+            break
+        end -= 1
+    return pattern[:end]
+
+
+def normalize_pattern(line: str) -> str:
+    """Normalize a raw gitignore line.
+
+    Args:
+    ----
+        line: Raw line from an ignore file
+
+    Returns:
+    -------
+        Pattern with negation and anchoring preserved, or empty string for blank
+        lines and comments
+
+    """
+    # Leading whitespace is part of the pattern, as in git
+    pattern = _strip_trailing_spaces(line.rstrip("\r\n"))
+    if not pattern or pattern.startswith("#"):
+        return ""
+    return pattern
+
+
+def _translate_class(pattern: str, start: int) -> Tuple[Optional[str], int]:
+    """Translate a bracket expression starting at ``pattern[start] == "["``.
+
+    Returns:
+    -------
+        Tuple of (regex fragment or None if the bracket is unterminated, next index)
+
+    """
+    i = start + 1
+    negate = i < len(pattern) and pattern[i] in "!^"
+    if negate:
+        i += 1
+    chars = []
+    # A closing bracket directly after the opening one is a literal member
+    if i < len(pattern) and pattern[i] == "]":
+        chars.append("\\]")
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            i += 1
+            chars.append(re.escape(pattern[i]))
+        elif char == "-":
+            chars.append("-")
+        else:
+            chars.append(re.escape(char))
+        i += 1
+    if i >= len(pattern):
+        return None, start + 1
+    body = "".join(chars)
+    # Slashes are never matched by a bracket expression
+    fragment = f"(?!/)[^{body}]" if negate else f"(?!/)[{body}]"
+    return fragment, i + 1
+
+
+def translate_pattern(pattern: str) -> str:
+    """Translate a gitignore glob (without anchoring or flags) into a regex.
+
+    Args:
+    ----
+        pattern: Glob pattern using gitignore wildcard semantics
+
+    Returns:
+    -------
+        Regular expression source matching the whole relative path
+
+    """
+    result: List[str] = []
+    i = 0
+    length = len(pattern)
+    while i < length:
+        char = pattern[i]
+        if char == "*":
+            star_end = i
+            while star_end < length and pattern[star_end] == "*":
+                star_end += 1
+            at_segment_start = i == 0 or pattern[i - 1] == "/"
+            at_segment_end = star_end == length or pattern[star_end] == "/"
+            if star_end - i >= 2 and at_segment_start and at_segment_end:
+                if star_end == length:
+                    # Trailing "**" matches everything inside
+                    result.append(".*")
+                    i = star_end
+                else:
+                    # "**/" matches zero or more directories
+                    result.append("(?:.*/)?")
+                    i = star_end + 1
+            else:
+                result.append("[^/]*")
+                i = star_end
+        elif char == "?":
+            result.append("[^/]")
+            i += 1
+        elif char == "[":
+            fragment, i = _translate_class(pattern, i)
+            result.append(fragment if fragment is not None else "\\[")
+        elif char == "\\" and i + 1 < length:
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            result.append(re.escape(char))
+            i += 1
+    return "".join(result)
+
+
+class GitignoreRule:
+    """A single parsed gitignore rule."""
+
+    __slots__ = ("anchored", "body", "dir_only", "index", "negated", "pattern")
+
+    def __init__(self, pattern: str, index: int) -> None:
+        """Parse a normalized gitignore pattern.
+
+        Args:
+        ----
+            pattern: Pattern line without comments or surrounding whitespace
+            index: Position of the rule, later rules take precedence
+
+        """
+        self.pattern = pattern
+        self.index = index
+        self.negated = pattern.startswith("!")
+        body = pattern[1:] if self.negated else pattern
+        if body.startswith("\\!") or body.startswith("\\#"):
+            body = body[1:]
+
+        self.dir_only = body.endswith("/")
+        body = body.rstrip("/")
+
+        # A leading "**/" is equivalent to an unanchored pattern
+        while body.startswith("**/") and "/" not in body[3:]:
+            body = body[3:]
+
+        # A slash at the beginning or in the middle anchors the pattern
+        self.anchored = "/" in body
+        self.body = body.lstrip("/")
+
+    @property
+    def literal(self) -> Optional[str]:
+        """Return the basename this rule matches literally, if it is that simple."""
+        if self.anchored or _GLOB_CHARS.intersection(self.body):
+            return None
+        return self.body
+
+    @property
+    def suffix(self) -> Optional[str]:
+        """Return the literal basename suffix for ``*suffix`` rules."""
+        if self.anchored or not self.body.startswith("*"):
+            return None
+        rest = self.body[1:]
+        if not rest or _GLOB_CHARS.intersection(rest):
+            return None
+        return rest
+
+    def to_regex(self) -> str:
+        """Return the regex source matching paths relative to the rule's base."""
+        translated = translate_pattern(self.body)
+        return translated if self.anchored else f"(?:.*/)?{translated}"
+
+
+class _RuleIndex:
+    """Lookup structure answering "which is the last rule matching this path"."""
+
+    def __init__(self, rules: List[GitignoreRule]) -> None:
+        self.literals: Dict[str, int] = {}
+        self.suffixes: Dict[str, int] = {}
+        regex_rules: List[GitignoreRule] = []
+
+        for rule in rules:
+            literal = rule.literal
+            suffix = rule.suffix
+            if literal is not None:
+                self.literals[literal] = rule.index
+            elif suffix is not None:
+                self.suffixes[suffix] = rule.index
+            else:
+                regex_rules.append(rule)
+
+        self.suffix_lengths = sorted({len(suffix) for suffix in self.suffixes})
+
+        # Alternatives are tried in order, so listing later rules first makes the
+        # winning alternative the last matching rule.
+        self.regex: Optional[Pattern[str]] = None
+        if regex_rules:
+            alternatives = "|".join(
+                f"(?P<r{rule.index}>{rule.to_regex()})" for rule in reversed(regex_rules)
+            )
+            self.regex = re.compile(alternatives, re.DOTALL)
+
+    def last_match(self, rel_path: str) -> int:
+        """Return the index of the last rule matching rel_path, or -1."""
+        name = rel_path.rpartition("/")[2]
+        best = self.literals.get(name, -1)
+
+        for length in self.suffix_lengths:
+            if length > len(name):
+                break
+            index = self.suffixes.get(name[-length:], -1)
+            if index > best:
+                best = index
+
+        if self.regex is not None:
+            match = self.regex.fullmatch(rel_path)
+            if match is not None and match.lastgroup is not None:
+                index = int(match.lastgroup[1:])
+                if index > best:
+                    best = index
+
+        return best
+
+
+class GitignoreMatcher:
+    """Gitignore rules compiled once for fast repeated matching.
+
+    Simple rules (plain basenames and ``*.ext`` style suffixes) are answered from
+    hash lookups; all remaining rules are combined into a single regex. Matching
+    follows gitignore semantics: the last matching rule wins, ``!`` negates,
+    a leading or inner ``/`` anchors a rule to its base directory, ``**`` spans
+    directories and a trailing ``/`` restricts a rule to directories.
+    """
+
+    def __init__(self, patterns: Iterable[str] = (), prefix: str = "") -> None:
+        """Compile gitignore patterns.
+
+        Args:
+        ----
+            patterns: Normalized patterns in file order
+            prefix: Location of the matched paths relative to the directory the
+                patterns belong to, prepended to every path before matching
+
+        """
+        self.rules: List[GitignoreRule] = []
+        for pattern in patterns:
+            if pattern and pattern not in ("!", "/", "!/"):
+                self.rules.append(GitignoreRule(pattern, len(self.rules)))
+
+        self.prefix = prefix.strip("/")
+        self._negated = [rule.negated for rule in self.rules]
+        self._file_index = _RuleIndex([rule for rule in self.rules if not rule.dir_only])
+        self._dir_index = _RuleIndex(self.rules)
+
+    @property
+    def patterns(self) -> List[str]:
+        """Return the compiled patterns in rule order."""
+        return [rule.pattern for rule in self.rules]
+
+    def match(self, rel_path: str, is_dir: bool = False) -> Optional[bool]:
+        """Match a single path without looking at its parent directories.
+
+        Args:
+        ----
+            rel_path: Slash-separated path relative to the walked root
+            is_dir: Whether the path is a directory
+
+        Returns:
+        -------
+            True if ignored, False if explicitly re-included by a negated rule,
+            None if no rule matches
+
+        """
+        if not self.rules:
+            return None
+        if self.prefix:
+            rel_path = f"{self.prefix}/{rel_path}"
+        index = (self._dir_index if is_dir else self._file_index).last_match(rel_path)
+        if index < 0:
+            return None
+        return not self._negated[index]
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """Check whether a path is ignored, including via an ignored parent directory.
+
+        Args:
+        ----
+            rel_path: Slash-separated path relative to the walked root
+            is_dir: Whether the path is a directory
+
+        Returns:
+        -------
+            True if the path should be ignored
+
+        """
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if self.match("/".join(parts[:depth]), is_dir=True):
+                return True
+        return bool(self.match(rel_path, is_dir))
+
+
+def read_ignore_file(path: str) -> List[str]:
+    """Read the normalized patterns of an ignore file.
+
+    Args:
+    ----
+        path: Path to a .gitignore style file
+
+    Returns:
+    -------
+        Patterns in file order, empty if the file is missing or unreadable
+
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return [pattern for pattern in map(normalize_pattern, f) if pattern]
+    except OSError:
+        return []
+
+
+class IgnoreLevel:
+    """The ignore rules in effect inside one directory.
+
+    Levels form a chain from the innermost directory with its own ignore file
+    up to the base rules; deeper levels take precedence over their parents.
+    """
+
+    __slots__ = ("base", "matcher", "parent")
+
+    def __init__(
+        self, matcher: GitignoreMatcher, base: str = "", parent: Optional["IgnoreLevel"] = None
+    ) -> None:
+        """Create a level.
+
+        Args:
+        ----
+            matcher: Compiled rules of this level
+            base: Directory of the rules relative to the walked root ("" for the root)
+            parent: Enclosing level, consulted when this one has no opinion
+
+        """
+        self.matcher = matcher
+        self.base = base
+        self.parent = parent
+
+    def match(self, rel_path: str, is_dir: bool = False) -> Optional[bool]:
+        """Match a path below this level's directory against the whole chain.
+
+        Args:
+        ----
+            rel_path: Slash-separated path relative to the walked root
+            is_dir: Whether the path is a directory
+
+        Returns:
+        -------
+            True if ignored, False if re-included, None if no rule matches
+
+        """
+        level: Optional[IgnoreLevel] = self
+        while level is not None:
+            sub_path = rel_path[len(level.base) + 1 :] if level.base else rel_path
+            result = level.matcher.match(sub_path, is_dir)
+            if result is not None:
+                return result
+            level = level.parent
+        return None
+
+
+class IgnoreStack:
+    """Hierarchical gitignore rules loaded lazily while walking a tree.
+
+    Each ``.gitignore`` is parsed once per stack, when the walker first enters its
+    directory, and the resulting level is cached and stacked on its parent's.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        base: GitignoreMatcher,
+        ignore_root: Optional[str] = None,
+        nested: bool = True,
+    ) -> None:
+        """Create the stack for a walk.
+
+        Args:
+        ----
+            root: Directory being walked
+            base: Rules below every ignore file (defaults, excludes files)
+            ignore_root: Directory where ignore files start to apply (usually the
+                git root); ignore files between it and root are loaded up front
+            nested: Whether to load ignore files at all
+
+        """
+        self.root = root
+        self.nested = nested
+        self._base = base
+        self._files: Dict[str, GitignoreMatcher] = {}
+        self._levels: Dict[str, IgnoreLevel] = {}
+
+        level = IgnoreLevel(base)
+        if nested:
+            for directory, prefix in _ancestor_dirs(root, ignore_root or root):
+                matcher = self._load(os.path.join(directory, GITIGNORE_NAME), prefix)
+                if matcher is not None:
+                    level = IgnoreLevel(matcher, parent=level)
+        self._levels[""] = level
+
+    @property
+    def root_level(self) -> IgnoreLevel:
+        """Return the level in effect for the walked root."""
+        return self._levels[""]
+
+    @property
+    def patterns(self) -> List[str]:
+        """Return all patterns loaded so far, base rules first."""
+        patterns = list(self._base.patterns)
+        for matcher in self._files.values():
+            patterns.extend(matcher.patterns)
+        return patterns
+
+    def enter(self, parent: IgnoreLevel, dir_path: str, rel_dir: str) -> IgnoreLevel:
+        """Return the level for a directory, loading its ignore file on first entry.
+
+        Args:
+        ----
+            parent: Level of the enclosing directory
+            dir_path: Filesystem path of the directory
+            rel_dir: Slash-separated path of the directory relative to the root
+
+        Returns:
+        -------
+            The directory's own level, or parent if it has no ignore file
+
+        """
+        cached = self._levels.get(rel_dir)
+        if cached is not None:
+            return cached
+
+        level = parent
+        if self.nested:
+            matcher = self._load(os.path.join(dir_path, GITIGNORE_NAME))
+            if matcher is not None:
+                level = IgnoreLevel(matcher, base=rel_dir, parent=parent)
+        self._levels[rel_dir] = level
+        return level
+
+    def _load(self, path: str, prefix: str = "") -> Optional[GitignoreMatcher]:
+        """Parse and compile an ignore file once, returning None if it has no rules."""
+        if path in self._files:
+            return self._files[path]
+        patterns = read_ignore_file(path)
+        if not patterns:
+            return None
+        logger.debug(f"Loaded {len(patterns)} ignore rules from {path}")
+        matcher = GitignoreMatcher(patterns, prefix=prefix)
+        self._files[path] = matcher
+        return matcher
+
+
+def _ancestor_dirs(root: str, ignore_root: str) -> Sequence[Tuple[str, str]]:
+    """List directories from ignore_root down to root with root's prefix below each.
+
+    Returns:
+    -------
+        (directory, prefix) pairs ordered outermost first; empty if root is not
+        inside ignore_root
+
+    """
+    root = os.path.abspath(root)
+    ignore_root = os.path.abspath(ignore_root)
+    rel = os.path.relpath(root, ignore_root)
+    if rel == os.curdir:
+        return [(root, "")]
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        return [(root, "")]
+
+    parts = rel.split(os.sep)
+    result = []
+    for depth in range(len(parts) + 1):
+        directory = os.path.join(ignore_root, *parts[:depth])
+        result.append((directory, "/".join(parts[depth:])))
+    return result
@@ -0,0 +1,229 @@
+"""Token counting for smoosh output budgets."""
+
+import base64
+import mmap
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+from .. import ConfigurationError
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Byte buffers token counters accept, including memory-mapped files
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# One match per estimated token: ASCII words are cut into pieces of up to six
+# letters, numbers into groups of up to three digits and punctuation into pairs,
+# roughly as common BPE vocabularies split source code; every non-ASCII
+# character and every whitespace run counts as one token
+_ESTIMATE_PATTERN = re.compile(
+    r" ?[A-Za-z]{1,6}"
+    r"|[^\x00-\x7f]"
+    r"| ?[0-9]{1,3}"
+    r"| ?[!-/:-@\[-`{-~]{1,2}"
+    r"|\s+"
+)
+
+# The estimate over the bytes of ASCII text, where \s spells out the ASCII
+# characters str patterns treat as whitespace
+_ESTIMATE_ASCII_PATTERN = re.compile(
+    rb" ?[A-Za-z]{1,6}"
+    rb"| ?[0-9]{1,3}"
+    rb"| ?[!-/:-@\[-`{-~]{1,2}"
+    rb"|[\t-\r\x1c-\x20]+"
+)
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+# Pre-tokenization of cl100k-style vocabularies, with \p{L} and \p{N} spelled
+# in terms of the classes the re module supports
+_BPE_PATTERN = re.compile(
+    r"'(?i:[sdmt]|ll|ve|re)"
+    r"|(?:[^\r\n\w]|_)?[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+
+# Upper bound on memoized piece encodings before the memo is reset
+MAX_MEMO_SIZE = 200_000
+
+
+class TokenCounter(ABC):
+    """Counts the tokens of text; subclasses implement count()."""
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Return the number of tokens in text.
+
+        Args:
+        ----
+            text: Text to count
+
+        Returns:
+        -------
+            Number of tokens
+
+        """
+
+    def count_bytes(self, data: BytesLike) -> int:
+        """Return the number of tokens in UTF-8 encoded text.
+
+        Args:
+        ----
+            data: UTF-8 bytes, e.g. a memory-mapped file
+
+        Returns:
+        -------
+            Number of tokens, the same as count() of the decoded text
+
+        """
+        with memoryview(data) as view:
+            return self.count(str(view, "utf-8"))
+
+
+class EstimatingTokenCounter(TokenCounter):
+    """Fast token estimate from character classes, without a vocabulary.
+
+    Much closer to real tokenizer counts than whitespace-separated words, which
+    ignore punctuation, indentation and long identifiers.
+    """
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        """Return the estimated number of tokens in text."""
+        return len(_ESTIMATE_PATTERN.findall(text))
+
+    def count_bytes(self, data: BytesLike) -> int:
+        """Return the estimated number of tokens in UTF-8 text, without decoding ASCII."""
+        if _NON_ASCII.search(data):
+            return super().count_bytes(data)
+        return len(_ESTIMATE_ASCII_PATTERN.findall(data))
+
+
+class BPETokenCounter(TokenCounter):
+    """Exact byte-level BPE token counts from a local vocabulary file.
+
+    The vocabulary uses the ``.tiktoken`` format: one base64-encoded token and
+    its merge rank per line. Encodings of repeated pieces are memoized.
+    """
+
+    name = "bpe"
+
+    def __init__(self, ranks: Dict[bytes, int]) -> None:
+        """Create a counter from token merge ranks.
+
+        Args:
+        ----
+            ranks: Merge rank of every token in the vocabulary
+
+        """
+        self.ranks = ranks
+        self._memo: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: PathLike) -> "BPETokenCounter":
+        """Load a vocabulary in ``.tiktoken`` format.
+
+        Args:
+        ----
+            path: Path to the vocabulary file
+
+        Returns:
+        -------
+            Counter using the vocabulary
+
+        Raises:
+        ------
+            ConfigurationError: If the file cannot be read or parsed
+
+        """
+        ranks: Dict[bytes, int] = {}
+        try:
+            with open(str(path), "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token)] = int(rank)
+        except (OSError, ValueError) as e:
+            raise ConfigurationError(f"Failed to load token vocabulary {path}: {e}") from e
+        if not ranks:
+            raise ConfigurationError(f"Token vocabulary {path} is empty")
+        return cls(ranks)
+
+    def _count_piece(self, piece: bytes) -> int:
+        """Return the number of tokens a pre-tokenized piece encodes to."""
+        if piece in self.ranks:
+            return 1
+        count = self._memo.get(piece)
+        if count is not None:
+            return count
+
+        # Repeatedly merge the adjacent pair with the lowest rank
+        parts: List[bytes] = [piece[i : i + 1] for i in range(len(piece))]
+        ranks = self.ranks
+        while len(parts) > 1:
+            best_rank: Optional[int] = None
+            best_index = 0
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+                    best_index = i
+            if best_rank is None:
+                break
+            parts[best_index : best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+
+        count = len(parts)
+        with self._lock:
+            if len(self._memo) >= MAX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[piece] = count
+        return count
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens text encodes to."""
+        return sum(
+            self._count_piece(piece.encode("utf-8", errors="surrogatepass"))
+            for piece in _BPE_PATTERN.findall(text)
+        )
+
+
+@lru_cache(maxsize=None)
+def _load_bpe_counter(path: str) -> BPETokenCounter:
+    """Load a BPE vocabulary once per process."""
+    return BPETokenCounter.from_file(path)
+
+
+def get_token_counter(vocabulary: Optional[PathLike] = None) -> TokenCounter:
+    """Return the token counter for a configuration.
+
+    Args:
+    ----
+        vocabulary: Path to a ``.tiktoken`` vocabulary file; the fast estimator
+            is used if empty or None
+
+    Returns:
+    -------
+        Token counter
+
+    Raises:
+    ------
+        ConfigurationError: If the vocabulary cannot be loaded
+
+    """
+    if not vocabulary:
+        return EstimatingTokenCounter()
+    return _load_bpe_counter(os.path.abspath(os.path.expanduser(str(vocabulary))))
@@ -0,0 +1,196 @@
+"""Zero-copy output of text files that are written out unchanged."""
+
+import codecs
+import errno
+import mmap
+import os
+import re
+from typing import BinaryIO, Optional, TextIO, Union
+
+# Define a more specific PathLike type that only includes str paths
+PathLike = Union[str, "os.PathLike[str]"]
+
+# Smaller files are cheaper to decode than to map
+ZERO_COPY_MIN_BYTES = 64 * 1024
+
+# Bytes examined at a time when counting lines and characters
+SCAN_CHUNK = 1024 * 1024
+
+# Encodings whose bytes can be copied into UTF-8 output as they are
+_UTF8_ENCODINGS = frozenset({"ascii", "utf-8"})
+
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+# UTF-8 continuation bytes, which do not start a character
+_CONTINUATION = bytes(range(0x80, 0xC0))
+
+# Errors of sendfile() that mean the output does not support it
+_SENDFILE_UNSUPPORTED = frozenset(
+    {errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP, errno.EBADF}
+)
+
+
+def _is_utf8(encoding: Optional[str]) -> bool:
+    """Whether an encoding name is UTF-8 or ASCII."""
+    try:
+        return codecs.lookup(encoding or "utf-8").name in _UTF8_ENCODINGS
+    except LookupError:
+        return False
+
+
+def binary_output(stream: TextIO) -> Optional[BinaryIO]:
+    """Return the byte stream under a UTF-8 text stream, if bytes can bypass it.
+
+    Args:
+    ----
+        stream: Text stream the composition is written to
+
+    Returns:
+    -------
+        Underlying binary stream, or None if the text stream encodes to
+        something other than UTF-8 or translates newlines
+
+    """
+    buffer = getattr(stream, "buffer", None)
+    if buffer is None or os.linesep != "\n" or not _is_utf8(getattr(stream, "encoding", None)):
+        return None
+    return buffer  # type: ignore[no-any-return]
+
+
+class MappedFile:
+    """A memory-mapped UTF-8 text file whose bytes can be written out unchanged.
+
+    Files are only mapped if reading them in text mode would give back exactly
+    their bytes: valid UTF-8 without carriage returns, which text mode would
+    translate.
+    """
+
+    def __init__(self, file: BinaryIO, mapping: mmap.mmap, is_ascii: bool) -> None:
+        """Wrap an open file and its mapping.
+
+        Args:
+        ----
+            file: File opened in binary mode
+            mapping: Read-only mapping of the whole file
+            is_ascii: Whether the file is pure ASCII
+
+        """
+        self.file = file
+        self.mapping = mapping
+        self.is_ascii = is_ascii
+
+    @classmethod
+    def open(
+        cls, path: PathLike, encoding: Optional[str], min_bytes: int = ZERO_COPY_MIN_BYTES
+    ) -> Optional["MappedFile"]:
+        """Map a file if its bytes can be copied to the output.
+
+        Args:
+        ----
+            path: Path of the file
+            encoding: Encoding the file was classified as
+            min_bytes: Smallest file worth mapping
+
+        Returns:
+        -------
+            Mapped file, or None if the file is too small, not UTF-8, contains
+            carriage returns or cannot be read
+
+        """
+        if not _is_utf8(encoding):
+            return None
+        try:
+            file = open(str(path), "rb")
+        except OSError:
+            return None
+        try:
+            if os.fstat(file.fileno()).st_size < min_bytes:
+                file.close()
+                return None
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            file.close()
+            return None
+
+        mapped = cls(file, mapping, is_ascii=_NON_ASCII.search(mapping) is None)
+        if mapping.find(b"\r") != -1 or not (mapped.is_ascii or mapped._valid_utf8()):
+            mapped.close()
+            return None
+        return mapped
+
+    def _valid_utf8(self) -> bool:
+        """Check the whole file decodes as UTF-8, a chunk at a time."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            for start in range(0, len(self.mapping), SCAN_CHUNK):
+                decoder.decode(self.mapping[start : start + SCAN_CHUNK])
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return False
+        return True
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes."""
+        return len(self.mapping)
+
+    @property
+    def ends_with_newline(self) -> bool:
+        """Whether the last byte of the file is a newline."""
+        return self.mapping[-1:] == b"\n"
+
+    def count_newlines(self) -> int:
+        """Count the newline characters of the file."""
+        return sum(
+            self.mapping[start : start + SCAN_CHUNK].count(b"\n")
+            for start in range(0, self.size, SCAN_CHUNK)
+        )
+
+    def count_chars(self) -> int:
+        """Count the characters the file decodes to."""
+        if self.is_ascii:
+            return self.size
+        continuation = 0
+        for start in range(0, self.size, SCAN_CHUNK):
+            chunk = self.mapping[start : start + SCAN_CHUNK]
+            continuation += len(chunk) - len(chunk.translate(None, _CONTINUATION))
+        return self.size - continuation
+
+    def text(self) -> str:
+        """Decode the whole file."""
+        with memoryview(self.mapping) as view:
+            return str(view, "utf-8")
+
+    def write_to(self, out: BinaryIO) -> None:
+        """Copy the file to a binary stream, in the kernel where possible.
+
+        Args:
+        ----
+            out: Binary output stream, flushed before the copy
+
+        """
+        out.flush()
+        try:
+            out_fd: Optional[int] = out.fileno()
+        except (AttributeError, OSError, ValueError):
+            out_fd = None
+
+        offset = 0
+        if out_fd is not None and hasattr(os, "sendfile"):
+            try:
+                while offset < self.size:
+                    sent = os.sendfile(out_fd, self.file.fileno(), offset, self.size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+            except OSError as e:
+                if offset or e.errno not in _SENDFILE_UNSUPPORTED:
+                    raise
+        if offset < self.size:
+            with memoryview(self.mapping) as view:
+                out.write(view[offset:])
+
+    def close(self) -> None:
+        """Unmap and close the file."""
+        self.mapping.close()
+        self.file.close()
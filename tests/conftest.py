@@ -0,0 +1,25 @@
+"""Shared fixtures for the smoosh test suite."""
+
+from pathlib import Path
+
+import pytest
+
+from smoosh.utils.config import ConfigDict, load_config
+
+
+@pytest.fixture
+def config(tmp_path: Path) -> ConfigDict:
+    """Provide a configuration with the analysis cache disabled.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        ConfigDict: Default configuration
+
+    """
+    config = load_config(tmp_path)
+    config["cache"]["enabled"] = False
+    return config
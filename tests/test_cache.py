@@ -0,0 +1,71 @@
+"""Tests for the persistent analysis cache."""
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from smoosh.utils.cache import AnalysisCache, ContentStore, evict_stores
+
+
+def test_cache_round_trip_and_invalidation(tmp_path: Path) -> None:
+    """Test that entries persist and are invalidated when a file changes.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    tracked = tmp_path / "module.py"
+    tracked.write_text("x = 1\n")
+
+    cache = AnalysisCache(tmp_path, cache_dir=tmp_path / "cache")
+    cache.store("module.py", os.stat(tracked), is_text=True, lines=1)
+    cache.save()
+
+    reopened = AnalysisCache(tmp_path, cache_dir=tmp_path / "cache")
+    entry = reopened.lookup("module.py", os.stat(tracked))
+    if entry is None or entry["lines"] != 1:
+        pytest.fail(f"Cached entry should survive a reload, got {entry}")
+
+    tracked.write_text("x = 1\ny = 2\n")
+    if reopened.lookup("module.py", os.stat(tracked)) is not None:
+        pytest.fail("Changed files should not be served from the cache")
+
+
+def test_store_entries_are_evicted_by_age(tmp_path: Path) -> None:
+    """Test that store entries unused for max_age_days are deleted.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    cache_dir = tmp_path / "cache"
+    store = ContentStore("fold", cache_dir)
+    store.put("aa11", "used")
+    store.put("bb22", "unused")
+    old = time.time() - 40 * 24 * 60 * 60
+    for key in ("aa11", "bb22"):
+        os.utime(store.directory / key[:2] / key[2:], (old, old))
+
+    # Reading an entry counts as using it
+    if store.get("aa11") != "used":
+        pytest.fail("The entry should be readable")
+    if evict_stores(cache_dir, max_age_days=30) != 1:
+        pytest.fail("Only the unused entry should be evicted")
+    if store.get("aa11") != "used" or store.get("bb22") is not None:
+        pytest.fail("The used entry should be kept and the unused one removed")
+
+    # Saving the analysis cache evicts the stores, at most once a day
+    store.put("cc33", "stale")
+    os.utime(store.directory / "cc" / "33", (old, old))
+    AnalysisCache(tmp_path, cache_dir=cache_dir).save()
+    if store.get("cc33") is not None:
+        pytest.fail("Saving the analysis cache should evict stale store entries")
+    store.put("dd44", "stale")
+    os.utime(store.directory / "dd" / "44", (old, old))
+    AnalysisCache(tmp_path, cache_dir=cache_dir).save()
+    if store.get("dd44") is None:
+        pytest.fail("Stores should be walked at most once a day")
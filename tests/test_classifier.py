@@ -0,0 +1,45 @@
+"""Tests for text/binary classification."""
+
+from pathlib import Path
+
+import pytest
+
+from smoosh.utils.classifier import (
+    TIER_CHARDET,
+    TIER_CONTROL_BYTES,
+    TIER_EXTENSION,
+    TIER_UTF8,
+    classify_file,
+)
+
+
+@pytest.mark.parametrize(
+    ("name", "content", "is_text", "tier"),
+    [
+        ("module.py", b"\x00\x01", True, TIER_EXTENSION),
+        ("image.png", b"plain", False, TIER_EXTENSION),
+        ("data.dat", b"\x00\x01\x02binary", False, TIER_CONTROL_BYTES),
+        ("notes", "café ✓\n".encode(), True, TIER_UTF8),
+        ("legacy", "café crème brûlée\n".encode("latin-1") * 20, True, TIER_CHARDET),
+    ],
+)
+def test_classify_file_reports_deciding_tier(
+    tmp_path: Path, name: str, content: bytes, is_text: bool, tier: str
+) -> None:
+    """Test that each tier decides the files it is responsible for.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        name: File name
+        content: File content
+        is_text: Expected verdict
+        tier: Expected deciding tier
+
+    """
+    path = tmp_path / name
+    path.write_bytes(content)
+
+    result = classify_file(path)
+    if (result.is_text, result.tier) != (is_text, tier):
+        pytest.fail(f"{name}: got {result}, expected ({is_text}, {tier})")
@@ -1,13 +1,37 @@
 """Test suite for the smoosh CLI."""
 
+import json
+import os
+import subprocess
+import sys
 from pathlib import Path
 
 import pytest
 from click.testing import CliRunner
 
+import smoosh
 from smoosh.cli import main
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Point the analysis cache at a temporary directory.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        monkeypatch: Pytest fixture for patching the environment
+
+    Returns:
+    -------
+        Path: Cache home used by the tests
+
+    """
+    cache_home = tmp_path / "cache-home"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home
+
+
 @pytest.fixture
 def runner() -> CliRunner:
     """Provide a Click CLI test runner.
@@ -55,3 +79,232 @@ def test_main_shows_help(runner: CliRunner) -> None:
         pytest.fail("CLI should exit successfully")
     if expected_text not in result.output:
         pytest.fail("Help text should contain package description")
+    if "--mode" not in result.output or "Manage the persistent analysis cache" not in result.output:
+        pytest.fail("Help should list the snapshot options and the subcommands")
+
+
+def test_main_writes_output_with_jobs(runner: CliRunner, temp_package: Path) -> None:
+    """Test that a snapshot is written when reading files concurrently.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+
+    """
+    (temp_package / "core.py").write_text("def answer() -> int:\n    return 42\n")
+    output_file = temp_package.parent / "snapshot.txt"
+
+    result = runner.invoke(main, [str(temp_package), "--jobs", "2", "--output", str(output_file)])
+
+    if result.exit_code != 0:
+        pytest.fail(f"CLI should exit successfully, got: {result.output}")
+    if "### File: core.py ###" not in output_file.read_text():
+        pytest.fail("Output should contain the package files")
+
+
+def test_cache_clear_removes_cache_files(
+    runner: CliRunner, temp_package: Path, isolated_cache: Path
+) -> None:
+    """Test that a snapshot populates the cache and 'cache clear' empties it.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+        isolated_cache: Temporary cache home
+
+    """
+    output_file = temp_package.parent / "snapshot.txt"
+    runner.invoke(main, [str(temp_package), "--output", str(output_file)])
+    if not list((isolated_cache / "smoosh").glob("*.json")):
+        pytest.fail("A snapshot should write the analysis cache")
+
+    result = runner.invoke(main, ["cache", "clear"])
+
+    if result.exit_code != 0:
+        pytest.fail(f"cache clear should exit successfully, got: {result.output}")
+    if list((isolated_cache / "smoosh").glob("*.json")):
+        pytest.fail("cache clear should remove the cache files")
+
+
+def test_main_streams_to_stdout(runner: CliRunner, temp_package: Path) -> None:
+    """Test that --output - writes only the composition to standard output.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+
+    """
+    (temp_package / "core.py").write_text("def answer() -> int:\n    return 42\n")
+
+    result = runner.invoke(main, [str(temp_package), "--output", "-"])
+
+    if result.exit_code != 0:
+        pytest.fail(f"CLI should exit successfully, got: {result.output}")
+    if not result.stdout.startswith(f"Repository: {temp_package.name}\n"):
+        pytest.fail(f"Standard output should start with the composition, got: {result.stdout}")
+    if "### File: core.py ###" not in result.stdout:
+        pytest.fail("Standard output should contain the package files")
+    if "Analysis Results" in result.stdout:
+        pytest.fail("Statistics should not be mixed into standard output")
+
+
+def test_watch_rejects_stdout(runner: CliRunner, temp_package: Path) -> None:
+    """Test that --watch cannot stream to standard output.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+
+    """
+    result = runner.invoke(main, [str(temp_package), "--watch", "--stdout"])
+
+    if result.exit_code != 2:
+        pytest.fail(f"--watch --stdout should be a usage error, got: {result.output}")
+
+
+def test_report_json_breaks_down_tokens(runner: CliRunner, temp_package: Path) -> None:
+    """Test that --report json writes only the breakdown to standard output.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+
+    """
+    (temp_package / "core.py").write_text("def answer() -> int:\n    return 42\n")
+    (temp_package / "docs").mkdir()
+    (temp_package / "docs" / "guide.md").write_text("# Guide\n\nUse answer().\n")
+    output_file = temp_package.parent / "snapshot.txt"
+
+    args = [str(temp_package), "-o", str(output_file), "--report", "json", "--top", "1"]
+    result = runner.invoke(main, args)
+
+    if result.exit_code != 0:
+        pytest.fail(f"CLI should exit successfully, got: {result.output}")
+    report = json.loads(result.stdout)
+    if report["totals"]["files"] != 3 or len(report["files"]["tokens"]) != 1:
+        pytest.fail(f"The report should rank the top file of three, got: {report}")
+    if report["directories"]["bytes"][0]["path"] != "docs":
+        pytest.fail("Directories should be ranked, leaving out the root")
+    if report["extensions"]["tokens"][0]["path"] != ".py":
+        pytest.fail("Extensions should be ranked by tokens")
+    if "Analysis Results" not in result.stderr:
+        pytest.fail("Statistics should move to standard error")
+
+    result = runner.invoke(main, [str(temp_package), "--stdout", "--report", "json"])
+    if result.exit_code != 2:
+        pytest.fail("--report json should not share standard output with the composition")
+
+
+def test_format_jsonl_streams_records(runner: CliRunner, temp_package: Path) -> None:
+    """Test that --format jsonl writes one record per line to standard output.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+
+    """
+    (temp_package / "core.py").write_text("VALUE = 1\n")
+
+    result = runner.invoke(main, [str(temp_package), "--stdout", "--format", "jsonl"])
+
+    if result.exit_code != 0:
+        pytest.fail(f"CLI should exit successfully, got: {result.output}")
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    paths = [record["path"] for record in records if record["type"] == "file"]
+    if paths != ["__init__.py", "core.py"] or records[-1]["type"] != "statistics":
+        pytest.fail(f"Every file should have its own record, got {records}")
+
+    result = runner.invoke(
+        main, [str(temp_package), "-o", "out.json", "--format", "json", "--watch"]
+    )
+    if result.exit_code != 2:
+        pytest.fail("--format json should not be combined with --watch")
+
+
+def test_stdout_is_written_as_utf8(tmp_path: Path, temp_package: Path) -> None:
+    """Test that standard output gets the same bytes as an output file on any locale.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        temp_package: Path to temporary test package
+
+    """
+    (temp_package / "notes.txt").write_text("caf\u00e9 \u2713\n", encoding="utf-8")
+    output_file = tmp_path / "snapshot.txt"
+    # A locale whose encoding cannot represent the content
+    env = {
+        **os.environ,
+        "PYTHONIOENCODING": "latin-1:backslashreplace",
+        "PYTHONPATH": str(Path(smoosh.__file__).parents[1]),
+        "XDG_CACHE_HOME": str(tmp_path / "cache"),
+    }
+
+    def run(*args: str) -> bytes:
+        command = [sys.executable, "-m", "smoosh.cli", str(temp_package), *args]
+        return subprocess.run(command, env=env, check=True, capture_output=True).stdout  # noqa: S603
+
+    streamed = run("--stdout")
+    run("--output", str(output_file))
+    if streamed != output_file.read_bytes():
+        pytest.fail("Standard output should hold the bytes of the output file")
+
+
+def test_cache_clear_uses_configured_directory(
+    runner: CliRunner, temp_package: Path, tmp_path: Path
+) -> None:
+    """Test that 'cache clear TARGET' clears smoosh's files from TARGET's cache.directory.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        temp_package: Path to temporary test package
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    cache_dir = tmp_path / "configured-cache"
+    cache_dir.mkdir()
+    (cache_dir / "package.json").write_text("{}")
+    (cache_dir / "store").mkdir()
+    (temp_package / "smoosh.yaml").write_text(f"cache:\n  directory: {cache_dir}\n")
+    output_file = tmp_path / "snapshot.txt"
+    runner.invoke(main, [str(temp_package), "--output", str(output_file)])
+    if not list(cache_dir.glob("smoosh-*.json")):
+        pytest.fail("A snapshot should write the configured cache")
+
+    result = runner.invoke(main, ["cache", "clear", str(temp_package)])
+
+    if result.exit_code != 0:
+        pytest.fail(f"cache clear should exit successfully, got: {result.output}")
+    if sorted(path.name for path in cache_dir.iterdir()) != ["package.json", "store"]:
+        pytest.fail("cache clear should only remove smoosh's own files")
+
+
+def test_target_named_like_a_subcommand(
+    runner: CliRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a directory named cache can be snapshotted explicitly.
+
+    Args:
+    ----
+        runner: Click CLI test runner
+        tmp_path: Pytest fixture providing temporary directory path
+        monkeypatch: Pytest fixture for patching attributes
+
+    """
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "module.py").write_text("VALUE = 1\n")
+    monkeypatch.chdir(tmp_path)
+
+    for args in (["snapshot", "cache", "--stdout"], ["./cache", "--stdout"]):
+        result = runner.invoke(main, args)
+        if result.exit_code != 0 or "### File: module.py ###" not in result.stdout:
+            pytest.fail(f"{args} should snapshot the directory, got: {result.output}")
+    if "smoosh snapshot cache" not in runner.invoke(main, ["--help"]).output:
+        pytest.fail("The help should explain how to snapshot a target named cache")
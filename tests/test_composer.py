@@ -0,0 +1,218 @@
+"""Test suite for repository content composition."""
+
+import io
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.composer.concatenator import concatenate_files, write_composition
+from smoosh.composer.formatter import write_structured
+from smoosh.composer.stats import CompositionStats
+from smoosh.utils.config import ConfigDict
+from smoosh.utils.tokens import EstimatingTokenCounter
+from smoosh.utils.zerocopy import ZERO_COPY_MIN_BYTES
+
+
+def test_write_composition_matches_concatenation(tmp_path: Path, config: ConfigDict) -> None:
+    """Test that streaming produces the same text and statistics as concatenation.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    pkg_dir.mkdir()
+    (pkg_dir / "a.py").write_text("import os\n\nprint(os.sep)\n")
+    (pkg_dir / "b.txt").write_text("no trailing newline")
+    (pkg_dir / "empty.py").write_text("")
+
+    loaded = analyze_repository(pkg_dir, config, load_content=True)
+    expected, expected_stats = concatenate_files(loaded, "cat", config)
+
+    streamed = analyze_repository(pkg_dir, config)
+    stream = io.StringIO()
+    stats = write_composition(streamed, "cat", config, stream)
+
+    if stream.getvalue() != expected:
+        pytest.fail("Streamed composition should match the concatenated one")
+    if stats != expected_stats:
+        pytest.fail(f"Statistics should match, got {stats} and {expected_stats}")
+    if any(file_info.content is not None for file_info in streamed.files):
+        pytest.fail("Streaming should not keep file contents in memory")
+
+    file_tokens = {str(f.relative_path): f.tokens for f in streamed.files}
+    if file_tokens != {"a.py": 10, "b.txt": 5, "empty.py": 0}:
+        pytest.fail(f"Token counts should be recorded per file, got {file_tokens}")
+    if not isinstance(stats["Composed Tokens"], int) or stats["Composed Tokens"] <= 14:
+        pytest.fail("Composed tokens should include the header and every file")
+
+
+def test_write_composition_copies_large_files(tmp_path: Path, config: ConfigDict) -> None:
+    """Test that memory-mapped files give the same text and statistics as decoded ones.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    pkg_dir.mkdir()
+    line = "value = compute(alpha, beta)  # keep\n"
+    (pkg_dir / "ascii.py").write_text(line * (2 * ZERO_COPY_MIN_BYTES // len(line)))
+    (pkg_dir / "unicode.md").write_text("Grüße, 世界 — ok\n" * 8000 + "end", encoding="utf-8")
+    (pkg_dir / "crlf.txt").write_bytes(b"windows line\r\n" * 8000)
+    (pkg_dir / "small.py").write_text("print('hi')\n")
+
+    loaded = analyze_repository(pkg_dir, config, load_content=True)
+    decoded = CompositionStats.for_config(config)
+    expected, expected_stats = concatenate_files(loaded, "cat", config, decoded)
+
+    output = tmp_path / "out.txt"
+    copied = CompositionStats.for_config(config)
+    with open(output, "w", encoding="utf-8") as stream:
+        repo_info = analyze_repository(pkg_dir, config)
+        stats = write_composition(repo_info, "cat", config, stream, copied)
+
+    if output.read_text(encoding="utf-8") != expected:
+        pytest.fail("Copied files should give the same composition as decoded ones")
+    if stats != expected_stats:
+        pytest.fail(f"Statistics should match, got {stats} and {expected_stats}")
+    if [f.as_dict() for f in copied.files] != [f.as_dict() for f in decoded.files]:
+        pytest.fail("Per-file statistics should match")
+    body = expected[expected.index("\n### File") :]
+    if stats["Composed Bytes"] != len(body.encode("utf-8")):
+        pytest.fail("Composed bytes should count the UTF-8 size of the file sections")
+
+
+def test_composition_stats_break_down_tokens(tmp_path: Path, config: ConfigDict) -> None:
+    """Test that file and directory statistics add up to the totals.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    (pkg_dir / "sub").mkdir(parents=True)
+    (pkg_dir / "a.py").write_text("def a():\n    return 1\n")
+    (pkg_dir / "sub" / "b.py").write_text("import os\n\n\ndef b():\n    return os.sep\n")
+    (pkg_dir / "sub" / "c.md").write_text("# Überblick\nText")
+
+    stats = CompositionStats.for_config(config)
+    repo_info = analyze_repository(pkg_dir, config)
+    write_composition(repo_info, "smoosh", config, io.StringIO(), stats)
+
+    files = {f.path: f for f in stats.files}
+    if sorted(files) != ["a.py", "sub/b.py", "sub/c.md"]:
+        pytest.fail(f"Every composed file should be recorded, got {sorted(files)}")
+    if (files["sub/b.py"].lines, files["sub/c.md"].lines) != (5, 2):
+        pytest.fail("Lines should be counted from the original content")
+    if (files["sub/c.md"].chars, files["sub/c.md"].bytes) != (16, 17):
+        pytest.fail("Characters and UTF-8 bytes should be counted separately")
+    if any(f.tokens <= 0 for f in stats.files) or stats.overhead_tokens <= 0:
+        pytest.fail("Tokens should be attributed to the file sections and the header")
+    marker = stats.counter.count("\n\n### File: sub/c.md ###\n")
+    if files["sub/c.md"].tokens != marker + stats.counter.count("# Überblick\nText"):
+        pytest.fail("A file's tokens should cover its marker and its content")
+
+    directories = stats.directories()
+    if directories["sub"].tokens != files["sub/b.py"].tokens + files["sub/c.md"].tokens:
+        pytest.fail("Directory totals should sum their files")
+    if (
+        directories["."].bytes != stats.original_bytes
+        or directories["."].lines != stats.original_lines
+    ):
+        pytest.fail("The root should include every file")
+
+
+class RecordingTokenCounter(EstimatingTokenCounter):
+    """Estimating counter that remembers every text it counted."""
+
+    def __init__(self) -> None:
+        """Start with no counted texts."""
+        self.texts: List[str] = []
+
+    def count(self, text: str) -> int:
+        """Record and count a text."""
+        self.texts.append(text)
+        return super().count(text)
+
+
+def test_folded_files_are_counted_as_emitted(tmp_path: Path, config: ConfigDict) -> None:
+    """Test that fold mode counts the folded sections, never the original sources.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    source = 'def a():\n    """Return one."""\n    x = 1\n    return x\n'
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text(source)
+
+    counter = RecordingTokenCounter()
+    stats = CompositionStats(counter)
+    stream = io.StringIO()
+    write_composition(analyze_repository(tmp_path / "pkg", config), "fold", config, stream, stats)
+
+    if source in counter.texts:
+        pytest.fail("The original source of a folded file should not be tokenized")
+    section = stream.getvalue().partition("\n\n\n")[2]
+    if stats.files[0].tokens != counter.count(section):
+        pytest.fail("A folded file's tokens should match its emitted section")
+
+
+def test_write_structured_writes_one_object_per_file(tmp_path: Path, config: ConfigDict) -> None:
+    """Test the JSON and JSON Lines formats in smoosh mode.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    pkg_dir.mkdir()
+    (pkg_dir / "a.py").write_text('def f():\n    """Say hi."""\n    return "hi"\n')
+    (pkg_dir / "copy.py").write_text('def f():\n    """Say hi."""\n    return "hi"\n')
+    (pkg_dir / "notes.txt").write_text("caf\u00e9\n")
+    repo_info = analyze_repository(pkg_dir, config)
+
+    stream = io.StringIO()
+    stats = CompositionStats()
+    result = write_structured(repo_info, "smoosh", config, stream, "json", stats)
+    document = json.loads(stream.getvalue())
+    files = {record["path"]: record for record in document["files"]}
+
+    if document["repository"]["mode"] != "smoosh" or "pkg/" not in document["repository"]["tree"]:
+        pytest.fail(f"The repository should be described, got {document['repository']}")
+    if not files["a.py"]["folded"] or "return" in files["a.py"]["content"]:
+        pytest.fail(f"Python files should be folded, got {files['a.py']}")
+    if files["copy.py"]["same_as"] != "a.py" or files["copy.py"]["content"] is not None:
+        pytest.fail(f"Duplicates should reference the original, got {files['copy.py']}")
+    notes = files["notes.txt"]
+    if notes["content"] != "caf\u00e9\n" or notes["size"] != 6 or notes["tokens"] < 1:
+        pytest.fail(f"Files should carry their content, size and tokens, got {notes}")
+    if result["Composed Bytes"] != len(stream.getvalue().encode()):
+        pytest.fail("Statistics should account for everything written")
+    if stats.tokens != stats.overhead_tokens + sum(f["tokens"] for f in files.values()):
+        pytest.fail("File tokens should add up to the total")
+
+    stream = io.StringIO()
+    write_structured(repo_info, "smoosh", config, stream, "jsonl")
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    types = [record["type"] for record in records]
+    if types != ["repository", "file", "file", "file", "statistics"]:
+        pytest.fail(f"JSON Lines should hold one record per line, got {types}")
+    if [{**record, "type": None} for record in records[1:4]] != [
+        {**record, "type": None} for record in document["files"]
+    ]:
+        pytest.fail("Both formats should describe the files the same way")
@@ -0,0 +1,55 @@
+"""Test suite for the concurrency helpers."""
+
+from typing import List
+
+import pytest
+
+from smoosh.utils.concurrency import BatchedProcessPool, thread_imap
+
+
+def square_batch(values: List[int]) -> List[int]:
+    """Square a batch of values.
+
+    Args:
+    ----
+        values: Values to square
+
+    Returns:
+    -------
+        List[int]: Squared values
+
+    """
+    return [value * value for value in values]
+
+
+def test_thread_imap_preserves_order() -> None:
+    """Test that streamed results keep the input order."""
+    results = list(thread_imap(lambda value: value * 2, range(50), jobs=4, window=3))
+    if results != [value * 2 for value in range(50)]:
+        pytest.fail("thread_imap should yield results in input order")
+
+
+@pytest.mark.parametrize(("jobs", "min_parallel_weight"), [(1, 0), (2, 0), (2, 10**9)])
+def test_batched_process_pool_results(jobs: int, min_parallel_weight: int) -> None:
+    """Test ordered results in-process, on workers, and below the parallel threshold.
+
+    Args:
+    ----
+        jobs: Number of worker processes
+        min_parallel_weight: Weight from which workers are used
+
+    """
+    with BatchedProcessPool(
+        square_batch, jobs, batch_weight=3, min_parallel_weight=min_parallel_weight
+    ) as pool:
+        tickets = [pool.submit(value) for value in range(10)]
+        results = [pool.result(ticket) for ticket in reversed(tickets)]
+        started = pool._executor is not None
+        forked = started and pool._executor._mp_context.get_start_method() == "fork"
+
+    if results != [value * value for value in reversed(range(10))]:
+        pytest.fail(f"Each ticket should yield its own result, got {results}")
+    if started != (jobs > 1 and min_parallel_weight == 0):
+        pytest.fail("Workers should only start with several jobs and enough work")
+    if forked:
+        pytest.fail("Workers should not be forked from the multi-threaded parent")
@@ -0,0 +1,61 @@
+"""Test suite for cross-file redundancy removal in smoosh mode."""
+
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.composer.concatenator import concatenate_files
+from smoosh.composer.deduplicator import import_block, leading_header
+from smoosh.utils.config import ConfigDict
+
+LICENSE = "// Copyright (c) Example Corp.\n// Licensed under the MIT License.\n// See LICENSE.\n"
+IMPORTS = "import json\nimport os\nimport sys\n"
+
+
+def test_block_detection() -> None:
+    """Test recognition of header and import blocks."""
+    if leading_header(LICENSE + "var x = 1;\n") != LICENSE:
+        pytest.fail("Leading comment lines should form the header")
+    if leading_header("// short\nvar x = 1;\n"):
+        pytest.fail("Headers shorter than the minimum should be ignored")
+    if leading_header('"""Doc\n\nMore.\n"""\nx = 1\n') != '"""Doc\n\nMore.\n"""\n':
+        pytest.fail("A leading docstring should form the header")
+
+    source = f'"""Doc."""\n{IMPORTS}\ndef f(): ...\n'
+    if import_block(source) != (len('"""Doc."""\n'), IMPORTS):
+        pytest.fail("The first run of imports should be found with its offset")
+
+
+def test_smoosh_mode_removes_redundancy(tmp_path: Path, config: ConfigDict) -> None:
+    """Test deduplication of files, license headers and import blocks.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        config: Configuration dictionary
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    (pkg_dir / "vendor").mkdir(parents=True)
+    (pkg_dir / "a.js").write_text(LICENSE + "export const a = 1;\n")
+    (pkg_dir / "b.js").write_text(LICENSE + "export const b = 2;\n")
+    (pkg_dir / "one.py").write_text(IMPORTS + "\n\ndef one():\n    return 1\n")
+    (pkg_dir / "two.py").write_text(IMPORTS + "\n\ndef two():\n    return 2\n")
+    (pkg_dir / "util.py").write_text("def util():\n    return 3\n")
+    (pkg_dir / "vendor" / "util.py").write_text("def util():\n    return 3\n")
+
+    repo_info = analyze_repository(pkg_dir, config)
+    composition, _ = concatenate_files(repo_info, "smoosh", config)
+    content = composition.split("\n### Legend ###\n", 1)[-1]
+
+    if composition.count("Licensed under the MIT License") != 1:
+        pytest.fail(f"The license header should appear once, in the legend:\n{composition}")
+    if content.count("import json") != 1:
+        pytest.fail(f"The import block should appear once, in the legend:\n{composition}")
+    if "[H1] (in 2 files)" not in content or "[I1] (in 2 files)" not in content:
+        pytest.fail(f"The legend should label repeated blocks:\n{composition}")
+    if "### File: vendor/util.py (same as util.py) ###" not in content:
+        pytest.fail(f"Identical files should reference their first copy:\n{composition}")
+    if "export const b = 2;" not in content or "def two():" not in content:
+        pytest.fail("The rest of each file should be kept")
@@ -0,0 +1,184 @@
+"""Tests for the file utilities of smoosh."""
+
+import builtins
+import os
+import sys
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from smoosh.utils.classifier import SAMPLE_SIZE
+from smoosh.utils.file_utils import load_ignore_rules, probe_repository, walk_repository
+
+
+@pytest.fixture
+def sample_tree(tmp_path: Path) -> Path:
+    """Create a small directory tree with ignored and kept files.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        Path: Root of the sample tree
+
+    """
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "module.py").write_text("x = 1\n")
+    (tmp_path / "node_modules" / "dep").mkdir(parents=True)
+    (tmp_path / "node_modules" / "dep" / "index.js").write_text("module.exports = 1;\n")
+    (tmp_path / "big.txt").write_text("a" * (64 * 1024))
+    (tmp_path / "README.md").write_text("# Sample\n")
+    return tmp_path
+
+
+def test_walk_repository_prunes_ignored_directories(sample_tree: Path) -> None:
+    """Test that ignored directories are skipped as a whole.
+
+    Args:
+    ----
+        sample_tree: Sample directory tree
+
+    """
+    found = {
+        p.relative_to(sample_tree).as_posix()
+        for p in walk_repository(sample_tree, {"node_modules/"})
+    }
+
+    if found != {"README.md", "big.txt", "pkg/module.py"}:
+        pytest.fail(f"Ignored directories should be pruned, got {sorted(found)}")
+
+
+def test_walk_repository_applies_size_limit(sample_tree: Path) -> None:
+    """Test that files over the size limit are skipped.
+
+    Args:
+    ----
+        sample_tree: Sample directory tree
+
+    """
+    found = {p.name for p in walk_repository(sample_tree, {"node_modules/"}, max_size_mb=0.01)}
+
+    if "big.txt" in found:
+        pytest.fail("Files over the size limit should be skipped")
+    if "module.py" not in found:
+        pytest.fail("Small files should be kept")
+
+
+def test_nested_gitignore_and_info_exclude(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that nested .gitignore files and .git/info/exclude are honoured.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        monkeypatch: Pytest fixture for isolating the global git config
+
+    """
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "home" / ".config"))
+
+    repo = tmp_path / "repo"
+    (repo / ".git" / "info").mkdir(parents=True)
+    (repo / ".git" / "info" / "exclude").write_text("secret.txt\n")
+    (repo / ".gitignore").write_text("*.log\n")
+    (repo / "sub" / "generated").mkdir(parents=True)
+    (repo / "sub" / ".gitignore").write_text("/generated/\n!keep.log\n")
+    (repo / "sub" / "generated" / "out.py").write_text("x = 1\n")
+    (repo / "sub" / "keep.log").write_text("kept\n")
+    (repo / "sub" / "drop.log").write_text("dropped\n")
+    (repo / "secret.txt").write_text("hidden\n")
+    (repo / "main.py").write_text("print()\n")
+
+    rules = load_ignore_rules(repo, repo)
+    found = {p.relative_to(repo).as_posix() for p in walk_repository(repo, rules)}
+
+    if found != {".gitignore", "main.py", "sub/.gitignore", "sub/keep.log"}:
+        pytest.fail(f"Unexpected files: {sorted(found)}")
+
+
+def test_probe_repository_loads_content_in_one_pass(sample_tree: Path) -> None:
+    """Test that probing reports size, verdict and content together.
+
+    Args:
+    ----
+        sample_tree: Sample directory tree
+
+    """
+    (sample_tree / "pkg" / "blob.dat").write_bytes(b"\x00\x01\x02")
+    (sample_tree / "pkg" / "crlf.cfg").write_bytes(b"a = 1\r\nb = 2\r\n")
+
+    files = {
+        f.relative_path: f
+        for f in probe_repository(sample_tree, {"node_modules/"}, load_content=True)
+    }
+
+    if "pkg/blob.dat" in files:
+        pytest.fail("Binary files should be dropped by the probe")
+    module = files["pkg/module.py"]
+    if module.content != "x = 1\n" or not module.is_python or module.size_mb <= 0:
+        pytest.fail(f"Unexpected probe result: {module}")
+    if files["pkg/crlf.cfg"].content != "a = 1\nb = 2\n":
+        pytest.fail("Content should be read with universal newlines")
+
+
+def test_probed_files_share_root_and_load_lazily(sample_tree: Path) -> None:
+    """Test that probed files are compact records whose content is read on demand.
+
+    Args:
+    ----
+        sample_tree: Sample directory tree
+
+    """
+    files = {f.relative_path: f for f in probe_repository(sample_tree, {"node_modules/"})}
+    module = files["pkg/module.py"]
+
+    if hasattr(module, "__dict__"):
+        pytest.fail("FileInfo should store its attributes in slots")
+    if len({id(f.root) for f in files.values()}) != 1:
+        pytest.fail("All files of a repository should share one root string")
+    if module.relative_path is not sys.intern("pkg/module.py"):
+        pytest.fail("Relative paths should be interned")
+    if Path(module.path) != sample_tree / "pkg" / "module.py" or module.name != "module.py":
+        pytest.fail(f"The path should be derived from the root, got {module.path}")
+
+    if module.content is not None or module.read_text() != "x = 1\n" or module.content is not None:
+        pytest.fail("read_text should read the file without keeping its content")
+    if module.load() != "x = 1\n" or module.content != "x = 1\n":
+        pytest.fail("load should keep the content")
+    module.release()
+    if module.content is not None:
+        pytest.fail("release should drop the content")
+
+
+def test_probe_opens_unknown_files_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a file opened for classification is not opened again to be read.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        monkeypatch: Pytest fixture for patching attributes
+
+    """
+    (tmp_path / "notes.unknown").write_text("café\n", encoding="utf-8")
+    (tmp_path / "large.unknown").write_text("x" * (SAMPLE_SIZE + 1))
+    opened: List[str] = []
+    real_open = builtins.open
+
+    def counting_open(file: Any, *args: Any, **kwargs: Any) -> Any:
+        opened.append(os.path.basename(str(file)))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+    files = {f.name: f for f in probe_repository(tmp_path, prefetch=True)}
+    contents = {name: file_info.read_text() for name, file_info in files.items()}
+
+    if sorted(opened) != ["large.unknown", "large.unknown", "notes.unknown"]:
+        pytest.fail(f"Only files larger than the sample should be opened twice, got {opened}")
+    if contents["notes.unknown"] != "café\n" or files["notes.unknown"].line_count != 1:
+        pytest.fail("The prefetched content should be decoded and counted")
+    if files["notes.unknown"].prefetched is not None:
+        pytest.fail("Prefetched content should only be kept until it is read")
+    if any(f.prefetched is not None for f in probe_repository(tmp_path)):
+        pytest.fail("Content should only be prefetched when asked for")
@@ -0,0 +1,104 @@
+"""Test suite for structure-preserving folding."""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+from smoosh.composer.folder import fold_key, fold_python, iter_folded
+from smoosh.custom_types import FileInfo
+from smoosh.utils.cache import ContentStore
+
+SOURCE = '''"""Module docstring."""
+
+import os
+from typing import List
+
+VERSION = "1.0"
+
+
+@decorator(option=True)
+def public(path: str, *, strict: bool = False) -> List[str]:
+    """Summarize a path.
+
+    Details that are folded away.
+    """
+    entries = os.listdir(path)
+    return [entry for entry in entries if not strict or entry]
+
+
+class Widget(Base, metaclass=Meta):
+    """A widget."""
+
+    name: str = "widget"
+
+    async def run(self) -> None:
+        await self.start()
+
+
+if __name__ == "__main__":
+    public(".")
+'''
+
+
+def test_fold_python_keeps_structure() -> None:
+    """Test that folding keeps signatures and docstring summaries only."""
+    folded = fold_python(SOURCE)
+    if folded is None:
+        pytest.fail("Valid source should fold")
+
+    expected = [
+        '"""Module docstring."""',
+        "import os",
+        "from typing import List",
+        "VERSION = '1.0'",
+        "@decorator(option=True)",
+        "def public(path: str, *, strict: bool=False) -> List[str]:",
+        '    """Summarize a path."""',
+        "class Widget(Base, metaclass=Meta):",
+        "    name: str = 'widget'",
+        "    async def run(self) -> None:",
+    ]
+    for line in expected:
+        if line not in folded:
+            pytest.fail(f"Folded source should contain {line!r}:\n{folded}")
+    for elided in ("Details that are folded away", "os.listdir", "await self.start", "__main__"):
+        if elided in folded:
+            pytest.fail(f"Folded source should not contain {elided!r}:\n{folded}")
+
+
+def test_fold_python_rejects_invalid_source() -> None:
+    """Test that unparsable source is reported rather than folded."""
+    if fold_python("def broken(:\n") is not None:
+        pytest.fail("Invalid source should not fold")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_iter_folded_preserves_order_and_stores_folds(tmp_path: Path, jobs: int) -> None:
+    """Test in-process and process pool folding against the content store.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        jobs: Number of parser processes
+
+    """
+    store = ContentStore("fold", tmp_path)
+    pairs: List[Tuple[FileInfo, Optional[str]]] = []
+    for i in range(6):
+        name = f"mod{i}.py" if i % 3 else f"data{i}.txt"
+        file_info = FileInfo(str(tmp_path), name, is_python=i % 3 != 0)
+        pairs.append((file_info, f"def f{i}():\n    return {i}\n"))
+
+    results = list(iter_folded(pairs, lambda f: f.is_python, jobs, store))
+
+    if [r[0].relative_path for r in results] != [p[0].relative_path for p in pairs]:
+        pytest.fail("Results should keep the input order")
+    for file_info, content, folded in results:
+        if file_info.is_python:
+            if folded != content.splitlines()[0] + "\n    ...\n":
+                pytest.fail(f"Python files should be folded, got {folded!r}")
+            if store.get(fold_key(content)) != folded:
+                pytest.fail("Folds should be kept in the store")
+        elif folded is not None:
+            pytest.fail("Files that are not to be folded should be passed through")
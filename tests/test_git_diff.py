@@ -0,0 +1,114 @@
+"""Tests for listing the files changed since a git revision."""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.utils.config import ConfigDict, load_config
+from smoosh.utils.git_diff import changed_files_from_objects
+from smoosh.utils.git_objects import GitObjectError
+
+GIT = shutil.which("git")
+
+pytestmark = pytest.mark.skipif(GIT is None, reason="git is not installed")
+
+
+def _git(repo: Path, *args: str) -> str:
+    """Run a git command in repo and return its output."""
+    return subprocess.run(  # noqa: S603
+        [str(GIT), "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    """Create a repository with two commits and a tag on the first.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        Path: Root of the work tree
+
+    """
+    _git(tmp_path, "init", "-q")
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "core.py").write_text("VALUE = 1\n")
+    (pkg / "api.py").write_text("from .core import VALUE\n")
+    (pkg / "other.py").write_text("import os\n")
+    (tmp_path / "README.md").write_text("readme\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "first")
+    _git(tmp_path, "tag", "-a", "v1", "-m", "v1")
+    (tmp_path / "README.md").write_text("readme, updated\n")
+    _git(tmp_path, "commit", "-q", "-am", "second")
+    return tmp_path
+
+
+def _git_diff(repo: Path, revision: str) -> list:
+    """List changed files with the git binary."""
+    return sorted(_git(repo, "diff", "--name-only", "--no-renames", revision, "--").split())
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_changed_files_from_objects_matches_git(repo: Path, packed: bool) -> None:
+    """Test that reading the object database agrees with 'git diff --name-only'.
+
+    Args:
+    ----
+        repo: Root of the work tree
+        packed: Whether objects and refs are packed first
+
+    """
+    if packed:
+        _git(repo, "gc", "-q")
+        _git(repo, "pack-refs", "--all")
+    (repo / "pkg" / "core.py").write_text("VALUE = 2\n")
+    (repo / "pkg" / "other.py").unlink()
+    (repo / "pkg" / "new.py").write_text("")
+    _git(repo, "add", "pkg/new.py")
+
+    head = _git(repo, "rev-parse", "HEAD").strip()
+    for revision in ["HEAD", "HEAD~1", "HEAD^", "v1", "master~1", head[:7]]:
+        if revision == "master~1" and not _git(repo, "branch", "--list", "master"):
+            continue
+        found = changed_files_from_objects(repo, revision)
+        if found != _git_diff(repo, revision):
+            pytest.fail(f"{revision}: expected {_git_diff(repo, revision)}, got {found}")
+
+    with pytest.raises(GitObjectError):
+        changed_files_from_objects(repo, "no-such-branch")
+
+
+def test_analyze_repository_since(repo: Path, tmp_path: Path) -> None:
+    """Test that --since limits the analysis to changed files and their imports.
+
+    Args:
+    ----
+        repo: Root of the work tree
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    (repo / "pkg" / "core.py").write_text("VALUE = 2\n")
+    config: ConfigDict = load_config(tmp_path)
+    config["cache"]["enabled"] = False
+    config["git"]["since"] = "HEAD"
+
+    files = [str(f.relative_path) for f in analyze_repository(repo, config).files]
+    if files != ["pkg/core.py"]:
+        pytest.fail(f"Only the changed file should be analyzed, got {files}")
+
+    config["git"]["with_imports"] = True
+    files = [str(f.relative_path) for f in analyze_repository(repo, config).files]
+    if files != ["pkg/api.py", "pkg/core.py"]:
+        pytest.fail(f"The importer of the changed file should be added, got {files}")
@@ -0,0 +1,89 @@
+"""Tests for the pure-Python git index reader."""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.utils.config import load_config
+from smoosh.utils.git_index import list_tracked_files
+
+GIT = shutil.which("git")
+
+
+def _git(repo: Path, *args: str) -> str:
+    """Run a git command in repo and return its output."""
+    return subprocess.run(  # noqa: S603
+        [str(GIT), "-C", str(repo), *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+@pytest.mark.skipif(GIT is None, reason="git is not installed")
+@pytest.mark.parametrize("index_version", ["2", "3", "4"])
+def test_list_tracked_files_matches_git(tmp_path: Path, index_version: str) -> None:
+    """Test that the index reader agrees with 'git ls-files' for every index version.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+        index_version: Git index format version to write
+
+    """
+    _git(tmp_path, "init", "-q")
+    for name in ["a.py", "pkg/b.py", "pkg/deeply/nested/name_" + "x" * 40 + ".txt", "z.md"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    (tmp_path / "untracked.py").write_text("")
+    _git(tmp_path, "add", "a.py", "pkg", "z.md")
+    _git(tmp_path, "update-index", "--index-version", index_version)
+
+    expected = _git(tmp_path, "ls-files").splitlines()
+    if list_tracked_files(tmp_path / ".git") != expected:
+        pytest.fail("Tracked files should match 'git ls-files'")
+    if list_tracked_files(tmp_path / ".git", prefix="pkg") != [
+        p[len("pkg/") :] for p in expected if p.startswith("pkg/")
+    ]:
+        pytest.fail("Prefix filtering should make paths relative to the prefix")
+
+
+@pytest.mark.skipif(GIT is None, reason="git is not installed")
+def test_index_enumeration_matches_the_walk(tmp_path: Path) -> None:
+    """Test that the git index is opt-in and lists the same files as the walk.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    _git(tmp_path, "init", "-q")
+    for name in ["tracked.py", "pkg/module.py", "pkg/__pycache__/module.txt", "build/out.txt"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1\n")
+    _git(tmp_path, "add", ".")
+    (tmp_path / "untracked.py").write_text("y = 2\n")
+    config = load_config(tmp_path)
+    config["cache"]["enabled"] = False
+
+    walked = [f.relative_path for f in analyze_repository(tmp_path, config).files]
+    if walked != ["pkg/module.py", "tracked.py", "untracked.py"]:
+        pytest.fail(f"By default the tree should be walked, got {walked}")
+
+    config["git"]["use_index"] = True
+    config["git"]["include_untracked"] = True
+    paths = [f.relative_path for f in analyze_repository(tmp_path, config).files]
+    if paths != walked:
+        pytest.fail(f"The index with untracked files should match the walk, got {paths}")
+
+    config["git"]["include_untracked"] = False
+    paths = [f.relative_path for f in analyze_repository(tmp_path, config).files]
+    if paths != ["pkg/module.py", "tracked.py"]:
+        pytest.fail(f"The index alone should list the tracked files, got {paths}")
+
+    (tmp_path / ".git" / "index").write_bytes(b"corrupt")
+    paths = [f.relative_path for f in analyze_repository(tmp_path, config).files]
+    if paths != walked:
+        pytest.fail(f"An unreadable index should fall back to walking, got {paths}")
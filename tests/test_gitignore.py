@@ -0,0 +1,62 @@
+"""Tests for gitignore pattern matching."""
+
+from typing import List, Optional
+
+import pytest
+
+from smoosh.utils.gitignore import GitignoreMatcher, normalize_pattern
+
+
+@pytest.mark.parametrize(
+    ("patterns", "path", "is_dir", "expected"),
+    [
+        (["*.log"], "logs/debug.log", False, True),
+        (["*.log", "!keep.log"], "logs/keep.log", False, False),
+        (["/build"], "build", True, True),
+        (["/build"], "src/build", True, None),
+        (["build/"], "src/build", True, True),
+        (["build/"], "src/build", False, None),
+        (["docs/**/*.md"], "docs/a/b/c.md", False, True),
+        (["docs/**/*.md"], "docs/c.md", False, True),
+        (["**/cache"], "a/b/cache", True, True),
+        (["out/**"], "out/x/y.txt", False, True),
+        (["*.py[cod]"], "pkg/mod.pyc", False, True),
+        (["a/*.txt"], "a/b/c.txt", False, None),
+    ],
+)
+def test_matcher_semantics(
+    patterns: List[str], path: str, is_dir: bool, expected: Optional[bool]
+) -> None:
+    """Test gitignore matching semantics.
+
+    Args:
+    ----
+        patterns: Patterns to compile
+        path: Relative path to match
+        is_dir: Whether the path is a directory
+        expected: Expected match result
+
+    """
+    result = GitignoreMatcher(patterns).match(path, is_dir)
+    if result is not expected:
+        pytest.fail(f"{patterns} on {path!r} gave {result}, expected {expected}")
+
+
+def test_ignored_parent_cannot_be_reincluded() -> None:
+    """Test that negation does not re-include files inside an ignored directory."""
+    matcher = GitignoreMatcher(["build/", "!build/keep.txt"])
+    if not matcher.is_ignored("build/keep.txt"):
+        pytest.fail("Files below an ignored directory should stay ignored")
+
+
+def test_normalize_pattern_keeps_negation_and_anchoring() -> None:
+    """Test that normalization preserves negation and anchoring."""
+    if normalize_pattern("!/keep.txt  \n") != "!/keep.txt":
+        pytest.fail("Negation and anchoring should be preserved")
+    if normalize_pattern("# comment") != "":
+        pytest.fail("Comments should be dropped")
+    if normalize_pattern(" foo\n") != " foo" or normalize_pattern("   \n") != "":
+        pytest.fail("Leading whitespace should be kept, as git does")
+    matcher = GitignoreMatcher([" foo"])
+    if matcher.is_ignored("foo", False) or not matcher.is_ignored(" foo", False):
+        pytest.fail("A pattern with a leading space should only match names starting with one")
@@ -0,0 +1,144 @@
+"""Tests for Python import scanning and resolution."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.imports import (
+    build_import_graph,
+    module_names,
+    resolve_imports,
+    scan_imports,
+)
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.utils.cache import AnalysisCache
+from smoosh.utils.config import ConfigDict, load_config
+
+
+@pytest.fixture
+def layered_package(tmp_path: Path) -> Path:
+    """Create a package whose modules import each other in a chain.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        Path: Root of the repository containing the package
+
+    """
+    root = tmp_path / "repo"
+    pkg = root / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "top.py").write_text("from .middle import run\n")
+    (pkg / "middle.py").write_text("from pkg import bottom\n")
+    (pkg / "bottom.py").write_text("import os\n")
+    (pkg / "unrelated.py").write_text("import pkg.top\n")
+    (root / "notes.txt").write_text("notes\n")
+    return root
+
+
+def test_scan_imports_finds_every_form() -> None:
+    """Test that plain, from, relative and parenthesized imports are found."""
+    source = (
+        "import os, pkg.util as u\n"
+        "from . import sibling\n"
+        "from ..base import (\n    Base,\n    Mixin as M,\n)\n"
+        "if True:\n    from pkg.core import VALUE  # indented\n"
+    )
+
+    found = sorted(scan_imports(source))
+
+    expected = sorted(
+        [
+            ("os", 0, ()),
+            ("pkg.util", 0, ()),
+            ("", 1, ("sibling",)),
+            ("base", 2, ("Base", "Mixin")),
+            ("pkg.core", 0, ("VALUE",)),
+        ]
+    )
+    if found != expected:
+        pytest.fail(f"Expected {expected}, got {found}")
+
+
+def test_resolve_imports_to_repository_files() -> None:
+    """Test that imports resolve to files below the source root and others are dropped."""
+    paths = [
+        "src/pkg/__init__.py",
+        "src/pkg/core.py",
+        "src/pkg/sub/__init__.py",
+        "src/pkg/sub/mod.py",
+        "setup.py",
+    ]
+    modules = module_names(paths)
+    if modules.get("pkg.sub.mod") != "src/pkg/sub/mod.py" or "setup" not in modules:
+        pytest.fail(f"Module names should start at the outermost package, got {modules}")
+
+    imports = scan_imports(
+        "import os\nfrom .. import core\nfrom . import mod\nfrom pkg.core import VALUE\n"
+    )
+    resolved = resolve_imports("src/pkg/sub/mod.py", imports, modules)
+
+    if resolved != {"src/pkg/core.py"}:
+        pytest.fail(f"Expected only pkg.core, got {resolved}")
+
+
+def test_import_graph_is_cached_and_walked_by_depth(layered_package: Path, tmp_path: Path) -> None:
+    """Test that scanned imports are kept in the cache and followed level by level.
+
+    Args:
+    ----
+        layered_package: Root of the repository
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    root = str(layered_package)
+    python_files = {
+        f"pkg/{name}": os.stat(os.path.join(root, "pkg", name))
+        for name in os.listdir(os.path.join(root, "pkg"))
+    }
+    cache = AnalysisCache(root, cache_dir=tmp_path / "cache")
+    graph = build_import_graph(root, python_files, cache)
+    cache.save()
+
+    reached = graph.reachable(["pkg/top.py"], 1)
+    if reached != ["pkg/middle.py", "pkg/top.py"]:
+        pytest.fail(f"Depth 1 should reach only the direct import, got {reached}")
+    if "pkg/unrelated.py" in graph.reachable(["pkg/top.py"], 5):
+        pytest.fail("Importers should not be reached by following imports")
+    if graph.importers(["pkg/top.py"]) != {"pkg/unrelated.py"}:
+        pytest.fail("The importer of pkg/top.py should be found")
+
+    reopened = AnalysisCache(root, cache_dir=tmp_path / "cache")
+    entry = reopened.lookup("pkg/middle.py", python_files["pkg/middle.py"])
+    if entry is None or entry.get("imports") != [["pkg", 0, ["bottom"]]]:
+        pytest.fail(f"Scanned imports should be persisted, got {entry}")
+    if build_import_graph(root, python_files, reopened).edges != graph.edges:
+        pytest.fail("The graph rebuilt from the cache should be the same")
+
+
+def test_analyze_repository_focus(layered_package: Path, tmp_path: Path) -> None:
+    """Test that focus limits the analysis to a module and its imports.
+
+    Args:
+    ----
+        layered_package: Root of the repository
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    config: ConfigDict = load_config(tmp_path)
+    config["cache"]["directory"] = str(tmp_path / "cache")
+    config["focus"]["modules"] = ["pkg.top"]
+
+    for depth, expected in [
+        (0, ["pkg/top.py"]),
+        (3, ["pkg/bottom.py", "pkg/middle.py", "pkg/top.py"]),
+    ]:
+        config["focus"]["depth"] = depth
+        files = [str(f.relative_path) for f in analyze_repository(layered_package, config).files]
+        if files != expected:
+            pytest.fail(f"Depth {depth}: expected {expected}, got {files}")
@@ -0,0 +1,104 @@
+"""Test suite for token-budget packing."""
+
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.composer.concatenator import concatenate_files
+from smoosh.composer.packer import LEVEL_CAT, LEVEL_FOLD, LEVEL_OMIT, pack_files
+from smoosh.utils.config import ConfigDict
+from smoosh.utils.tokens import EstimatingTokenCounter
+
+
+@pytest.fixture
+def package(tmp_path: Path) -> Path:
+    """Create a package with an entry point, a small module and large files.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        Path: Package root
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    (pkg_dir / "tests").mkdir(parents=True)
+    (pkg_dir / "__main__.py").write_text("from core import run\n\nrun()\n")
+    (pkg_dir / "core.py").write_text("def run() -> None:\n    print('running')\n")
+    (pkg_dir / "data.txt").write_text("lorem ipsum dolor sit amet\n" * 200)
+    (pkg_dir / "tests" / "test_core.py").write_text("def test_run():\n    assert True\n" * 20)
+    return pkg_dir
+
+
+def test_pack_prefers_entry_points_and_small_modules(package: Path, config: ConfigDict) -> None:
+    """Test that a tight budget keeps the entry point and core module.
+
+    Args:
+    ----
+        package: Package root
+        config: Configuration dictionary
+
+    """
+    config["output"]["max_tokens"] = 300
+    repo_info = analyze_repository(package, config)
+
+    plan = pack_files(repo_info, config, EstimatingTokenCounter(), header_tokens=100)
+    levels = {str(path): level for path, level in plan.levels.items()}
+
+    if levels["__main__.py"] != LEVEL_CAT or levels["core.py"] != LEVEL_CAT:
+        pytest.fail(f"Entry point and core module should be packed, got {levels}")
+    if levels["data.txt"] != LEVEL_OMIT:
+        pytest.fail(f"Large data file should be omitted, got {levels}")
+    if plan.tokens > 300 - 100:
+        pytest.fail(f"Packed files should fit the remaining budget, got {plan.tokens}")
+
+
+def test_cat_threshold_excludes_large_files(package: Path, config: ConfigDict) -> None:
+    """Test that files above cat_threshold are folded or omitted despite spare budget.
+
+    Args:
+    ----
+        package: Package root
+        config: Configuration dictionary
+
+    """
+    config["output"]["max_tokens"] = 100_000
+    config["thresholds"]["cat_threshold"] = 100
+    repo_info = analyze_repository(package, config)
+
+    plan = pack_files(repo_info, config, EstimatingTokenCounter())
+
+    levels = {str(path): level for path, level in plan.levels.items()}
+    if levels["data.txt"] != LEVEL_OMIT:
+        pytest.fail(f"Files above cat_threshold should be omitted, got {levels}")
+    if levels["tests/test_core.py"] != LEVEL_FOLD:
+        pytest.fail(f"Python files above cat_threshold should be folded, got {levels}")
+    if plan.count(LEVEL_CAT) != 2:
+        pytest.fail(f"Only the small files should be packed in full, got {levels}")
+
+
+def test_packed_composition_fits_budget(package: Path, config: ConfigDict) -> None:
+    """Test that a packed composition stays within max_tokens.
+
+    Args:
+    ----
+        package: Package root
+        config: Configuration dictionary
+
+    """
+    config["output"]["pack"] = True
+    config["output"]["max_tokens"] = 400
+    repo_info = analyze_repository(package, config)
+
+    composition, stats = concatenate_files(repo_info, "cat", config)
+
+    if "Packed: " not in composition or "### File: __main__.py ###" not in composition:
+        pytest.fail("Packed composition should summarize the plan and include the entry point")
+    if "### File: data.txt ###" in composition:
+        pytest.fail("Omitted files should not be composed")
+    tokens = stats["Composed Tokens"]
+    if not isinstance(tokens, int) or tokens > 400:
+        pytest.fail(f"Composition should fit max_tokens, got {tokens}")
@@ -0,0 +1,53 @@
+"""Test suite for the composition breakdown report."""
+
+import pytest
+
+from smoosh.composer.report import build_report, extension_of
+from smoosh.composer.stats import CompositionStats, FileStats
+
+
+def test_build_report_ranks_groups_by_each_metric() -> None:
+    """Test the rankings of directories, extensions and files."""
+    stats = CompositionStats()
+    stats.files = [
+        FileStats("src/app/big.py", lines=10, chars=400, size=400, tokens=100),
+        FileStats("src/app/small.py", lines=50, chars=100, size=100, tokens=30),
+        FileStats("docs/notes.md", lines=5, chars=900, size=950, tokens=60),
+        FileStats("Makefile", lines=1, chars=10, size=10, tokens=5),
+    ]
+    stats.tokens = 215
+
+    report = build_report(stats, top=2)
+
+    def paths(group: str, metric: str) -> list:
+        return [entry["path"] for entry in report[group][metric]]
+
+    if paths("files", "tokens") != ["src/app/big.py", "docs/notes.md"]:
+        pytest.fail(f"Files should be ranked by tokens, got {paths('files', 'tokens')}")
+    if paths("files", "lines") != ["src/app/small.py", "src/app/big.py"]:
+        pytest.fail("Files should be ranked by lines")
+    if paths("directories", "tokens") != ["src", "src/app"]:
+        pytest.fail("Directories should include subdirectories, ties ordered by path")
+    if paths("extensions", "bytes") != [".md", ".py"]:
+        pytest.fail("Extensions should be ranked by bytes")
+    if report["directories"]["tokens"][0]["tokens"] != 130:
+        pytest.fail("Directory totals should sum their files")
+    if report["totals"]["header_tokens"] != 20:
+        pytest.fail("Tokens outside the files should be reported as header tokens")
+
+
+@pytest.mark.parametrize(
+    ("path", "extension"),
+    [("a/b.PY", ".py"), ("Makefile", "(none)"), (".gitignore", "(none)"), ("x.tar.gz", ".gz")],
+)
+def test_extension_of(path: str, extension: str) -> None:
+    """Test how files are grouped by extension.
+
+    Args:
+    ----
+        path: Path of a file
+        extension: Expected group
+
+    """
+    if extension_of(path) != extension:
+        pytest.fail(f"{path} should be grouped under {extension}, got {extension_of(path)}")
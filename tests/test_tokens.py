@@ -0,0 +1,108 @@
+"""Test suite for token counting."""
+
+import base64
+from pathlib import Path
+
+import pytest
+
+from smoosh import ConfigurationError
+from smoosh.utils.tokens import (
+    BPETokenCounter,
+    EstimatingTokenCounter,
+    TokenCounter,
+    get_token_counter,
+)
+
+
+def write_vocabulary(path: Path, merges: list) -> Path:
+    """Write a .tiktoken vocabulary of all single bytes plus the given merges.
+
+    Args:
+    ----
+        path: File to write
+        merges: Multi-byte tokens in rank order
+
+    Returns:
+    -------
+        Path: The written vocabulary file
+
+    """
+    tokens = [bytes([i]) for i in range(256)] + merges
+    lines = [f"{base64.b64encode(token).decode()} {rank}" for rank, token in enumerate(tokens)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("", 0),
+        ("def", 1),
+        ("def answer():", 4),
+        ("concatenate_files", 4),
+        ("    return 42\n", 4),
+        ("héllo", 3),
+    ],
+)
+def test_estimator_counts(text: str, expected: int) -> None:
+    """Test the character-class token estimate.
+
+    Args:
+    ----
+        text: Text to count
+        expected: Expected estimate
+
+    """
+    count = EstimatingTokenCounter().count(text)
+    if count != expected:
+        pytest.fail(f"Expected {expected} tokens for {text!r}, got {count}")
+
+
+def test_estimator_exceeds_word_count() -> None:
+    """Test that punctuation-heavy code is not counted as a few words."""
+    text = "values = {key: func(arg)[0] for key, arg in items.items()}"
+    count = EstimatingTokenCounter().count(text)
+    if count <= len(text.split()):
+        pytest.fail(f"Estimate {count} should exceed the word count {len(text.split())}")
+
+
+def test_bpe_counter_applies_merges_by_rank(tmp_path: Path) -> None:
+    """Test that the BPE counter merges lowest-ranked pairs first.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    vocabulary = write_vocabulary(tmp_path / "tiny.tiktoken", [b"ab", b"bc", b"abc", b" x"])
+    counter = BPETokenCounter.from_file(vocabulary)
+
+    cases = {"abc": 1, "abcd": 2, "bcbc": 2, "a x": 2, "": 0}
+    for text, expected in cases.items():
+        count = counter.count(text)
+        if count != expected:
+            pytest.fail(f"Expected {expected} tokens for {text!r}, got {count}")
+
+
+def test_get_token_counter_rejects_missing_vocabulary(tmp_path: Path) -> None:
+    """Test that a configured but missing vocabulary is a configuration error.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    if not isinstance(get_token_counter(""), EstimatingTokenCounter):
+        pytest.fail("An empty vocabulary should select the estimator")
+    with pytest.raises(ConfigurationError):
+        get_token_counter(tmp_path / "missing.tiktoken")
+
+
+def test_incomplete_counters_cannot_be_created() -> None:
+    """Test that a counter without count() fails when it is created."""
+
+    class Incomplete(TokenCounter):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
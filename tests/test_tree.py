@@ -0,0 +1,123 @@
+"""Test suite for repository structure rendering."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.tree import (
+    TreeNode,
+    add_to_tree,
+    build_tree,
+    format_tree,
+    iter_tree_lines,
+    remove_from_tree,
+)
+from smoosh.custom_types import FileInfo
+
+
+@pytest.fixture
+def tree() -> TreeNode:
+    """Build a small tree with nested and wide directories.
+
+    Returns:
+    -------
+        TreeNode: Root of the tree
+
+    """
+    root = TreeNode("repo")
+    for path in ["README.md", "src/pkg/a.py", "src/pkg/b.py", "src/main.py", "docs/index.md"]:
+        add_to_tree(root, path)
+    for i in range(5):
+        add_to_tree(root, f"data/file{i}.txt")
+    return root
+
+
+def test_format_tree_sorts_directories_first(tree: TreeNode) -> None:
+    """Test the full rendering of a tree.
+
+    Args:
+    ----
+        tree: Tree to render
+
+    """
+    expected = (
+        "repo/\n"
+        "    ├── data/\n"
+        "    │   ├── file0.txt\n"
+        "    │   ├── file1.txt\n"
+        "    │   ├── file2.txt\n"
+        "    │   ├── file3.txt\n"
+        "    │   └── file4.txt\n"
+        "    ├── docs/\n"
+        "    │   └── index.md\n"
+        "    ├── src/\n"
+        "    │   ├── pkg/\n"
+        "    │   │   ├── a.py\n"
+        "    │   │   └── b.py\n"
+        "    │   └── main.py\n"
+        "    └── README.md\n"
+    )
+    if format_tree(tree) != expected:
+        pytest.fail(f"Unexpected rendering:\n{format_tree(tree)}")
+
+    # A subtree rendered with the positional prefix and is_last of a parent
+    docs = format_tree(tree.child("docs", is_dir=True), "    ", False)
+    if docs != "    ├── docs/\n    │   └── index.md\n":
+        pytest.fail(f"Unexpected rendering of a subtree:\n{docs}")
+
+
+def test_format_tree_limits_depth_and_entries(tree: TreeNode) -> None:
+    """Test that limited renderings summarize what they leave out.
+
+    Args:
+    ----
+        tree: Tree to render
+
+    """
+    shallow = format_tree(tree, max_depth=1)
+    if "    │   └── … 5 files\n" not in shallow or "    │   └── … 3 files\n" not in shallow:
+        pytest.fail(f"Directories below the depth limit should be summarized:\n{shallow}")
+    if "a.py" in shallow:
+        pytest.fail("Files below the depth limit should not be listed")
+
+    narrow = format_tree(tree, max_entries=2)
+    if "    │   └── … 3 more files\n" not in narrow or "    └── … 4 more files\n" not in narrow:
+        pytest.fail(f"Children beyond the limit should be summarized:\n{narrow}")
+
+
+def test_iter_tree_lines_handles_deep_trees() -> None:
+    """Test that trees deeper than the recursion limit are rendered."""
+    depth = sys.getrecursionlimit() + 100
+    root = TreeNode("repo")
+    add_to_tree(root, "/".join(f"d{i}" for i in range(depth)) + "/leaf.txt")
+
+    lines = list(iter_tree_lines(root))
+    if len(lines) != depth + 2 or not lines[-1].endswith("└── leaf.txt\n"):
+        pytest.fail("Every level of a deep tree should be rendered")
+
+
+def test_build_tree_matches_incremental_updates(tmp_path: Path) -> None:
+    """Test that a tree built in one pass equals one built and pruned file by file.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    paths = ["b/x.py", "a.b/c.txt", "a/B.py", "a/b.py", "A/z.md", "a/sub/deep/f.py", "top.py"]
+    built = build_tree(tmp_path, [FileInfo(str(tmp_path), path) for path in reversed(paths)])
+
+    incremental = TreeNode(tmp_path.name)
+    for path in [*paths, "gone/only.py", "a/sub/extra.py"]:
+        add_to_tree(incremental, path)
+    for path in ["gone/only.py", "a/sub/extra.py", "missing/file.py"]:
+        remove_from_tree(incremental, path)
+
+    if format_tree(incremental) != format_tree(built):
+        pytest.fail(f"Trees should match:\n{format_tree(built)}\n{format_tree(incremental)}")
+    names = [child.name for child in built.children]
+    if names != ["A", "a", "a.b", "b", "top.py"]:
+        pytest.fail(f"Children should be sorted directories first, got {names}")
+    if hasattr(built, "__dict__") or not built.children[-1].is_python:
+        pytest.fail("Nodes should be slotted and know Python files by name")
@@ -0,0 +1,165 @@
+"""Test suite for incremental recomposition in watch mode."""
+
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from smoosh.analyzer.repository import analyze_repository
+from smoosh.composer.concatenator import write_composition
+from smoosh.composer.watcher import WatchSession
+from smoosh.utils.config import ConfigDict
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    """Create a small package to watch.
+
+    Args:
+    ----
+        tmp_path: Pytest fixture providing temporary directory path
+
+    Returns:
+    -------
+        Path: Root of the package
+
+    """
+    pkg_dir = tmp_path / "pkg"
+    (pkg_dir / "sub").mkdir(parents=True)
+    (pkg_dir / "a.py").write_text('def a():\n    """Return one."""\n    return 1\n')
+    (pkg_dir / "b.txt").write_text("notes\n")
+    (pkg_dir / "sub" / "c.py").write_text("import os\n")
+    return pkg_dir
+
+
+def _full_composition(repo: Path, mode: str, config: ConfigDict) -> str:
+    """Compose a repository from scratch."""
+    stream = io.StringIO()
+    write_composition(analyze_repository(repo, config), mode, config, stream)
+    return stream.getvalue()
+
+
+def _touch(path: Path, text: str) -> None:
+    """Rewrite a file and move its modification time forward."""
+    mtime_ns = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+
+@pytest.mark.parametrize("mode", ["cat", "fold", "smoosh"])
+def test_watch_session_tracks_changes(repo: Path, config: ConfigDict, mode: str) -> None:
+    """Test that the updated composition equals one composed from scratch.
+
+    Args:
+    ----
+        repo: Package to watch
+        config: Configuration dictionary
+        mode: Composition mode
+
+    """
+    session = WatchSession(repo, mode, config)
+    if session.render() != _full_composition(repo, mode, config):
+        pytest.fail("The initial composition should match write_composition")
+    if session.poll() is not None:
+        pytest.fail("Nothing should be reported before files change")
+
+    _touch(repo / "a.py", "def a(x):\n    return x * 2\n")
+    _touch(repo / "new.py", "class New:\n    pass\n")
+    (repo / "sub" / "c.py").unlink()
+
+    update = session.poll()
+    if update is None or (update.changed, update.removed) != (2, 1):
+        pytest.fail(f"Two changed files and one removal should be seen, got {update}")
+    if update.rebuilt != (mode == "smoosh"):
+        pytest.fail("Only smoosh mode should recompose from scratch")
+    if session.render() != _full_composition(repo, mode, config):
+        pytest.fail("The updated composition should match write_composition")
+    if "sub/" in session.render():
+        pytest.fail("Directories left empty should be pruned from the tree")
+
+
+def test_watch_session_writes_file_atomically(
+    repo: Path, config: ConfigDict, tmp_path: Path
+) -> None:
+    """Test that the output file is replaced with the updated composition.
+
+    Args:
+    ----
+        repo: Package to watch
+        config: Configuration dictionary
+        tmp_path: Pytest fixture providing temporary directory path
+
+    """
+    output = tmp_path / "out" / "summary.txt"
+    output.parent.mkdir()
+    session = WatchSession(repo, "cat", config)
+    session.write_file(output)
+
+    _touch(repo / "b.txt", "updated notes\n")
+    if session.poll() is None:
+        pytest.fail("The change to b.txt should be seen")
+    session.write_file(output)
+
+    if output.read_text(encoding="utf-8") != _full_composition(repo, "cat", config):
+        pytest.fail("The output file should hold the updated composition")
+    if sorted(p.name for p in output.parent.iterdir()) != ["summary.txt"]:
+        pytest.fail("No temporary files should be left next to the output")
+
+
+@pytest.mark.parametrize("mode", ["cat", "smoosh"])
+def test_watch_session_ignores_output_inside_repository(
+    repo: Path, config: ConfigDict, mode: str
+) -> None:
+    """Test that writing the output inside the watched directory is not a change.
+
+    Args:
+    ----
+        repo: Package to watch
+        config: Configuration dictionary
+        mode: Composition mode
+
+    """
+    output = repo / "summary.txt"
+    session = WatchSession(repo, mode, config)
+    session.write_file(output)
+    if session.poll() is not None or session.poll() is not None:
+        pytest.fail("The session's own output should not be seen as a change")
+    size = output.stat().st_size
+
+    _touch(repo / "b.txt", "updated notes\n")
+    if session.poll() is None:
+        pytest.fail("The change to b.txt should be seen")
+    session.write_file(output)
+    if session.poll() is not None or "### File: summary.txt" in output.read_text("utf-8"):
+        pytest.fail("The output should not embed itself")
+
+    # A new session, e.g. after a restart, leaves out the output left behind
+    restarted = WatchSession(repo, mode, config, output=output)
+    restarted.write_file(output)
+    if restarted.poll() is not None or output.stat().st_size != size + len("updated "):
+        pytest.fail("The output of an earlier run should not be composed")
+
+
+def test_watch_session_rebuilds_when_excludes_change(repo: Path, config: ConfigDict) -> None:
+    """Test that editing .git/info/exclude changes the watched files.
+
+    Args:
+    ----
+        repo: Package to watch
+        config: Configuration dictionary
+
+    """
+    (repo / ".git" / "info").mkdir(parents=True)
+    session = WatchSession(repo, "cat", config)
+    if "b.txt" not in session.files:
+        pytest.fail("b.txt should be composed before it is excluded")
+
+    (repo / ".git" / "info" / "exclude").write_text("*.txt\n")
+    update = session.poll()
+    if update is None or not update.rebuilt:
+        pytest.fail(f"A new excludes file should force a rebuild, got {update}")
+    if "b.txt" in session.files or session.render() != _full_composition(repo, "cat", config):
+        pytest.fail("The rebuilt composition should leave out the excluded file")
+    if session.poll() is not None:
+        pytest.fail("An unchanged excludes file should not be reported again")